@@ -47,7 +47,7 @@ def create_or_update_commune(
         )
 
 
-@router.get("/communes/{nom_commune}", status_code=status.HTTP_200_OK response_model=CommuneOut)
+@router.get("/communes/{nom_commune}", status_code=status.HTTP_200_OK, response_model=CommuneOut)
 def api_get_commune_by_name(
     nom_commune: str,
     db: Session = Depends(get_db)
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, status, HTTPException, Depends, Query
+from typing import List
+import logging
+
+from schemas.etl import EtlJobCreate, EtlJobOut
+from deps import get_db, get_etl_jobs
+from core.jobs import ETLJobManager, JobConflictError, JobNotFoundError
+from sqlalchemy.orm import Session
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED, response_model=EtlJobOut)
+def start_etl_job(
+    options: EtlJobCreate,
+    db: Session = Depends(get_db),
+    jobs: ETLJobManager = Depends(get_etl_jobs)
+) -> EtlJobOut:
+    """
+    Starts an import of the communes in the background.
+
+    - **force**: Import even if the source is unchanged.
+    - **load_strategy**, **incremental**, **shadow_swap**, **pipelined**: Pipeline options.
+    """
+    try:
+        return jobs.start(db, options)
+    except JobConflictError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/jobs", status_code=status.HTTP_200_OK, response_model=List[EtlJobOut])
+def list_etl_jobs(
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    jobs: ETLJobManager = Depends(get_etl_jobs)
+) -> List[EtlJobOut]:
+    """
+    Lists the past and running imports, most recent first, with their statistics.
+    """
+    return jobs.list(db, limit)
+
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK, response_model=EtlJobOut)
+def get_etl_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    jobs: ETLJobManager = Depends(get_etl_jobs)
+) -> EtlJobOut:
+    """
+    Retrieves an import: status, rows processed per phase, ETA and statistics.
+    """
+    try:
+        return jobs.get(db, job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.post("/jobs/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED, response_model=EtlJobOut)
+def cancel_etl_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    jobs: ETLJobManager = Depends(get_etl_jobs)
+) -> EtlJobOut:
+    """
+    Requests the cancellation of a running import, applied between two batches.
+    """
+    try:
+        return jobs.cancel(db, job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except JobConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Request, Response, status
+import logging
+
+from schemas.etl import StartupStatus
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/live", status_code=status.HTTP_200_OK)
+def liveness() -> dict:
+    """
+    Tells that the process is up and serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready", status_code=status.HTTP_200_OK, response_model=StartupStatus)
+def readiness(request: Request, response: Response) -> StartupStatus:
+    """
+    Tells whether the startup import of the communes is over.
+
+    Returns 503 while the import is pending or running, 200 once it is over
+    (succeeded, failed, skipped or done by another worker).
+    """
+    startup_etl = getattr(request.app.state, "startup_etl", None)
+    if startup_etl is None:
+        return StartupStatus(ready=True, status="disabled")
+
+    report = startup_etl.to_status()
+    if not report.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from api.v1.endpoinds import commune
+from api.v1.endpoinds import commune, etl, health
 
 api_v1 = APIRouter()
 api_v1.include_router(commune.router, prefix="/commune", tags=["commune"])
+api_v1.include_router(etl.router, prefix="/etl", tags=["etl"])
+api_v1.include_router(health.router, prefix="/health", tags=["health"])
 
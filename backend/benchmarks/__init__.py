@@ -0,0 +1,4 @@
+"""
+Benchmarks du pipeline ETL des communes
+Lancer depuis backend/ : python -m benchmarks.<module>
+"""
@@ -0,0 +1,131 @@
+"""
+Benchmark mémoire et temps de DataTransformer.transform_data
+
+Usage : python -m benchmarks.bench_transform --rows 1000000 [--workers 4]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.etl.transform import DataTransformer
+
+
+def build_raw_dataframe(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a raw DataFrame shaped like the data.gouv.fr communes file.
+
+    Args:
+        rows: Number of rows.
+        seed: Random seed.
+
+    Returns:
+        DataFrame with the source columns, including a few unused ones.
+    """
+    rng = np.random.default_rng(seed)
+    postal_codes = rng.integers(1000, 98999, rows)
+    return pd.DataFrame({
+        'code_commune_INSEE': [f"{code:05d}" for code in rng.integers(1000, 98999, rows)],
+        'nom_commune_postal': [f"COMMUNE {i}" for i in range(rows)],
+        'code_postal': [f"{code:05d}" for code in postal_codes],
+        'libelle_acheminement': [f"COMMUNE {i}" for i in range(rows)],
+        'nom_commune_complet': [f"Commune {i % (rows // 2 + 1)}" for i in range(rows)],
+        'latitude': rng.uniform(41, 51, rows),
+        'longitude': rng.uniform(-5, 10, rows),
+    })
+
+
+def copying_transform(transformer: DataTransformer, raw_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Baseline: the transform with the defensive .copy() the steps used to
+    make of their whole input.
+
+    Args:
+        transformer: Transformer whose steps are chained.
+        raw_df: Source DataFrame.
+
+    Returns:
+        Transformed DataFrame, equal to transform_data's.
+    """
+    filtered_df = transformer.filter_required_columns(raw_df).copy()
+    cleaned_df = transformer.clean_data(filtered_df.copy())
+    with_departement = transformer.add_departement_column(cleaned_df.copy())
+    return transformer.add_search_key_column(with_departement.copy())
+
+
+def measure(transform: Callable[[pd.DataFrame], pd.DataFrame], raw_df: pd.DataFrame) -> Tuple[pd.DataFrame, float, int]:
+    """
+    Runs one transform under tracemalloc.
+
+    Args:
+        transform: Transform to measure.
+        raw_df: Source DataFrame.
+
+    Returns:
+        The result, the wall time in seconds and the peak traced memory in bytes.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = transform(raw_df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(rows: int, workers: int = 1) -> dict:
+    """
+    Measures the peak traced memory and wall time of one transform, against
+    the copying baseline (always serial).
+
+    Args:
+        rows: Number of input rows.
+        workers: Number of transform processes (peak memory only covers
+            the parent process).
+
+    Returns:
+        Dictionary of measurements.
+    """
+    raw_df = build_raw_dataframe(rows)
+    transformer = DataTransformer(workers=workers, parallel_min_rows=0)
+
+    baseline, baseline_elapsed, baseline_peak = measure(
+        lambda df: copying_transform(DataTransformer(workers=1), df), raw_df
+    )
+    del baseline
+    try:
+        result, elapsed, peak = measure(transformer.transform_data, raw_df)
+    finally:
+        transformer.close()
+
+    return {
+        'benchmark': 'transform_data',
+        'rows': rows,
+        'workers': workers,
+        'output_rows': len(result),
+        'seconds': round(elapsed, 3),
+        'peak_traced_mb': round(peak / 1e6, 1),
+        'baseline_seconds': round(baseline_elapsed, 3),
+        'baseline_peak_traced_mb': round(baseline_peak / 1e6, 1),
+        'peak_reduction_pct': round(100 * (1 - peak / baseline_peak), 1),
+        'input_mb': round(raw_df.memory_usage(deep=True).sum() / 1e6, 1),
+        'output_mb': round(result.memory_usage(deep=True).sum() / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500000, help="Nombre de lignes en entrée")
+    parser.add_argument('--workers', type=int, default=1, help="Nombre de processus de transformation")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.rows, args.workers), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Générateur de fichiers synthétiques de communes au format data.gouv.fr
+
+Usage : python -m benchmarks.generate --scale 1m --output /tmp/communes-1m.csv [--seed 0]
+
+Le fichier contient des codes postaux métropolitains, corses (2A/2B) et
+d'outre-mer (971 à 976, 986 à 988), des doublons exacts ou à la casse près
+et des lignes invalides (code postal mal formé ou absent, nom manquant).
+Un nom de fichier en .gz ou .zst produit une source compressée.
+"""
+
+import argparse
+import json
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Tailles de référence : le fichier réel compte environ 39 000 lignes
+SCALES: Dict[str, int] = {
+    '39k': 39_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+# Lignes générées et écrites par bloc, pour borner la mémoire à 10 millions de lignes
+GENERATION_CHUNK = 500_000
+
+COLUMNS = [
+    'code_commune_INSEE', 'nom_commune_postal', 'code_postal', 'libelle_acheminement', 'ligne_5',
+    'latitude', 'longitude', 'nom_commune_complet', 'code_departement',
+]
+_SCHEMA = pa.schema([(column, pa.float64() if column in ('latitude', 'longitude') else pa.string())
+                     for column in COLUMNS])
+
+# Préfixes à 3 chiffres des codes postaux : métropole hors Corse, Corse, outre-mer
+_METROPOLE = [f"{department:02d}" for department in range(1, 96) if department != 20]
+_CORSE = ["200", "201", "202", "206"]
+_OUTRE_MER = ["971", "972", "973", "974", "975", "976", "986", "987", "988"]
+
+_ARTICLES = ["", "", "", "Saint-", "Sainte-", "Le ", "La ", "Les ", "L'"]
+_RACINES = ["Mont", "Val", "Beau", "Ville", "Château", "Bois", "Fon", "Roche", "Pré", "Éze",
+            "Ham", "Cour", "Mesnil", "Font", "Bourg", "Lan", "Plou", "Ker", "Aix", "Île"]
+_FINALES = ["", "neuve", "mont", "ville", "court", "ac", "y", "é", "bourg", "ès", "champ", "heim",
+            "ange", "vert", "lieu", "dun", "fort", "val", "roux", "sart"]
+_COMPLEMENTS = ["", "", "", "", "-sur-Mer", "-en-Provence", "-lès-Bains", "-d'Azur", "-sur-Loire",
+                "-la-Forêt", " (Village)"]
+
+# Formes invalides rencontrées dans les exports : lettres, longueur, zéro initial perdu, vide
+_INVALID_CODES = np.array(["ABCDE", "7500", "750011", "2A004", "", "1000", "97 400"], dtype=object)
+
+
+def _names() -> np.ndarray:
+    """All the synthetic commune names (about 40 000)"""
+    return np.array([
+        f"{article}{racine}{finale}{complement}"
+        for article in _ARTICLES
+        for racine in _RACINES
+        for finale in _FINALES
+        for complement in _COMPLEMENTS
+    ], dtype=object)
+
+
+def _postal_codes(rng: np.random.Generator, rows: int) -> np.ndarray:
+    """Draws postal codes, with Corsica and overseas codes in realistic proportions"""
+    metropole = rng.choice(_METROPOLE, rows)
+    codes = np.char.add(metropole, np.char.zfill((rng.integers(0, 100, rows) * 10).astype(str), 3))
+
+    corse = rng.random(rows) < 0.012
+    codes[corse] = np.char.add(rng.choice(_CORSE, corse.sum()),
+                               np.char.zfill((rng.integers(0, 10, corse.sum()) * 10).astype(str), 2))
+    outre_mer = ~corse & (rng.random(rows) < 0.03)
+    codes[outre_mer] = np.char.add(rng.choice(_OUTRE_MER, outre_mer.sum()),
+                                   np.char.zfill((rng.integers(0, 10, outre_mer.sum()) * 10).astype(str), 2))
+    return codes.astype(object)
+
+
+def generate_dataframe(rows: int, seed: int = 0, duplicate_ratio: float = 0.02,
+                       dirty_ratio: float = 0.01) -> pd.DataFrame:
+    """
+    Builds a synthetic raw communes DataFrame.
+
+    Args:
+        rows: Number of rows.
+        seed: Random seed (same seed, same rows).
+        duplicate_ratio: Share of rows copying an earlier row, half of them
+            with a different case and surrounding spaces.
+        dirty_ratio: Share of rows with an invalid postal code or no name.
+
+    Returns:
+        DataFrame with the source columns.
+    """
+    rng = np.random.default_rng(seed)
+    all_names = _names()
+    all_upper_names = np.array([name.upper() for name in all_names], dtype=object)
+    name_indexes = rng.integers(0, len(all_names), rows)
+    postal_codes = _postal_codes(rng, rows)
+
+    duplicates = np.flatnonzero(rng.random(rows) < duplicate_ratio)
+    duplicates = duplicates[duplicates > 0]
+    originals = (rng.random(len(duplicates)) * duplicates).astype(np.int64)
+    postal_codes[duplicates] = postal_codes[originals]
+    name_indexes[duplicates] = name_indexes[originals]
+    names = all_names[name_indexes]
+    upper_names = all_upper_names[name_indexes]
+    variants = duplicates[rng.random(len(duplicates)) < 0.5]
+    names[variants] = [f"  {name.lower()} " for name in names[variants]]
+
+    dirty = np.flatnonzero(rng.random(rows) < dirty_ratio)
+    missing_name = dirty[rng.random(len(dirty)) < 0.3]
+    bad_code = np.setdiff1d(dirty, missing_name)
+    postal_codes[bad_code] = rng.choice(_INVALID_CODES, len(bad_code))
+    names[missing_name] = None
+    upper_names[missing_name] = None
+
+    return pd.DataFrame({
+        'code_commune_INSEE': np.char.zfill(rng.integers(1000, 97699, rows).astype(str), 5),
+        'nom_commune_postal': upper_names,
+        'code_postal': postal_codes,
+        'libelle_acheminement': upper_names,
+        'ligne_5': np.where(rng.random(rows) < 0.05, "LIEU-DIT", ""),
+        'latitude': rng.uniform(41.3, 51.1, rows).round(6),
+        'longitude': rng.uniform(-5.1, 9.6, rows).round(6),
+        'nom_commune_complet': names,
+        'code_departement': np.array([code[:2] for code in postal_codes], dtype=object),
+    }, columns=COLUMNS)
+
+
+def generate_csv(path: str, rows: int, seed: int = 0, duplicate_ratio: float = 0.02,
+                 dirty_ratio: float = 0.01) -> int:
+    """
+    Writes a synthetic communes CSV, block by block.
+
+    Args:
+        path: Output file (compressed according to its .gz / .zst extension).
+        rows: Number of rows.
+        seed: Random seed of the first block.
+        duplicate_ratio: See generate_dataframe.
+        dirty_ratio: See generate_dataframe.
+
+    Returns:
+        Number of rows written.
+    """
+    compression = 'gzip' if path.endswith('.gz') else 'zstd' if path.endswith('.zst') else None
+    sink = pa.CompressedOutputStream(path, compression) if compression else pa.OSFile(path, 'wb')
+    writer = None
+    written = 0
+    block = 0
+    try:
+        while written < rows:
+            size = min(GENERATION_CHUNK, rows - written)
+            df = generate_dataframe(size, seed=seed + block, duplicate_ratio=duplicate_ratio,
+                                    dirty_ratio=dirty_ratio)
+            table = pa.Table.from_pandas(df, schema=_SCHEMA, preserve_index=False)
+            if writer is None:
+                # Écrivain pyarrow : plusieurs fois plus rapide que DataFrame.to_csv à 10 millions de lignes
+                writer = pa_csv.CSVWriter(sink, _SCHEMA, write_options=pa_csv.WriteOptions(quoting_style='needed'))
+            writer.write_table(table)
+            written += size
+            block += 1
+    finally:
+        if writer is not None:
+            writer.close()
+        sink.close()
+    return written
+
+
+def parse_scale(scale: str) -> int:
+    """Number of rows of a named scale ("39k", "1m"...) or of an integer"""
+    return SCALES[scale] if scale in SCALES else int(scale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='39k', help=f"Nombre de lignes ou taille nommée ({', '.join(SCALES)})")
+    parser.add_argument('--output', required=True, help="Fichier CSV produit")
+    parser.add_argument('--seed', type=int, default=0, help="Graine aléatoire")
+    parser.add_argument('--duplicates', type=float, default=0.02, help="Part de lignes dupliquées")
+    parser.add_argument('--dirty', type=float, default=0.01, help="Part de lignes invalides")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate_csv(args.output, parse_scale(args.scale), args.seed, args.duplicates, args.dirty)
+    print(json.dumps({'output': args.output, 'rows': rows,
+                      'seconds': round(time.perf_counter() - start, 3)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,30 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 550
     CSV_COMMUNES_URL: str = "https://www.data.gouv.fr/fr/datasets/r/dbe8a621-a9c4-4bc3-9cae-be1699c5ff25"
+    ETL_CHUNK_SIZE: int = 0
+    ETL_CACHE_DIR: str = ""
+    ETL_CHECKPOINT_DIR: str = ""
+    ETL_TRACE_MEMORY: bool = False
+    ETL_REPORT_PATH: str = ""
+    ETL_CSV_PROFILE: str = "default"
+    ETL_DOWNLOAD_RETRIES: int = 5
+    ETL_DOWNLOAD_BACKOFF: float = 1.0
+    ETL_LOAD_STRATEGY: str = "orm"
+    ETL_BATCH_SIZE: int = 1000
+    ETL_BATCH_MIN: int = 100
+    ETL_BATCH_MAX: int = 20000
+    ETL_BATCH_TARGET_SECONDS: float = 1.0
+    ETL_LOAD_WORKERS: int = 1
+    ETL_QUARANTINE_PATH: str = ""
+    ETL_INCREMENTAL: bool = False
+    ETL_STALE_ROWS: str = "tombstone"
+    ETL_SHADOW_SWAP: bool = False
+    ETL_PIPELINED: bool = False
+    ETL_QUEUE_DEPTH: int = 2
+    ETL_TRANSFORM_WORKERS: int = 1
+    ETL_TRANSFORM_PARALLEL_MIN_ROWS: int = 200000
+    ETL_ON_STARTUP: bool = True
+    ETL_LOCK_FILE: str = ""
     class Config:
         env_file = ".env"
 
@@ -5,45 +5,401 @@ Orchestration des étapes Extract, Transform, Load
 
 import logging
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Set, Tuple
 
+from core.config import settings
+from core.etl.checkpoint import RunCheckpoint
 from core.etl.extract import DataExtractor
-from core.etl.transform import DataTransformer
-from core.etl.load import DataLoader
+from core.etl.transform import CommuneRecord, DataTransformer
+from core.etl.load import DataLoader, merge_import_stats
+from core.etl.metrics import RunInstrumentation, write_run_report
+from core.etl.progress import ProgressTracker
+from core.etl.shadow import drop_shadow_table, prepare_shadow_table, swap_shadow_table
+from core.etl.stages import StagePipeline
+from db.models.commune import Commune
 from schemas.commune import ImportStats
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
+# Taille des blocs du mode pipeliné quand aucune taille de bloc n'est configurée
+PIPELINED_CHUNK_SIZE = 50000
+
+
+def _merge_stats(total: ImportStats, part: ImportStats) -> ImportStats:
+    """Accumulates the statistics of one chunk into the running totals"""
+    merge_import_stats(total, part)
+    if part.duration_seconds is not None:
+        total.duration_seconds = round((total.duration_seconds or 0) + part.duration_seconds, 3)
+        if total.duration_seconds > 0:
+            total.rows_per_second = round(total.total_processed / total.duration_seconds, 1)
+    return total
+
 
 class CommunesETLPipeline:
     """Pipeline ETL complet pour l'import des communes"""
     
-    def __init__(self, db_session: Session, csv_url: str = None):
+    def __init__(self, db_session: Session, csv_url: str = None, chunk_size: Optional[int] = None,
+                 cache_dir: Optional[str] = None, load_strategy: Optional[str] = None,
+                 incremental: Optional[bool] = None, stale_rows: Optional[str] = None,
+                 load_workers: Optional[int] = None, shadow_swap: Optional[bool] = None,
+                 pipelined: Optional[bool] = None, queue_depth: Optional[int] = None,
+                 transform_workers: Optional[int] = None, progress: Optional[ProgressTracker] = None,
+                 checkpoint_dir: Optional[str] = None, trace_memory: Optional[bool] = None,
+                 report_path: Optional[str] = None, dry_run: bool = False, batch_size: Optional[int] = None):
         """
         Initialise le pipeline ETL
         
         Args:
             db_session: Session de base de données
+            csv_url: URL du CSV source (optionnel)
+            chunk_size: Nombre de lignes par bloc en mode streaming
+                (0 ou None : fichier traité en une seule fois, défaut : settings.ETL_CHUNK_SIZE)
+            cache_dir: Répertoire du cache local de la source (défaut : settings.ETL_CACHE_DIR)
+            load_strategy: Stratégie de chargement, "orm", "upsert" ou "copy"
+                (défaut : settings.ETL_LOAD_STRATEGY)
+            incremental: Traite aussi les communes disparues de la source
+                (défaut : settings.ETL_INCREMENTAL)
+            stale_rows: Traitement des communes disparues, "keep", "tombstone" ou "delete"
+                (défaut : settings.ETL_STALE_ROWS)
+            load_workers: Nombre de partitions chargées en parallèle
+                (défaut : settings.ETL_LOAD_WORKERS)
+            shadow_swap: Charge une copie de la table puis la substitue à communes
+                en une transaction (défaut : settings.ETL_SHADOW_SWAP)
+            pipelined: Exécute extraction, transformation et chargement en parallèle
+                sur des blocs reliés par des files bornées (défaut : settings.ETL_PIPELINED)
+            queue_depth: Nombre maximal de blocs en attente entre deux étapes du mode
+                pipeliné (défaut : settings.ETL_QUEUE_DEPTH)
+            transform_workers: Nombre de processus de transformation des gros fichiers
+                (défaut : settings.ETL_TRANSFORM_WORKERS)
+            progress: Suivi de l'avancement, vérifié entre les lots pour l'annulation
+                (défaut : suivi interne non annulable de l'extérieur)
+            checkpoint_dir: Répertoire des points de reprise, vide pour les désactiver
+                (défaut : settings.ETL_CHECKPOINT_DIR, nécessite le cache de la source)
+            trace_memory: Mesure le pic mémoire de chaque étape avec tracemalloc
+                (défaut : settings.ETL_TRACE_MEMORY)
+            report_path: Fichier du rapport JSON de l'import, vide pour ne pas l'écrire
+                (défaut : settings.ETL_REPORT_PATH)
+            dry_run: Calcule le delta (créations, modifications, inchangées, obsolètes)
+                sans rien écrire en base
+            batch_size: Nombre de lignes du premier lot chargé (défaut : settings.ETL_BATCH_SIZE)
         """
         self.db = db_session
-        self.extractor = DataExtractor(csv_url=csv_url)
-        self.transformer = DataTransformer()
-        self.loader = DataLoader(db_session)
+        self.chunk_size = settings.ETL_CHUNK_SIZE if chunk_size is None else chunk_size
+        self.extractor = DataExtractor(csv_url=csv_url, cache_dir=cache_dir)
+        self.transformer = DataTransformer(workers=transform_workers)
+        self.progress = progress or ProgressTracker()
+        self.dry_run = dry_run
+        self.loader = DataLoader(db_session, strategy=load_strategy, workers=load_workers, progress=self.progress,
+                                 dry_run=dry_run, batch_size=batch_size)
+        self.incremental = settings.ETL_INCREMENTAL if incremental is None else incremental
+        self.stale_rows = stale_rows or settings.ETL_STALE_ROWS
+        # Dry run : pas de table fantôme, rien n'est écrit
+        self.shadow_swap = not dry_run and (settings.ETL_SHADOW_SWAP if shadow_swap is None else shadow_swap)
+        self.pipelined = settings.ETL_PIPELINED if pipelined is None else pipelined
+        self.queue_depth = queue_depth or settings.ETL_QUEUE_DEPTH
+        self.checkpoint_dir = settings.ETL_CHECKPOINT_DIR if checkpoint_dir is None else checkpoint_dir
+        self.checkpoint: Optional[RunCheckpoint] = None
+        self._seen_keys: Set[Tuple[str, str]] = set()
+        self._resume_skip = 0
+        self._load_finished = False
+        self.trace_memory = settings.ETL_TRACE_MEMORY if trace_memory is None else trace_memory
+        self.report_path = settings.ETL_REPORT_PATH if report_path is None else report_path
+        self.instrumentation = RunInstrumentation(trace_memory=self.trace_memory)
     
-    def run_full_pipeline(self) -> ImportStats:
+    def run_full_pipeline(self, force: bool = False) -> ImportStats:
         """
         Runs the complete ETL pipeline
 
+        When the source cache is enabled, the source is refreshed with a
+        conditional request first and the transform and load phases are
+        skipped if it has not changed since the last successful import.
+
+        Unchanged rows are never rewritten (content hash). In incremental
+        mode, the communes missing from the source are then handled according
+        to stale_rows, only if the whole source was loaded without error.
+
+        With shadow_swap, the load goes to a copy of the table, swapped in
+        only if the whole run succeeded: readers never see a partial load.
+
+        With pipelined, extract, transform and load run concurrently on
+        chunks (see run_pipelined_pipeline); otherwise chunk_size selects
+        the streaming or the whole-file mode.
+
+        With checkpoint_dir (and the source cache), the committed position is
+        recorded after each batch: a run interrupted, or stopped by a database
+        error, against the same source snapshot resumes after the last
+        committed batch (see _open_checkpoint). The checkpoint is only
+        discarded once the whole source was loaded without error.
+
+        Each phase and each load batch is measured (wall and CPU time,
+        throughput, database round trips, peak memory with trace_memory):
+        see ImportStats.phases. With report_path, the statistics are also
+        written as a JSON run report, the only place holding the per-batch
+        measures (ImportStats.batches), too many to store with the run.
+
+        With dry_run, the delta is computed against the database (stale rows
+        only counted) and nothing is written: neither the database, nor the
+        loaded marker of the source cache, nor checkpoints.
+
+        Args:
+        force: Run the transform and load phases even if the source is unchanged
+
+        Returns:
+        Import statistics
+        """
+        self.instrumentation = RunInstrumentation(trace_memory=self.trace_memory)
+        self.instrumentation.start(self.db.get_bind() if self.db is not None else None)
+        self.loader.instrumentation = self.instrumentation
+        on_checkpoint = self.progress.on_checkpoint
+        if on_checkpoint is not None:
+            # Publication de l'avancement (jobs) : requêtes hors des mesures de l'import
+            def publish(tracker: ProgressTracker) -> None:
+                with self.instrumentation.in_phase(None):
+                    on_checkpoint(tracker)
+            self.progress.on_checkpoint = publish
+        try:
+            stats = self._run(force)
+        finally:
+            self.instrumentation.stop()
+            self.loader.instrumentation = None
+            self.progress.on_checkpoint = on_checkpoint
+
+        stats.phases = self.instrumentation.phase_stats()
+        stats.peak_memory_bytes = self.instrumentation.peak_memory
+        for phase in stats.phases:
+            logger.info(f"Mesures {phase.name} : {phase.rows} lignes en {phase.wall_seconds}s "
+                        f"(CPU {phase.cpu_seconds}s, {phase.db_round_trips} requêtes)")
+
+        if self.report_path:
+            self._write_report(stats)
+        return stats
+
+    def _write_report(self, stats: ImportStats) -> None:
+        """Writes the JSON run report, without failing the run on error"""
+        try:
+            write_run_report(
+                self.report_path, stats.model_copy(update={'batches': self.instrumentation.batches or None}),
+                source=self.extractor.csv_url,
+                options={
+                    'mode': "pipelined" if self.pipelined else "streaming" if self.chunk_size else "batch",
+                    'chunk_size': self.chunk_size,
+                    'load_strategy': self.loader.strategy,
+                    'load_workers': self.loader.workers,
+                    'transform_workers': self.transformer.workers,
+                    'incremental': self.incremental,
+                    'shadow_swap': self.shadow_swap,
+                    'trace_memory': self.trace_memory,
+                    'dry_run': self.dry_run,
+                },
+            )
+            logger.info(f"Rapport d'import écrit : {self.report_path}")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture du rapport d'import : {str(e)}")
+
+    def _run(self, force: bool) -> ImportStats:
+        """Runs the pipeline once the instrumentation is started (see run_full_pipeline)"""
+        if self.extractor.cache is not None:
+            with self.instrumentation.measure("extract"):
+                source_path = self.extractor.refresh_source()
+            if source_path is None:
+                error_msg = "Échec de l'extraction des données"
+                logger.error(error_msg)
+                return ImportStats(
+                    total_processed=0,
+                    total_imported=0,
+                    total_updated=0,
+                    errors=[error_msg]
+                )
+
+            if not force and not self.dry_run and self.extractor.source_changed is False:
+                logger.info("Source inchangée depuis le dernier import : transformation et chargement ignorés")
+                return ImportStats(
+                    total_processed=0,
+                    total_imported=0,
+                    total_updated=0,
+                    errors=[],
+                    source_unchanged=True
+                )
+
+        if self.shadow_swap:
+            try:
+                self.loader.table = prepare_shadow_table(self.db)
+            except Exception as e:
+                error_msg = f"Erreur lors de la préparation de la table fantôme : {str(e)}"
+                logger.error(error_msg)
+                self.db.rollback()
+                return ImportStats(
+                    total_processed=0,
+                    total_imported=0,
+                    total_updated=0,
+                    errors=[error_msg]
+                )
+
+        self._seen_keys = set()
+        self._load_finished = False
+        self.checkpoint = self._open_checkpoint()
+        resumed_from = self.checkpoint.offset if self.checkpoint else 0
+        self._resume_skip = resumed_from
+        if self.checkpoint is not None:
+            self.loader.on_committed = self.checkpoint.advance
+        try:
+            if self.pipelined:
+                stats = self.run_pipelined_pipeline()
+            elif self.chunk_size:
+                stats = self.run_streaming_pipeline()
+            else:
+                stats = self._run_batch_pipeline()
+
+            if self.incremental and not stats.errors:
+                self._remove_stale_communes(stats)
+
+            if self.shadow_swap:
+                self._swap_shadow_table(stats)
+        finally:
+            self.loader.table = Commune.__table__
+            self.loader.on_committed = None
+            # Index des clés propre à cet import (table fantôme, lignes retirées)
+            self.loader.reset_key_index()
+            # Processus de transformation partagés par les chunks de cet import
+            self.transformer.close()
+
+        if resumed_from:
+            stats.resumed_from = resumed_from
+        if self.checkpoint is not None:
+            if self._load_finished and not stats.errors:
+                # Source entièrement parcourue sans erreur : plus rien à reprendre
+                self.checkpoint.discard()
+
+        if self.dry_run:
+            stats.dry_run = True
+        elif self.extractor.cache is not None and not stats.errors:
+            self.extractor.cache.mark_loaded()
+
+        return stats
+
+    def _checkpoint_chunk_size(self) -> int:
+        """Chunk size of the selected mode, which fixes the order of the loaded records"""
+        if self.pipelined:
+            return self.chunk_size or PIPELINED_CHUNK_SIZE
+        return self.chunk_size or 0
+
+    def _open_checkpoint(self) -> Optional[RunCheckpoint]:
+        """
+        Opens the checkpoint of the run, resuming the one left by an
+        interrupted run against the same source snapshot.
+
+        Checkpoints need the source cache: the cached file is the snapshot
+        the committed position refers to. They are disabled with
+        shadow_swap, whose table is rebuilt by every run.
+
+        Returns:
+            The checkpoint, or None if checkpoints are disabled.
+        """
+        if not self.checkpoint_dir or self.dry_run:
+            return None
+        if self.extractor.cache is None:
+            logger.warning("Points de reprise ignorés : ils nécessitent le cache de la source (ETL_CACHE_DIR)")
+            return None
+        if self.shadow_swap:
+            logger.warning("Points de reprise ignorés : la table fantôme est reconstruite à chaque import")
+            return None
+
+        source_sha256 = self.extractor.cache.load_metadata().get('sha256')
+        if not source_sha256:
+            return None
+
+        checkpoint = RunCheckpoint(self.checkpoint_dir, source_sha256, self._checkpoint_chunk_size())
+        if checkpoint.load():
+            logger.info(f"Reprise de l'import interrompu après {checkpoint.offset} lignes validées")
+        else:
+            checkpoint.save()
+        return checkpoint
+
+    def _track_keys(self, records: Iterable[CommuneRecord]) -> Iterator[CommuneRecord]:
+        """Records the keys of the streamed rows for the incremental mode"""
+        for record in records:
+            self._seen_keys.add((record.code_postal, record.nom_commune_complet))
+            yield record
+
+    def _records(self, df) -> Iterable[CommuneRecord]:
+        """Streams the records of a transformed DataFrame to the loader"""
+        if self._resume_skip:
+            # Lignes validées par l'import interrompu : seules leurs clés sont conservées
+            skipped = df.iloc[:self._resume_skip]
+            df = df.iloc[self._resume_skip:]
+            self._resume_skip -= len(skipped)
+            if self.incremental:
+                self._seen_keys.update(zip(skipped['code_postal'], skipped['nom_commune_complet']))
+        records = self.transformer.iter_records(df)
+        return self._track_keys(records) if self.incremental else records
+
+    def _remove_stale_communes(self, stats: ImportStats) -> None:
+        """
+        Applies the removal part of the delta once the whole source is loaded.
+
+        Args:
+            stats: Statistics of the run, updated in place.
+        """
+        if not self._seen_keys:
+            logger.warning("Aucune commune lue dans la source : communes obsolètes conservées")
+            return
+
+        try:
+            stats.total_removed = self.loader.remove_stale(self._seen_keys,
+                                                           "keep" if self.dry_run else self.stale_rows)
+            logger.info(f"DELTA : {stats.total_imported} créées, {stats.total_updated} modifiées, "
+                        f"{stats.total_removed} supprimées, {stats.total_unchanged} inchangées")
+        except Exception as e:
+            error_msg = f"Erreur lors du traitement des communes obsolètes : {str(e)}"
+            logger.error(error_msg)
+            self.db.rollback()
+            stats.errors.append(error_msg)
+
+    def _swap_shadow_table(self, stats: ImportStats) -> None:
+        """
+        Swaps the loaded shadow table in, or drops it if the run had errors.
+
+        Args:
+            stats: Statistics of the run, updated in place.
+        """
+        if stats.errors:
+            logger.warning("Chargement en erreur : la table communes n'est pas remplacée")
+            drop_shadow_table(self.db)
+            return
+
+        try:
+            swap_shadow_table(self.db, self.loader.table)
+        except Exception as e:
+            error_msg = f"Erreur lors de la bascule de la table fantôme : {str(e)}"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
+            drop_shadow_table(self.db)
+
+    def _run_batch_pipeline(self) -> ImportStats:
+        """
+        Runs the ETL pipeline on the whole file at once
+
         Returns:
         Import statistics
         """
         logger.info("=== DÉBUT DU PIPELINE ETL ===")
         
         try:
+            if self.checkpoint is not None and self.checkpoint.has_artifact:
+                # Reprise : extraction et transformation déjà faites par l'import interrompu
+                with self.instrumentation.measure("transform") as measure:
+                    transformed_df = self.checkpoint.read_artifact()
+                    measure.rows = len(transformed_df)
+                logger.info(f"Artefact transformé réutilisé : {len(transformed_df)} lignes")
+                self.progress.expected_rows = len(transformed_df)
+                return self._load_transformed(transformed_df)
+
             # EXTRACT : Téléchargement et lecture du CSV
             logger.info("Phase EXTRACT : Téléchargement du CSV")
-            raw_df = self.extractor.extract_dataframe()
+            with self.instrumentation.measure("extract") as measure:
+                raw_df = self.extractor.extract_dataframe()
+                measure.rows = 0 if raw_df is None else len(raw_df)
             
             if raw_df is None or raw_df.empty:
                 error_msg = "Échec de l'extraction des données"
@@ -56,10 +412,14 @@ class CommunesETLPipeline:
                 )
             
             logger.info(f"EXTRACT terminé : {len(raw_df)} lignes extraites")
+            self.progress.advance("extract", len(raw_df))
+            self.progress.checkpoint()
             
             # TRANSFORM : Nettoyage et transformation
             logger.info("Phase TRANSFORM : Transformation des données")
-            transformed_df = self.transformer.transform_data(raw_df)
+            with self.instrumentation.measure("transform") as measure:
+                transformed_df = self.transformer.transform_data(raw_df)
+                measure.rows = len(transformed_df)
             
             if transformed_df.empty:
                 error_msg = "Aucune donnée valide après transformation"
@@ -72,16 +432,16 @@ class CommunesETLPipeline:
                 )
             
             logger.info(f"TRANSFORM terminé : {len(transformed_df)} lignes prêtes")
-            
-            logger.info("Phase LOAD : Chargement en base de données")
-            communes_data = self.transformer.to_dict_list(transformed_df)
+            self.progress.advance("transform", len(transformed_df))
+            if self.progress.expected_rows is None:
+                self.progress.expected_rows = len(transformed_df)
+            self.progress.checkpoint()
 
-            stats = self.loader.load_communes(communes_data)
-            
-            logger.info(f"LOAD terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour")
-            
-            logger.info("=== PIPELINE ETL TERMINÉ AVEC SUCCÈS ===")
-            return stats
+            if self.checkpoint is not None:
+                with self.instrumentation.measure("transform"):
+                    self.checkpoint.write_artifact(transformed_df)
+
+            return self._load_transformed(transformed_df)
             
         except Exception as e:
             error_msg = f"Erreur critique dans le pipeline ETL : {str(e)}"
@@ -92,4 +452,153 @@ class CommunesETLPipeline:
                 total_updated=0,
                 errors=[error_msg]
             )
-    
\ No newline at end of file
+
+    def _load_transformed(self, transformed_df) -> ImportStats:
+        """Load phase of the whole-file mode"""
+        logger.info("Phase LOAD : Chargement en base de données")
+        communes_data = self._records(transformed_df)
+
+        with self.instrumentation.measure("load") as measure:
+            stats = self.loader.load_communes(communes_data)
+            measure.rows = stats.total_processed
+        self._load_finished = True
+
+        logger.info(f"LOAD terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour")
+
+        logger.info("=== PIPELINE ETL TERMINÉ AVEC SUCCÈS ===")
+        return stats
+
+    def run_streaming_pipeline(self) -> ImportStats:
+        """
+        Runs the ETL pipeline chunk by chunk.
+
+        Each chunk streamed from the source is transformed and loaded before
+        the next one is read, so the whole file is never held in memory.
+        Duplicates spanning two chunks are resolved by the loader, which
+        updates the row committed with the previous chunk.
+
+        Returns:
+        Import statistics aggregated over all chunks
+        """
+        logger.info(f"=== DÉBUT DU PIPELINE ETL (STREAMING, blocs de {self.chunk_size} lignes) ===")
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+        chunks_count = 0
+
+        try:
+            raw_chunks = self.instrumentation.iterate("extract", self.extractor.stream_dataframes(self.chunk_size))
+            for raw_chunk in raw_chunks:
+                chunks_count += 1
+                self.progress.advance("extract", len(raw_chunk))
+                self.progress.checkpoint()
+
+                with self.instrumentation.measure("transform") as measure:
+                    transformed_chunk = self.transformer.transform_data(raw_chunk)
+                    measure.rows = len(transformed_chunk)
+                self.progress.advance("transform", len(transformed_chunk))
+                if transformed_chunk.empty:
+                    logger.warning(f"Bloc {chunks_count} : aucune donnée valide après transformation")
+                    continue
+
+                communes_data = self._records(transformed_chunk)
+                with self.instrumentation.measure("load") as measure:
+                    chunk_stats = self.loader.load_communes(communes_data)
+                    measure.rows = chunk_stats.total_processed
+                _merge_stats(stats, chunk_stats)
+
+                logger.info(f"Bloc {chunks_count} chargé : {stats.total_processed} lignes traitées au total")
+
+        except Exception as e:
+            error_msg = f"Erreur critique dans le pipeline ETL : {str(e)}"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
+            return stats
+
+        if chunks_count == 0:
+            error_msg = "Échec de l'extraction des données"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
+            return stats
+
+        self._load_finished = True
+        logger.info(f"LOAD terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour "
+                    f"({chunks_count} blocs)")
+        logger.info("=== PIPELINE ETL TERMINÉ AVEC SUCCÈS ===")
+        return stats
+
+    def run_pipelined_pipeline(self) -> ImportStats:
+        """
+        Runs the ETL pipeline as concurrent stages on chunks.
+
+        The extract stage (download and parsing, the parser reading the HTTP
+        stream directly) and the transform stage run in their own threads;
+        the load stage runs in the calling thread, which owns the session.
+        Bounded queues connect the stages, so the network, the CPU and the
+        database work at the same time while at most queue_depth chunks wait
+        between two stages.
+
+        Returns:
+        Import statistics aggregated over all chunks, with per-stage statistics
+        """
+        chunk_size = self.chunk_size or PIPELINED_CHUNK_SIZE
+        logger.info(f"=== DÉBUT DU PIPELINE ETL (PIPELINÉ, blocs de {chunk_size} lignes, "
+                    f"files de {self.queue_depth} blocs) ===")
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+
+        def transform(raw_chunk):
+            self.progress.advance("extract", len(raw_chunk))
+            self.progress.checkpoint()
+            with self.instrumentation.measure("transform") as measure:
+                transformed_chunk = self.transformer.transform_data(raw_chunk)
+                communes_data = list(self._records(transformed_chunk))
+                measure.rows = len(transformed_chunk)
+            self.progress.advance("transform", len(transformed_chunk))
+            if transformed_chunk.empty:
+                logger.warning("Bloc ignoré : aucune donnée valide après transformation")
+                return None
+            return communes_data
+
+        def load(communes_data):
+            with self.instrumentation.measure("load") as measure:
+                chunk_stats = self.loader.load_communes(communes_data)
+                measure.rows = chunk_stats.total_processed
+            _merge_stats(stats, chunk_stats)
+            logger.info(f"Bloc chargé : {stats.total_processed} lignes traitées au total")
+
+        stages = StagePipeline(
+            "extract", self.instrumentation.iterate("extract", self.extractor.stream_dataframes(chunk_size)),
+            [("transform", transform)],
+            "load", load,
+            queue_depth=self.queue_depth
+        )
+
+        try:
+            stages.run()
+            self._load_finished = True
+        except Exception as e:
+            error_msg = f"Erreur critique dans le pipeline ETL : {str(e)}"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
+        stats.stages = stages.stage_stats()
+
+        if not stats.errors and stats.stages[0].items == 0:
+            error_msg = "Échec de l'extraction des données"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
+
+        if not stats.errors:
+            logger.info(f"LOAD terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour "
+                        f"({stats.stages[0].items} blocs)")
+            logger.info("=== PIPELINE ETL TERMINÉ AVEC SUCCÈS ===")
+        return stats
@@ -0,0 +1,125 @@
+"""
+Import des communes en ligne de commande, hors des pods de l'API
+
+Usage : python -m core.etl [SOURCE] [--strategy copy] [--load-workers 4] [--dry-run] [--report rapport.json]
+
+SOURCE est une URL ou un fichier local (éventuellement .gz / .zst) déposé à
+l'avance, lu sans accès réseau (défaut : settings.CSV_COMMUNES_URL).
+Les options absentes reprennent les réglages ETL_* de la configuration.
+
+Codes de sortie : 0 import réussi, 1 import en erreur, 75 import déjà en cours.
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.config import settings
+from core.etl import CommunesETLPipeline
+from core.etl.load import LOAD_STRATEGIES, STALE_ROW_MODES
+from core.lock import EtlLock
+from db.base import Base
+from schemas.commune import ImportStats
+
+logger = logging.getLogger("core.etl")
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+# EX_TEMPFAIL : l'ordonnanceur peut relancer plus tard
+EXIT_LOCKED = 75
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m core.etl", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', help="URL ou fichier local du CSV des communes")
+    parser.add_argument('--database-url', help="URL de la base (défaut : settings.DATABASE_URL)")
+    parser.add_argument('--strategy', choices=LOAD_STRATEGIES, help="Stratégie de chargement")
+    parser.add_argument('--batch-size', type=int, help="Lignes du premier lot chargé")
+    parser.add_argument('--load-workers', type=int, help="Partitions chargées en parallèle")
+    parser.add_argument('--transform-workers', type=int, help="Processus de transformation")
+    parser.add_argument('--chunk-size', type=int, help="Lignes par bloc (0 : fichier entier)")
+    parser.add_argument('--pipelined', action=argparse.BooleanOptionalAction,
+                        help="Extraction, transformation et chargement en parallèle")
+    parser.add_argument('--incremental', action=argparse.BooleanOptionalAction,
+                        help="Traite les communes disparues de la source")
+    parser.add_argument('--stale-rows', choices=STALE_ROW_MODES, help="Traitement des communes disparues")
+    parser.add_argument('--shadow-swap', action=argparse.BooleanOptionalAction,
+                        help="Charge une copie de la table puis la substitue")
+    parser.add_argument('--cache-dir', help="Répertoire du cache de la source (URL uniquement)")
+    parser.add_argument('--checkpoint-dir', help="Répertoire des points de reprise")
+    parser.add_argument('--force', action='store_true', help="Importe même si la source est inchangée")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Affiche le delta (créations, modifications, obsolètes) sans rien écrire")
+    parser.add_argument('--report', help="Fichier du rapport JSON de l'import")
+    parser.add_argument('--trace-memory', action=argparse.BooleanOptionalAction,
+                        help="Mesure le pic mémoire de chaque étape")
+    parser.add_argument('--wait', action='store_true', help="Attend la fin d'un import déjà en cours")
+    parser.add_argument('--log-level', default="INFO", help="Niveau des journaux (défaut : INFO)")
+    return parser.parse_args(argv)
+
+
+def run_import(args: argparse.Namespace) -> Optional[ImportStats]:
+    """
+    Runs the import described by the command-line options.
+
+    The import runs under the same lock as the imports of the API, so that
+    a batch job never overlaps them. A dry run takes no lock and creates no
+    table: it only reads the database.
+
+    Args:
+        args: Parsed options.
+
+    Returns:
+        Import statistics, or None if another import is running.
+    """
+    engine = create_engine(args.database_url or settings.DATABASE_URL, pool_pre_ping=True)
+    lock = None
+    try:
+        if not args.dry_run:
+            Base.metadata.create_all(bind=engine)
+            lock = EtlLock(engine)
+            if not lock.acquire(blocking=args.wait):
+                return None
+
+        with sessionmaker(bind=engine)() as session:
+            pipeline = CommunesETLPipeline(
+                session, args.source or settings.CSV_COMMUNES_URL,
+                chunk_size=args.chunk_size, cache_dir=args.cache_dir, load_strategy=args.strategy,
+                incremental=args.incremental, stale_rows=args.stale_rows, load_workers=args.load_workers,
+                shadow_swap=args.shadow_swap, pipelined=args.pipelined, transform_workers=args.transform_workers,
+                checkpoint_dir=args.checkpoint_dir, trace_memory=args.trace_memory, report_path=args.report,
+                dry_run=args.dry_run, batch_size=args.batch_size
+            )
+            return pipeline.run_full_pipeline(force=args.force)
+    finally:
+        if lock is not None:
+            lock.release()
+        engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Journaux sur stderr : stdout ne reçoit que les statistiques JSON
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s : %(message)s")
+
+    stats = run_import(args)
+    if stats is None:
+        logger.error("Un import des communes est déjà en cours (relancer plus tard ou utiliser --wait)")
+        return EXIT_LOCKED
+
+    if stats.dry_run:
+        logger.info(f"Dry run : {stats.total_imported} créations, {stats.total_updated} modifications, "
+                    f"{stats.total_unchanged} inchangées, {stats.total_removed} obsolètes (rien n'a été écrit)")
+    # Détail par lot dans le rapport (--report) uniquement
+    print(stats.model_dump_json(indent=2, exclude={'batches'}))
+    return EXIT_FAILED if stats.errors else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
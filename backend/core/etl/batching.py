@@ -0,0 +1,87 @@
+import logging
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Facteur maximal d'évolution de la taille entre deux lots, pour éviter les oscillations
+MAX_STEP_FACTOR = 2.0
+
+
+class AdaptiveBatchSizer:
+    """Taille des lots de chargement ajustée vers une durée de transaction cible"""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_seconds: float,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        Initializes the sizer.
+
+        Args:
+            initial: Size of the first batch.
+            minimum: Smallest batch size (lowered to initial if needed).
+            maximum: Largest batch size (raised to initial if needed).
+            target_seconds: Target duration of one batch transaction, 0 to
+                keep the initial size.
+            clock: Time source, in seconds.
+        """
+        self.minimum = max(1, min(minimum, initial))
+        self.maximum = max(maximum, initial)
+        self.size = initial
+        self.target_seconds = target_seconds
+        self.clock = clock
+        self.last_seconds: Optional[float] = None
+        self.last_rows_per_second: Optional[float] = None
+
+    @property
+    def adaptive(self) -> bool:
+        """Tells whether the size follows the measured durations"""
+        return self.target_seconds > 0
+
+    def batches(self, items: Iterable[T]) -> Iterator[List[T]]:
+        """
+        Groups a stream of items into lists of the current batch size.
+
+        Args:
+            items: Stream of items.
+
+        Yields:
+            Lists of at most self.size items, the size being read before each batch.
+        """
+        iterator = iter(items)
+        while True:
+            batch = list(islice(iterator, self.size))
+            if not batch:
+                return
+            yield batch
+
+    def record(self, rows: int, seconds: float) -> int:
+        """
+        Records the duration of one batch and adjusts the next batch size.
+
+        A batch shorter than the current size (end of stream) is measured
+        but does not change the size.
+
+        Args:
+            rows: Number of rows of the batch.
+            seconds: Duration of the batch transaction, commit included.
+
+        Returns:
+            The size of the next batch.
+        """
+        self.last_seconds = seconds
+        self.last_rows_per_second = rows / seconds if seconds > 0 else None
+        if not self.adaptive or rows < self.size:
+            return self.size
+
+        ideal = rows * self.target_seconds / seconds if seconds > 0 else self.size * MAX_STEP_FACTOR
+        ideal = min(max(ideal, self.size / MAX_STEP_FACTOR), self.size * MAX_STEP_FACTOR)
+        new_size = int(min(max(ideal, self.minimum), self.maximum))
+
+        if new_size != self.size:
+            logger.debug(f"Taille de lot : {self.size} -> {new_size} "
+                         f"({seconds:.3f}s, {self.last_rows_per_second or 0:.0f} lignes/s)")
+            self.size = new_size
+        return self.size
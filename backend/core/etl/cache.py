@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SourceCache:
+    """Cache disque du dernier fichier source téléchargé et de ses métadonnées HTTP"""
+
+    def __init__(self, cache_dir: str, source_url: str):
+        """
+        Initializes the cache for one source URL.
+
+        Args:
+            cache_dir: Directory holding the cached files.
+            source_url: URL of the source file (one cache entry per URL).
+        """
+        self.cache_dir = cache_dir
+        self.source_url = source_url
+
+        key = hashlib.sha1(source_url.encode('utf-8')).hexdigest()[:16]
+        self.data_path = os.path.join(cache_dir, f"source-{key}.data")
+        self.meta_path = os.path.join(cache_dir, f"source-{key}.json")
+        self.partial_path = f"{self.data_path}.part"
+
+    def load_metadata(self) -> Dict[str, Any]:
+        """
+        Reads the metadata of the cached file.
+
+        Returns:
+            Metadata dictionary, empty if nothing usable is cached.
+        """
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.data_path):
+            return {}
+
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Métadonnées du cache illisibles, cache ignoré : {e}")
+            return {}
+
+    def save_metadata(self, metadata: Dict[str, Any]) -> None:
+        """
+        Atomically writes the metadata of the cached file.
+
+        Args:
+            metadata: Metadata dictionary.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """
+        Builds the conditional request headers for the cached version.
+
+        Returns:
+            If-None-Match / If-Modified-Since headers (empty if nothing is cached).
+        """
+        metadata = self.load_metadata()
+        headers = {}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            headers['If-Modified-Since'] = metadata['last_modified']
+        return headers
+
+    def store(self, chunks: Iterable[bytes], etag: Optional[str], last_modified: Optional[str]) -> Dict[str, Any]:
+        """
+        Writes a new version of the source file from an iterable of bytes.
+
+        Args:
+            chunks: Iterable of raw byte chunks of the file.
+            etag: ETag header of the response.
+            last_modified: Last-Modified header of the response.
+
+        Returns:
+            The updated metadata.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.partial_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return self.commit(etag, last_modified)
+
+    def commit(self, etag: Optional[str], last_modified: Optional[str]) -> Dict[str, Any]:
+        """
+        Promotes the completed partial download to the cached source file.
+
+        The previous version is only replaced once the new one is complete.
+
+        Args:
+            etag: ETag header of the response.
+            last_modified: Last-Modified header of the response.
+
+        Returns:
+            The updated metadata.
+        """
+        previous = self.load_metadata()
+
+        digest = hashlib.sha256()
+        size = 0
+        with open(self.partial_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(self.partial_path, self.data_path)
+
+        metadata = {
+            'url': self.source_url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'sha256': digest.hexdigest(),
+            'size': size,
+            'loaded_sha256': previous.get('loaded_sha256'),
+        }
+        self.save_metadata(metadata)
+        logger.info(f"Source mise en cache : {self.data_path} ({size} bytes)")
+        return metadata
+
+    def is_loaded(self) -> bool:
+        """
+        Tells whether the cached file has already been loaded successfully.
+
+        Returns:
+            True if the cached content hash matches the last loaded one.
+        """
+        metadata = self.load_metadata()
+        return bool(metadata.get('sha256')) and metadata.get('sha256') == metadata.get('loaded_sha256')
+
+    def mark_loaded(self) -> None:
+        """Records the cached file as successfully loaded in database"""
+        metadata = self.load_metadata()
+        if not metadata:
+            return
+        metadata['loaded_sha256'] = metadata.get('sha256')
+        self.save_metadata(metadata)
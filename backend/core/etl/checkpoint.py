@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+from typing import Any, Dict
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = "checkpoint.json"
+ARTIFACT_FILE = "checkpoint-transformed.arrow"
+
+
+class RunCheckpoint:
+    """Point de reprise d'un import : instantané de la source, artefact transformé et position validée"""
+
+    def __init__(self, checkpoint_dir: str, source_sha256: str, chunk_size: int):
+        """
+        Initializes the checkpoint of a run.
+
+        A checkpoint only applies to the same source snapshot (content hash
+        of the cached file) read with the same chunking, so that the records
+        reach the loader in the same order and the committed offset points
+        to the same row.
+
+        Args:
+            checkpoint_dir: Directory holding the checkpoint files.
+            source_sha256: Content hash of the cached source file.
+            chunk_size: Chunk size of the run (0 for the whole-file mode).
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.source_sha256 = source_sha256
+        self.chunk_size = chunk_size
+        self.meta_path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+        self.artifact_path = os.path.join(checkpoint_dir, ARTIFACT_FILE)
+        self.offset = 0
+        self.has_artifact = False
+
+    def _metadata(self) -> Dict[str, Any]:
+        return {
+            'source_sha256': self.source_sha256,
+            'chunk_size': self.chunk_size,
+            'offset': self.offset,
+            'artifact': self.has_artifact,
+        }
+
+    def load(self) -> bool:
+        """
+        Reads the checkpoint left by an interrupted run.
+
+        A checkpoint for another snapshot or another chunking is discarded.
+
+        Returns:
+            True if the run can resume from it.
+        """
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Point de reprise illisible, ignoré : {e}")
+            self.discard()
+            return False
+
+        if metadata.get('source_sha256') != self.source_sha256 or metadata.get('chunk_size') != self.chunk_size:
+            logger.info("Point de reprise d'une autre version de la source : ignoré")
+            self.discard()
+            return False
+
+        self.offset = int(metadata.get('offset', 0))
+        self.has_artifact = bool(metadata.get('artifact')) and os.path.exists(self.artifact_path)
+        return True
+
+    def save(self) -> None:
+        """Atomically writes the checkpoint metadata"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._metadata(), f)
+        os.replace(tmp_path, self.meta_path)
+
+    def advance(self, rows: int) -> None:
+        """
+        Records rows committed (or quarantined) by the loader.
+
+        Args:
+            rows: Number of records of the committed batch.
+        """
+        self.offset += rows
+        self.save()
+
+    def write_artifact(self, df: pd.DataFrame) -> None:
+        """
+        Stores the transformed DataFrame, so that a resumed run skips the
+        extract and transform phases.
+
+        The artifact is a Feather file, written with pyarrow. Without
+        pyarrow, nothing is stored: a resumed run transforms the cached
+        source again, then skips the committed rows.
+
+        Args:
+            df: Transformed DataFrame, in load order.
+        """
+        if pyarrow is None:
+            logger.warning("pyarrow absent : artefact transformé non enregistré, "
+                           "une reprise refera l'extraction et la transformation")
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_path = f"{self.artifact_path}.tmp"
+        df.reset_index(drop=True).to_feather(tmp_path)
+        os.replace(tmp_path, self.artifact_path)
+        self.has_artifact = True
+        self.save()
+        logger.info(f"Artefact transformé enregistré : {self.artifact_path} ({len(df)} lignes)")
+
+    def read_artifact(self) -> pd.DataFrame:
+        """Reads the transformed DataFrame stored by write_artifact"""
+        return pd.read_feather(self.artifact_path)
+
+    def discard(self) -> None:
+        """Removes the checkpoint files"""
+        for path in (self.meta_path, self.artifact_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.offset = 0
+        self.has_artifact = False
@@ -0,0 +1,244 @@
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import requests
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    zstandard = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Codes HTTP considérés comme transitoires
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Taille des blocs écrits dans le fichier partiel : au plus un bloc est perdu par coupure
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Tells whether a download error is transient and worth retrying.
+
+    Args:
+        error: Exception raised by requests.
+
+    Returns:
+        True for connection drops, timeouts and 429/5xx responses.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+
+    return False
+
+
+def retry_call(func: Callable[[], T], retries: int, backoff: float, description: str) -> T:
+    """
+    Calls func, retrying transient errors with exponential backoff.
+
+    Args:
+        func: Callable performing the request.
+        retries: Maximum number of retries after the first attempt.
+        backoff: Delay in seconds before the first retry, doubled each time.
+        description: Label used in the logs.
+
+    Returns:
+        The result of func.
+
+    Raises:
+        requests.exceptions.RequestException: Last error, or the first non-transient one.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except requests.exceptions.RequestException as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"{description} : erreur transitoire ({e}), "
+                           f"nouvelle tentative {attempt}/{retries} dans {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _read_part_validator(part_path: str) -> Optional[str]:
+    """Returns the ETag / Last-Modified of the version the partial file belongs to"""
+    try:
+        with open(f"{part_path}.json", encoding='utf-8') as f:
+            return json.load(f).get('validator')
+    except (OSError, ValueError):
+        return None
+
+
+def _write_part_validator(part_path: str, validator: Optional[str]) -> None:
+    with open(f"{part_path}.json", 'w', encoding='utf-8') as f:
+        json.dump({'validator': validator}, f)
+
+
+def discard_partial(part_path: str) -> None:
+    """Removes a partial download and its validator"""
+    for path in (part_path, f"{part_path}.json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_to_file(url: str, part_path: str, headers: Optional[Dict[str, str]] = None,
+                     timeout: int = 30, retries: int = 5, backoff: float = 1.0) -> Optional[Dict[str, Any]]:
+    """
+    Downloads url into part_path, resuming interrupted transfers with HTTP Range.
+
+    Bytes are stored exactly as served (no content decoding), so that the
+    partial file can be resumed byte for byte. An existing partial file left
+    by a previous run is resumed as well, guarded by If-Range so that a new
+    version of the source restarts the download from zero.
+
+    Args:
+        url: URL of the file.
+        part_path: Path of the partial file, complete once the function returns.
+        headers: Extra request headers (conditional headers for instance).
+        timeout: Timeout in seconds for each request.
+        retries: Maximum number of retries on transient errors.
+        backoff: Delay in seconds before the first retry, doubled each time.
+
+    Returns:
+        ETag / Last-Modified of the downloaded file, or None if the server
+        answered 304 Not Modified.
+
+    Raises:
+        requests.exceptions.RequestException: If the download ultimately fails.
+    """
+    validator = _read_part_validator(part_path) if os.path.exists(part_path) else None
+    if validator is None:
+        discard_partial(part_path)
+
+    def attempt() -> Optional[Dict[str, Any]]:
+        nonlocal validator
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request_headers = dict(headers or {})
+        request_headers['Accept-Encoding'] = 'identity'
+        if offset and validator:
+            request_headers['Range'] = f"bytes={offset}-"
+            request_headers['If-Range'] = validator
+
+        with requests.get(url, headers=request_headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304:
+                return None
+
+            if response.status_code == 416:
+                # Fichier partiel incohérent avec la source : on repart de zéro
+                discard_partial(part_path)
+                validator = None
+                raise requests.exceptions.ConnectionError("Plage demandée invalide, reprise depuis le début")
+
+            response.raise_for_status()
+
+            content_range = response.headers.get('Content-Range', '')
+            resumed = response.status_code == 206 and content_range.startswith(f"bytes {offset}-")
+            if resumed:
+                logger.info(f"Reprise du téléchargement à l'octet {offset}")
+            elif offset:
+                logger.info("Reprise impossible, téléchargement depuis le début")
+
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            validator = etag or last_modified
+            _write_part_validator(part_path, validator)
+
+            with open(part_path, 'ab' if resumed else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+            return {'etag': etag, 'last_modified': last_modified}
+
+    result = retry_call(attempt, retries, backoff, f"Téléchargement de {url}")
+    if os.path.exists(f"{part_path}.json"):
+        os.remove(f"{part_path}.json")
+    return result
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """
+    Detects the compression of a file from its first bytes.
+
+    Args:
+        head: First bytes of the file (at least 4).
+
+    Returns:
+        "gzip", "zstd" or None for an uncompressed file.
+    """
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def _open_zstd(fileobj):
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    if pa is not None:
+        return pa.CompressedInputStream(pa.PythonFile(fileobj, mode='r'), 'zstd')
+    raise ValueError("Source compressée en zstd : installer zstandard ou pyarrow")
+
+
+def open_decompressed(fileobj):
+    """
+    Wraps a binary stream with streaming decompression if it is compressed.
+
+    The compression is sniffed from the magic bytes, so it does not depend
+    on the URL or on the headers sent by the server.
+
+    Args:
+        fileobj: Readable binary file object.
+
+    Returns:
+        A readable binary file object yielding the decompressed bytes.
+    """
+    if not hasattr(fileobj, 'peek'):
+        fileobj = io.BufferedReader(fileobj)
+
+    compression = detect_compression(fileobj.peek(4)[:4])
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if compression == "zstd":
+        return _open_zstd(fileobj)
+    return fileobj
+
+
+def decompress_bytes(content: bytes) -> bytes:
+    """
+    Decompresses an in-memory payload if it is gzip or zstd compressed.
+
+    Args:
+        content: Raw payload.
+
+    Returns:
+        The decompressed payload (content itself if not compressed).
+    """
+    if detect_compression(content[:4]) is None:
+        return content
+    with open_decompressed(io.BytesIO(content)) as stream:
+        return stream.read()
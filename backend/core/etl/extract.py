@@ -1,23 +1,157 @@
+import io
+import os
 import pandas as pd
 import requests
-from typing import Optional
+from typing import Iterator, Optional
+from urllib.parse import unquote, urlparse
 from core.config import settings
+from core.etl.cache import SourceCache
+from core.etl.download import decompress_bytes, download_to_file, open_decompressed, retry_call
+from core.etl.transform import REQUIRED_COLUMNS
 import logging
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    pa = None
+    pa_csv = None
+
 logger = logging.getLogger(__name__)
 
+# Profils de parsing du CSV :
+# - "default" : toutes les colonnes, moteur C de pandas, types inférés
+# - "fast"    : colonnes utiles uniquement, moteur pyarrow multi-thread, chaînes Arrow
+CSV_PROFILES = ("default", "fast")
+
+
+def local_source_path(source: str) -> Optional[str]:
+    """
+    Returns the local path of a source given as a file:// URL or a path.
+
+    Args:
+        source: URL or path of the CSV.
+
+    Returns:
+        The path, or None for a remote URL.
+    """
+    parsed = urlparse(source)
+    if parsed.scheme == "file":
+        return unquote(parsed.path)
+    # Lettre de lecteur Windows (C:) : chemin local malgré le "schéma"
+    if not parsed.scheme or len(parsed.scheme) == 1:
+        return source
+    return None
+
 
 class DataExtractor:
     """Classe responsable de l'extraction des données externes"""
     
-    def __init__(self, csv_url: str = None):
+    def __init__(self, csv_url: str = None, cache_dir: Optional[str] = None, csv_profile: Optional[str] = None,
+                 retries: Optional[int] = None, backoff: Optional[float] = None):
         """
         Initializes the extractor.
 
         Args:
             csv_url: URL of the CSV file (optional, uses the default config).
+            cache_dir: Directory of the local source cache (optional, uses
+                settings.ETL_CACHE_DIR; empty string disables the cache).
+            csv_profile: CSV parsing profile, "default" or "fast" (optional,
+                uses settings.ETL_CSV_PROFILE).
+            retries: Retries on transient download errors (optional, uses
+                settings.ETL_DOWNLOAD_RETRIES).
+            backoff: Initial retry delay in seconds, doubled on each retry
+                (optional, uses settings.ETL_DOWNLOAD_BACKOFF).
         """
         self.csv_url = csv_url or settings.csv_communes_url
+        self.csv_profile = self._resolve_profile(csv_profile or settings.ETL_CSV_PROFILE)
+        self.retries = settings.ETL_DOWNLOAD_RETRIES if retries is None else retries
+        self.backoff = settings.ETL_DOWNLOAD_BACKOFF if backoff is None else backoff
+
+        # Fichier local (déposé à l'avance) : lu directement, sans téléchargement ni cache
+        self.local_path = local_source_path(self.csv_url)
+
+        cache_dir = settings.ETL_CACHE_DIR if cache_dir is None else cache_dir
+        self.cache = SourceCache(cache_dir, self.csv_url) if cache_dir and self.local_path is None else None
+
+        # Renseignés par refresh_source() lorsque le cache est actif
+        self.source_path: Optional[str] = None
+        self.source_changed: Optional[bool] = None
+
+    @staticmethod
+    def _resolve_profile(profile: str) -> str:
+        """Validates the parsing profile, falling back to "default" without pyarrow"""
+        if profile not in CSV_PROFILES:
+            raise ValueError(f"Profil de parsing CSV inconnu : {profile} (attendu : {', '.join(CSV_PROFILES)})")
+
+        if profile == "fast" and pa_csv is None:
+            logger.warning("pyarrow n'est pas installé : profil de parsing 'default' utilisé")
+            return "default"
+
+        return profile
+
+    def refresh_source(self, timeout: int = 30) -> Optional[str]:
+        """
+        Refreshes the cached source file with a conditional request.
+
+        Sends If-None-Match / If-Modified-Since for the cached version: a 304
+        keeps the cached file, a 200 replaces it. `source_changed` is set to
+        False when the cached content has already been loaded successfully.
+
+        The download goes through a partial file resumed with HTTP Range on
+        transient errors, including a partial file left by a previous run.
+
+        Args:
+            timeout: Timeout in seconds for the request.
+
+        Returns:
+            Path of the local source file or None in case of error.
+        """
+        if self.cache is None:
+            raise RuntimeError("Le cache local de la source n'est pas configuré")
+
+        try:
+            headers = self.cache.conditional_headers()
+            logger.info(f"Vérification de la source : {self.csv_url} (requête conditionnelle : {bool(headers)})")
+
+            os.makedirs(self.cache.cache_dir, exist_ok=True)
+            validators = download_to_file(
+                self.csv_url,
+                self.cache.partial_path,
+                headers=headers,
+                timeout=timeout,
+                retries=self.retries,
+                backoff=self.backoff
+            )
+
+            if validators is None:
+                logger.info("Source inchangée (304), utilisation du fichier en cache")
+            else:
+                self.cache.commit(validators['etag'], validators['last_modified'])
+
+            self.source_path = self.cache.data_path
+            self.source_changed = not self.cache.is_loaded()
+            return self.source_path
+
+        except (requests.exceptions.RequestException, OSError) as e:
+            logger.error(f"Erreur lors du rafraîchissement de la source : {e}")
+            self.source_path = None
+            self.source_changed = None
+            return None
+
+    @property
+    def reads_local_file(self) -> bool:
+        """Tells whether the source is read from a local file (given as source or cached)"""
+        return self.local_path is not None or self.cache is not None
+
+    def _local_source(self) -> Optional[str]:
+        """Returns the local source file, refreshing the cached one if not done yet for this run"""
+        if self.local_path is not None:
+            if not os.path.isfile(self.local_path):
+                logger.error(f"Fichier source introuvable : {self.local_path}")
+                return None
+            return self.local_path
+        return self.source_path or self.refresh_source()
     
     def download_csv(self, timeout: int = 30) -> Optional[str]:
         """
@@ -29,13 +163,28 @@ class DataExtractor:
         Returns:
             CSV content as a string or None in case of error.
         """
+        if self.reads_local_file:
+            source_path = self._local_source()
+            if source_path is None:
+                return None
+            with open(source_path, 'rb') as raw, open_decompressed(raw) as f:
+                return f.read().decode('utf-8')
+
         try:
             logger.info(f"Téléchargement du CSV depuis : {self.csv_url}")
-            
-            response = requests.get(self.csv_url, timeout=timeout)
-            response.raise_for_status()
+
+            def fetch():
+                response = requests.get(self.csv_url, timeout=timeout)
+                response.raise_for_status()
+                return response
+
+            response = retry_call(fetch, self.retries, self.backoff, "Téléchargement du CSV")
             
             logger.info(f"CSV téléchargé avec succès ({len(response.content)} bytes)")
+            content = decompress_bytes(response.content)
+            if content is not response.content:
+                logger.info(f"Source compressée décompressée ({len(content)} bytes)")
+                return content.decode('utf-8')
             return response.text
             
         except requests.exceptions.RequestException as e:
@@ -51,16 +200,26 @@ class DataExtractor:
         """
 
         try:
-            csv_content = self.download_csv()
-            if csv_content is None:
-                return None
-            
-            df = pd.read_csv(
-                pd.io.common.StringIO(csv_content),
-                encoding='utf-8',
-                sep=',',
-                dtype={'code_postal': str}
-            )
+            if self.reads_local_file:
+                # Lecture directe du fichier local ou en cache, sans passer par une str
+                source_path = self._local_source()
+                if source_path is None:
+                    return None
+                with open(source_path, 'rb') as raw, open_decompressed(raw) as source:
+                    df = self._parse_csv(source)
+            else:
+                csv_content = self.download_csv()
+                if csv_content is None:
+                    source = None
+                elif self.csv_profile == "fast":
+                    source = io.BytesIO(csv_content.encode('utf-8'))
+                else:
+                    source = pd.io.common.StringIO(csv_content)
+
+                if source is None:
+                    return None
+
+                df = self._parse_csv(source)
             
             logger.info(f"DataFrame créé avec {len(df)} lignes et {len(df.columns)} colonnes")
             logger.info(f"Colonnes disponibles : {list(df.columns)}")
@@ -69,4 +228,147 @@ class DataExtractor:
             
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction du DataFrame : {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def extract_from_file(self, path: str) -> Optional[pd.DataFrame]:
+        """
+        Extract data from a local CSV file into a pandas DataFrame
+
+        Args:
+            path: Path of the CSV file (compression inferred from the extension).
+
+        Returns:
+            pandas DataFrame or None in case of error
+        """
+        try:
+            if self.csv_profile == "fast":
+                df = self._read_csv_fast(path)
+            else:
+                df = pd.read_csv(
+                    path,
+                    encoding='utf-8',
+                    sep=',',
+                    dtype={'code_postal': str}
+                )
+            logger.info(f"DataFrame créé depuis {path} avec {len(df)} lignes")
+            return df
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture du fichier {path} : {e}")
+            return None
+
+    def stream_dataframes(self, chunk_size: int, timeout: int = 30) -> Iterator[pd.DataFrame]:
+        """
+        Streams the CSV from the URL as successive DataFrame chunks.
+
+        The HTTP body is read incrementally and parsed on the fly, so only
+        one chunk of rows is held in memory at a time.
+
+        Args:
+            chunk_size: Number of rows per yielded DataFrame.
+            timeout: Timeout in seconds for the request.
+
+        Yields:
+            pandas DataFrames of at most chunk_size rows.
+
+        Raises:
+            requests.exceptions.RequestException: If the download fails.
+        """
+        if self.reads_local_file:
+            source_path = self._local_source()
+            if source_path is None:
+                raise requests.exceptions.RequestException(f"Source indisponible : {self.csv_url}")
+
+            logger.info(f"Lecture en flux du CSV local : {source_path} (blocs de {chunk_size} lignes)")
+            with open(source_path, 'rb') as raw, open_decompressed(raw) as source:
+                yield from self._read_chunks(source, chunk_size)
+            return
+
+        logger.info(f"Téléchargement en flux du CSV depuis : {self.csv_url} (blocs de {chunk_size} lignes)")
+
+        def connect():
+            response = requests.get(self.csv_url, timeout=timeout, stream=True)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                response.close()
+                raise
+            return response
+
+        # Sans cache local, seule l'ouverture de la connexion peut être rejouée :
+        # les blocs déjà transmis au pipeline ne peuvent pas être relus
+        with retry_call(connect, self.retries, self.backoff, "Téléchargement en flux du CSV") as response:
+            # Décompression transparente du gzip/deflate de transport
+            response.raw.decode_content = True
+            # Garde le flux lisible en fin de corps pour les lectures tamponnées
+            response.raw.auto_close = False
+
+            # puis des fichiers sources compressés (gzip / zstd)
+            yield from self._read_chunks(open_decompressed(response.raw), chunk_size)
+
+    def _parse_csv(self, source) -> pd.DataFrame:
+        """Parses a whole CSV according to the parsing profile"""
+        if self.csv_profile == "fast":
+            return self._read_csv_fast(source)
+
+        return pd.read_csv(
+            source,
+            encoding='utf-8',
+            sep=',',
+            dtype={'code_postal': str}
+        )
+
+    def _read_csv_fast(self, source) -> pd.DataFrame:
+        """
+        Parses the CSV with the multi-threaded pyarrow reader.
+
+        Only the required columns are decoded, as Arrow-backed strings, so
+        that postal codes keep their leading zeros.
+
+        Args:
+            source: Path or binary file object of the CSV.
+
+        Returns:
+            DataFrame with the required columns only.
+        """
+        table = pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            parse_options=pa_csv.ParseOptions(delimiter=','),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=REQUIRED_COLUMNS,
+                column_types={column: pa.string() for column in REQUIRED_COLUMNS},
+                strings_can_be_null=True
+            )
+        )
+        return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+    def _read_chunks(self, source, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Parses a CSV file or binary stream into DataFrame chunks"""
+        if self.csv_profile == "fast":
+            # Le moteur pyarrow ne sait pas découper par nombre de lignes :
+            # moteur C restreint aux colonnes utiles avec des chaînes Arrow
+            reader = pd.read_csv(
+                source,
+                encoding='utf-8',
+                sep=',',
+                usecols=REQUIRED_COLUMNS,
+                dtype={column: pd.StringDtype("pyarrow") for column in REQUIRED_COLUMNS},
+                chunksize=chunk_size
+            )
+        else:
+            reader = pd.read_csv(
+                source,
+                encoding='utf-8',
+                sep=',',
+                dtype={'code_postal': str},
+                chunksize=chunk_size
+            )
+
+        total_rows = 0
+        for chunk in reader:
+            total_rows += len(chunk)
+            logger.debug(f"Bloc extrait : {len(chunk)} lignes ({total_rows} au total)")
+            yield chunk
+
+        logger.info(f"Extraction en flux terminée : {total_rows} lignes")
\ No newline at end of file
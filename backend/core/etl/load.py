@@ -1,81 +1,929 @@
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
 import pandas as pd
-from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session, sessionmaker
+from datetime import datetime, timezone
+from typing import IO, List, Dict, Any, Callable, Iterable, Optional, Set, Tuple, Union
 import logging
+from core.config import settings
+from core.etl.batching import AdaptiveBatchSizer
+from core.etl.metrics import RunInstrumentation
+from core.etl.progress import ProgressTracker
+from core.etl.transform import CommuneRecord
 from db.models.commune import Commune
 from schemas.commune import ImportStats
-from sqlalchemy import func
+from sqlalchemy import Table, bindparam, delete, func, insert, inspect, literal_column, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
 
 logger = logging.getLogger(__name__)
 
+# Stratégies de chargement :
+# - "orm"    : index des clés existantes en mémoire, INSERT / UPDATE groupés des seules différences
+# - "upsert" : INSERT ... ON CONFLICT DO UPDATE par lots (PostgreSQL, SQLite)
+# - "copy"   : COPY FROM STDIN dans une table de staging UNLOGGED puis fusion ensembliste (PostgreSQL)
+LOAD_STRATEGIES = ("orm", "upsert", "copy")
+
+STAGING_TABLE = "communes_staging"
+
+# Le fichier de quarantaine peut être partagé par les partitions d'un chargement parallèle
+_QUARANTINE_LOCK = threading.Lock()
+
+# Traitement des communes absentes de la source lors d'un import incrémental :
+# - "keep"      : simplement comptées
+# - "tombstone" : marquées supprimées (removed_at), masquées des recherches
+# - "delete"    : supprimées de la table
+STALE_ROW_MODES = ("keep", "tombstone", "delete")
+
+# Nombre maximal de paramètres d'une requête SQLite (SQLITE_MAX_VARIABLE_NUMBER depuis la 3.32)
+SQLITE_MAX_VARIABLES = 32766
+
+# Colonnes insérées par la stratégie upsert, un paramètre chacune par ligne
+_UPSERT_COLUMNS = ('postal_code', 'commune_name', 'departement', 'search_key', 'content_hash')
+
+# Dialectes disposant d'INSERT ... ON CONFLICT
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def as_record(commune_data: Union[CommuneRecord, Dict[str, Any]]) -> CommuneRecord:
+    """
+    Normalises one input row to a CommuneRecord, computing its search key
+    when the row has none.
+
+    Args:
+        commune_data: CommuneRecord, or dictionary keyed like the CSV columns.
+
+    Returns:
+        The row as a CommuneRecord.
+    """
+    if isinstance(commune_data, CommuneRecord):
+        record = commune_data
+    else:
+        record = CommuneRecord(commune_data['code_postal'], commune_data['nom_commune_complet'],
+                               commune_data['departement'], commune_data.get('search_key'))
+    if record.search_key is None:
+        # Lignes construites hors de DataTransformer : clé calculée ligne à ligne
+        record = record._replace(search_key=Commune.normalize_search_key(record.nom_commune_complet))
+    return record
+
+
+def content_hash(record: CommuneRecord) -> str:
+    """
+    Computes the fingerprint of one source row, stored with the commune.
+
+    Args:
+        record: Row to fingerprint.
+
+    Returns:
+        32 hexadecimal characters.
+    """
+    content = "\x1f".join(str(value) for value in record)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def write_quarantine(path: str, records: List[CommuneRecord], reason: str) -> None:
+    """
+    Appends rejected records to the quarantine CSV file.
+
+    Args:
+        path: Path of the quarantine file, created with a header if needed.
+        records: Rejected records.
+        reason: Cause of the rejection, written on each line.
+    """
+    with _QUARANTINE_LOCK:
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(CommuneRecord._fields + ('erreur',))
+            for record in records:
+                writer.writerow(tuple(record) + (reason,))
+
+
+def merge_import_stats(total: ImportStats, part: ImportStats) -> ImportStats:
+    """
+    Adds the row counts and errors of part to total.
+
+    Args:
+        total: Running statistics, updated in place.
+        part: Statistics of one chunk or partition.
+
+    Returns:
+        total
+    """
+    total.total_processed += part.total_processed
+    total.total_imported += part.total_imported
+    total.total_updated += part.total_updated
+    total.total_unchanged += part.total_unchanged
+    total.total_removed += part.total_removed
+    total.total_rejected += part.total_rejected
+    total.errors.extend(part.errors)
+    return total
+
+
+def partition_by_departement(records: Iterable[CommuneRecord], partitions: int) -> List[List[CommuneRecord]]:
+    """
+    Splits records into balanced partitions of whole departements.
+
+    A (postal_code, commune_name) key always belongs to a single departement,
+    so two partitions never write the same row. The order of the records is
+    kept within a departement.
+
+    Args:
+        records: Records to split.
+        partitions: Maximum number of partitions.
+
+    Returns:
+        Non-empty lists of records.
+    """
+    by_departement: Dict[Optional[str], List[CommuneRecord]] = {}
+    for record in records:
+        by_departement.setdefault(record.departement, []).append(record)
+
+    # Plus gros départements d'abord, chacun dans la partition la moins remplie
+    result: List[List[CommuneRecord]] = [[] for _ in range(partitions)]
+    for group in sorted(by_departement.values(), key=len, reverse=True):
+        min(result, key=len).extend(group)
+    return [partition for partition in result if partition]
+
+
+class CopyStream:
+    """
+    Read-only file-like object streaming records as CSV for COPY FROM STDIN.
+
+    Each line is prefixed with the position of the record in the stream,
+    used by the merge to keep the last occurrence of a duplicated key, and
+    ends with the content hash of the record.
+
+    With a spool file, the streamed records are also written to it as CSV,
+    so that they can be quarantined if the load fails.
+    """
+
+    def __init__(self, records: Iterable[CommuneRecord], rows_per_fill: int = 1000,
+                 spool: Optional[IO[str]] = None):
+        self._records = iter(records)
+        self._rows_per_fill = rows_per_fill
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._spool = csv.writer(spool, lineterminator='\n') if spool is not None else None
+        self._pending = ''
+        self.count = 0
+
+    def _next_batch(self) -> List[CommuneRecord]:
+        batch = list(islice(self._records, self._rows_per_fill))
+        if self._spool is not None:
+            self._spool.writerows(batch)
+        return batch
+
+    def _fill(self) -> bool:
+        batch = self._next_batch()
+        if not batch:
+            return False
+
+        for record in batch:
+            self._writer.writerow((self.count, record.code_postal, record.nom_commune_complet,
+                                   record.departement, record.search_key, content_hash(record)))
+            self.count += 1
+
+        self._pending += self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while (size < 0 or len(self._pending) < size) and self._fill():
+            pass
+
+        if size < 0:
+            size = len(self._pending)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+    def drain(self) -> None:
+        """Consumes (and counts) the records not read yet, after a failed COPY"""
+        while batch := self._next_batch():
+            self.count += len(batch)
+
 
 class DataLoader:
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, strategy: Optional[str] = None, batch_size: Optional[int] = None,
+                 workers: Optional[int] = None, quarantine_path: Optional[str] = None,
+                 batch_target_seconds: Optional[float] = None, table: Optional[Table] = None,
+                 progress: Optional[ProgressTracker] = None, dry_run: bool = False):
+        """
+        Initializes the loader.
 
+        Args:
+            db_session: Database session.
+            strategy: Load strategy, one of LOAD_STRATEGIES (optional, uses
+                settings.ETL_LOAD_STRATEGY).
+            batch_size: Number of rows of the first transaction (optional, uses
+                settings.ETL_BATCH_SIZE).
+            workers: Number of partitions loaded concurrently, each on its own
+                connection (optional, uses settings.ETL_LOAD_WORKERS).
+            quarantine_path: CSV file receiving the rejected rows (optional,
+                uses settings.ETL_QUARANTINE_PATH, empty to disable).
+            batch_target_seconds: Target duration of one transaction, the batch
+                size adapting between settings.ETL_BATCH_MIN and ETL_BATCH_MAX
+                (optional, uses settings.ETL_BATCH_TARGET_SECONDS, 0 for a
+                fixed batch size).
+            table: Table receiving the rows, with the columns of communes
+                (optional, the communes table itself; see core.etl.shadow).
+            progress: Tracker receiving the loaded rows and checked for
+                cancellation between batches (optional).
+            dry_run: Only computes the delta against the database, without
+                writing anything (see plan_delta).
+        """
         self.db = db_session
+        self.table = Commune.__table__ if table is None else table
+        self.strategy = strategy or settings.ETL_LOAD_STRATEGY
+        if self.strategy not in LOAD_STRATEGIES:
+            raise ValueError(f"Stratégie de chargement inconnue : {self.strategy} "
+                             f"(attendu : {', '.join(LOAD_STRATEGIES)})")
+        self.batch_size = batch_size or settings.ETL_BATCH_SIZE
+        self.workers = workers or settings.ETL_LOAD_WORKERS
+        self.quarantine_path = settings.ETL_QUARANTINE_PATH if quarantine_path is None else quarantine_path
+        self.batch_target_seconds = (settings.ETL_BATCH_TARGET_SECONDS if batch_target_seconds is None
+                                     else batch_target_seconds)
+        self.progress = progress or ProgressTracker()
+        # Appelé avec le nombre de lignes de chaque lot validé (points de reprise, cf. core.etl.checkpoint) ;
+        # s'il est défini, une erreur hors données interrompt le chargement au lieu de rejeter le lot
+        self.on_committed: Optional[Callable[[int], None]] = None
+        # Mesures par lot de l'import en cours (cf. core.etl.metrics)
+        self.instrumentation: Optional[RunInstrumentation] = None
+        self.dry_run = dry_run
+        # Index des clés du mode dry_run, complété par les lignes déjà planifiées
+        self._planned_index: Optional[Dict[Tuple[str, str], Tuple[int, Optional[str]]]] = None
+        # Index des clés de la stratégie orm, lu une fois par import et tenu à jour d'un chunk à l'autre
+        self._key_index: Optional[Dict[Tuple[str, str], Tuple[int, Optional[str]]]] = None
     
-    def load_communes(self, communes_data: List[Dict[str, Any]]) -> ImportStats:
+    def load_communes(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]]) -> ImportStats:
         """
         Loads municipality data into database
         
         Args:
-            municipality_data: List of dictionaries representing municipalities
+            communes_data: Iterable of CommuneRecord tuples (as streamed by
+                DataTransformer.iter_records) or of dictionaries
             
+        Returns:
+            Import statistics
+        """
+        start = time.perf_counter()
+
+        if self.dry_run:
+            stats = self.plan_delta(communes_data)
+        elif self.workers > 1 and self._supports_parallel_load():
+            stats = self._load_parallel(communes_data)
+            # Partitions validées dans le désordre : position avancée une fois toutes terminées
+            if self.on_committed is not None:
+                self.on_committed(stats.total_processed)
+        else:
+            stats = self._load_serial(communes_data)
+
+        stats.duration_seconds = round(time.perf_counter() - start, 3)
+        if stats.duration_seconds > 0:
+            stats.rows_per_second = round(stats.total_processed / stats.duration_seconds, 1)
+        return stats
+
+    def plan_delta(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]]) -> ImportStats:
+        """
+        Computes the rows a load would insert, update or leave unchanged,
+        with the content hash comparison of the orm strategy, without
+        writing anything.
+
+        Successive calls (chunks) see the rows planned by the previous ones,
+        as a real load would see them committed.
+
+        Args:
+            communes_data: Iterable of records or dictionaries
+
+        Returns:
+            Import statistics of the would-be load
+        """
+        if self._planned_index is None:
+            # Base encore vide (tables créées par le premier import) : tout serait créé
+            self._planned_index = self._fetch_key_index() if self._table_exists() else {}
+            # Lecture seule : la transaction ouverte par la requête est relâchée
+            self.db.rollback()
+        index = self._planned_index
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+        for record in map(as_record, communes_data):
+            stats.total_processed += 1
+            key = (record.code_postal, record.nom_commune_complet)
+            row_hash = content_hash(record)
+            existing = index.get(key)
+            if existing is None:
+                stats.total_imported += 1
+            elif existing[1] != row_hash:
+                stats.total_updated += 1
+            else:
+                stats.total_unchanged += 1
+            index[key] = (existing[0] if existing else None, row_hash)
+
+        self.progress.advance("load", stats.total_processed)
+        return stats
+
+    def _table_exists(self) -> bool:
+        """Tells whether the loaded table exists (a dry run never creates it)"""
+        return inspect(self.db.get_bind()).has_table(self.table.name)
+
+    def _load_serial(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]],
+                     index: Optional[Dict[Tuple[str, str], Tuple[int, Optional[str]]]] = None) -> ImportStats:
+        """Loads the rows on the session of the loader with its strategy"""
+        if self.strategy == "copy":
+            return self._load_copy(communes_data)
+        if self.strategy == "upsert":
+            return self._load_upsert(communes_data)
+        return self._load_orm(communes_data, index)
+
+    def _supports_parallel_load(self) -> bool:
+        """
+        Tells whether the rows can be loaded on several connections at once.
+
+        Returns:
+            False for the copy strategy (single staging table) and for SQLite
+            (one writer at a time), which are loaded serially.
+        """
+        dialect = self.db.get_bind().dialect.name
+        if self.strategy == "copy" or dialect == "sqlite":
+            logger.warning(f"Chargement parallèle indisponible (stratégie {self.strategy}, {dialect}) : "
+                           "chargement séquentiel")
+            return False
+        return True
+
+    def _load_parallel(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]]) -> ImportStats:
+        """
+        Loads partitions of whole departements concurrently, one session and
+        connection per partition, then merges their statistics.
+
+        Args:
+            communes_data: Iterable of records or dictionaries
+
+        Returns:
+            Import statistics of all the partitions
+        """
+        partitions = partition_by_departement(map(as_record, communes_data), self.workers)
+        logger.info(f"Chargement parallèle : {len(partitions)} partitions "
+                    f"({', '.join(str(len(p)) for p in partitions)} lignes)")
+
+        # Index partagé : les partitions n'écrivent jamais les mêmes clés
+        index = self._run_key_index() if self.strategy == "orm" else None
+        session_factory = sessionmaker(bind=self.db.get_bind())
+
+        def load_partition(records: List[CommuneRecord]) -> ImportStats:
+            with session_factory() as session:
+                loader = DataLoader(session, strategy=self.strategy, batch_size=self.batch_size, workers=1,
+                                    quarantine_path=self.quarantine_path,
+                                    batch_target_seconds=self.batch_target_seconds, table=self.table,
+                                    progress=self.progress)
+                loader.instrumentation = self.instrumentation
+                if self.on_committed is not None:
+                    # Position avancée par le chargeur parent ; la partition s'arrête sur une erreur hors données
+                    loader.on_committed = lambda rows: None
+                if self.instrumentation is None:
+                    return loader._load_serial(records, index)
+                with self.instrumentation.in_phase("load"):
+                    return loader._load_serial(records, index)
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+        with ThreadPoolExecutor(max_workers=len(partitions), thread_name_prefix="etl-load") as executor:
+            for records, part in zip(partitions, executor.map(load_partition, partitions)):
+                departements = sorted({record.departement for record in records}, key=str)
+                part.errors = [f"[départements {', '.join(map(str, departements))}] {error}" for error in part.errors]
+                merge_import_stats(stats, part)
+
+        logger.info(f"Chargement parallèle terminé : {stats.total_imported} créées, "
+                    f"{stats.total_updated} mises à jour, {stats.total_unchanged} inchangées")
+        return stats
+
+    def _load_orm(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]],
+                  index: Optional[Dict[Tuple[str, str], Tuple[int, Optional[str]]]] = None) -> ImportStats:
+        """
+        Loads the rows through ORM bulk statements, diffed against an in-memory key index.
+
+        The existing (postal_code, commune_name) keys are fetched once per
+        import and kept up to date across calls (chunks), until
+        reset_key_index(); each batch then costs at most one bulk INSERT and one bulk UPDATE by primary
+        key, and rows identical to the database cost no statement at all.
+
+        Args:
+            communes_data: Iterable of records or dictionaries
+            index: Key index already fetched (optional, fetched otherwise)
+
         Returns:
             Import statistics
         """
         stats = ImportStats(
-            total_processed=len(communes_data),
+            total_processed=0,
             total_imported=0,
             total_updated=0,
             errors=[]
         )
 
-        logger.info(f"Début du chargement de {len(communes_data)} communes")
-        
-        for i, commune_data in enumerate(communes_data):
-            try:
-                existing_commune = self.db.query(Commune).filter(
-                    Commune.postal_code == commune_data['code_postal'],
-                    Commune.commune_name == commune_data['nom_commune_complet']
-                ).first()
-                
-                if existing_commune:
-                    existing_commune.departement = commune_data['departement']
-                    stats.total_updated += 1
-                    
-                else:
-                    new_commune = Commune(
-                        postal_code=commune_data['code_postal'],
-                        commune_name=commune_data['nom_commune_complet'],
-                        departement=commune_data['departement']
-                    )
-                    self.db.add(new_commune)
-                    stats.total_imported += 1
-                
-                if (i + 1) % 1000 == 0:
-                    self.db.commit()
-                    logger.info(f"Progression : {i + 1}/{len(communes_data)} communes traitées")
-                    
-            except Exception as e:
-                error_msg = f"Erreur ligne {i+1}: {str(e)} - Données: {commune_data}"
-                logger.error(error_msg)
-                stats.errors.append(error_msg)
-
-                # Rollback de la transaction en cours pour cette ligne
-                self.db.rollback()
-        
+        expected = len(communes_data) if hasattr(communes_data, '__len__') else None
+        if expected is not None:
+            logger.info(f"Début du chargement de {expected} communes")
+        else:
+            logger.info("Début du chargement des communes (flux)")
+
+        if index is None:
+            index = self._run_key_index()
+
+        self._load_batches(map(as_record, communes_data), lambda rows: self._apply_orm_batch(index, rows),
+                           stats, expected)
+
+        logger.info(f"Chargement terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour, "
+                    f"{stats.total_unchanged} inchangées")
+        return stats
+
+    def _load_batches(self, records: Iterable[CommuneRecord],
+                      apply: Callable[[List[CommuneRecord]], Tuple[int, int, int]],
+                      stats: ImportStats, expected: Optional[int] = None, max_size: Optional[int] = None) -> None:
+        """
+        Loads a stream of records in batches sized by an AdaptiveBatchSizer.
+
+        Args:
+            records: Stream of records.
+            apply: Writes and commits a batch, returns the inserted, updated and unchanged counts.
+            stats: Statistics updated in place.
+            expected: Total number of records if known, for the progress logs.
+            max_size: Upper bound of the batch size imposed by the database (optional).
+        """
+        maximum = min(settings.ETL_BATCH_MAX, max_size or settings.ETL_BATCH_MAX)
+        sizer = AdaptiveBatchSizer(min(self.batch_size, maximum), settings.ETL_BATCH_MIN, maximum,
+                                   self.batch_target_seconds)
+
+        for batch in sizer.batches(records):
+            # Annulation coopérative : uniquement entre deux lots validés
+            self.progress.checkpoint()
+            start = stats.total_processed
+            stats.total_processed += len(batch)
+            errors = len(stats.errors)
+
+            started = sizer.clock()
+            if self.instrumentation is not None:
+                with self.instrumentation.batch() as measure:
+                    measure.rows = len(batch)
+                    self._load_batch(batch, start, apply, stats)
+            else:
+                self._load_batch(batch, start, apply, stats)
+            # Lot bissecté ou rejeté : sa durée n'est pas représentative
+            if len(stats.errors) == errors:
+                sizer.record(len(batch), sizer.clock() - started)
+            self.progress.advance("load", len(batch))
+            if self.on_committed is not None:
+                self.on_committed(len(batch))
+
+            logger.info(f"Progression : {stats.total_processed}/{expected or '?'} communes traitées "
+                        f"(lot de {len(batch)} en {sizer.last_seconds or 0:.2f}s)")
+
+        if sizer.adaptive:
+            logger.info(f"Taille de lot finale : {sizer.size} "
+                        f"({sizer.last_rows_per_second or 0:.0f} lignes/s au dernier lot)")
+
+    def _load_batch(self, batch: List[CommuneRecord], offset: int,
+                    apply: Callable[[List[CommuneRecord]], Tuple[int, int, int]], stats: ImportStats) -> None:
+        """
+        Writes and commits one batch, bisecting it on data errors so that only
+        the offending rows are rejected and everything else is committed.
+
+        Other errors (lost connection, failed commit...) reject the whole batch
+        without bisecting. Rejected rows are never counted as imported or
+        updated, and are written to the quarantine file. With on_committed
+        set, such errors are raised instead: the batch was not committed, so
+        the checkpoint stays before it and a resumed run loads it again.
+
+        Args:
+            batch: Records of the batch.
+            offset: Position of the first record in the loaded stream.
+            apply: Writes and commits a batch, returns the inserted, updated and unchanged counts.
+            stats: Statistics updated in place.
+        """
+        try:
+            inserted, updated, unchanged = apply(batch)
+        except (IntegrityError, DataError) as e:
+            self.db.rollback()
+            if len(batch) == 1:
+                self._reject(batch, offset, e, stats)
+                return
+            middle = len(batch) // 2
+            self._load_batch(batch[:middle], offset, apply, stats)
+            self._load_batch(batch[middle:], offset + middle, apply, stats)
+            return
+        except Exception as e:
+            self.db.rollback()
+            if self.on_committed is not None:
+                raise
+            self._reject(batch, offset, e, stats)
+            return
+
+        stats.total_imported += inserted
+        stats.total_updated += updated
+        stats.total_unchanged += unchanged
+
+    def _reject(self, batch: List[CommuneRecord], offset: int, error: Exception, stats: ImportStats) -> None:
+        """
+        Records rows that could not be loaded.
+
+        Args:
+            batch: Rejected records.
+            offset: Position of the first record in the loaded stream.
+            error: Cause of the rejection.
+            stats: Statistics updated in place.
+        """
+        # Message du pilote, sans la requête SQL complète ajoutée par SQLAlchemy
+        reason = str(getattr(error, 'orig', None) or error)
+        if len(batch) == 1:
+            error_msg = f"Erreur ligne {offset + 1}: {reason} - Données: {batch[0]}"
+        else:
+            error_msg = f"Erreur lot lignes {offset + 1}-{offset + len(batch)}: {reason}"
+        logger.error(error_msg)
+        stats.errors.append(error_msg)
+        stats.total_rejected += len(batch)
+
+        if self.quarantine_path:
+            write_quarantine(self.quarantine_path, batch, reason)
+
+    def _run_key_index(self) -> Dict[Tuple[str, str], Tuple[int, Optional[str]]]:
+        """Returns the key index of the current import, fetched at its first load"""
+        if self._key_index is None:
+            self._key_index = self._fetch_key_index()
+            logger.info(f"Index des communes existantes : {len(self._key_index)} clés")
+        return self._key_index
+
+    def reset_key_index(self) -> None:
+        """
+        Forgets the key index of the orm strategy, fetched again by the next
+        load. To be called at the end of an import, or whenever the table
+        was written by something else than this loader.
+        """
+        self._key_index = None
+
+    def _fetch_key_index(self) -> Dict[Tuple[str, str], Tuple[int, Optional[str]]]:
+        """
+        Fetches the keys of the communes already in database in a single query.
+
+        Returns:
+            Mapping (postal_code, commune_name) -> (id, content_hash). The hash
+            is None for tombstoned rows, so that they are restored on reimport.
+        """
+        table = self.table
+        rows = self.db.execute(
+            select(table.c.postal_code, table.c.commune_name, table.c.id, table.c.content_hash, table.c.removed_at)
+        )
+        return {(postal_code, name): (commune_id, None if removed_at is not None else row_hash)
+                for postal_code, name, commune_id, row_hash, removed_at in rows}
+
+    def _apply_orm_batch(self, index: Dict[Tuple[str, str], Tuple[int, Optional[str]]],
+                         batch: List[CommuneRecord]) -> Tuple[int, int, int]:
+        """
+        Diffs one batch against the key index, writes only the differences and commits them.
+
+        The index is updated once the batch is committed, so that a failed
+        batch leaves it consistent with the database.
+
+        Args:
+            index: Key index from _fetch_key_index, updated in place.
+            batch: Records of the batch.
+
+        Returns:
+            Number of inserted, updated and unchanged rows.
+        """
+        # Une clé répétée dans le lot n'est écrite qu'une fois : la dernière occurrence l'emporte
+        latest = {(record.code_postal, record.nom_commune_complet): record for record in batch}
+
+        inserts: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        updates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        unchanged = 0
+        for key, record in latest.items():
+            row_hash = content_hash(record)
+            existing = index.get(key)
+            if existing is None:
+                inserts[key] = {
+                    'postal_code': record.code_postal,
+                    'commune_name': record.nom_commune_complet,
+                    'departement': record.departement,
+                    'search_key': record.search_key,
+                    'content_hash': row_hash,
+                }
+            elif existing[1] != row_hash:
+                updates[key] = {
+                    'commune_id': existing[0],
+                    'departement': record.departement,
+                    'search_key': record.search_key,
+                    'content_hash': row_hash,
+                    'removed_at': None,
+                }
+            else:
+                unchanged += 1
+
+        table = self.table
+        new_ids: Dict[Tuple[str, str], int] = {}
+        if inserts:
+            results = self.db.execute(
+                insert(table).returning(table.c.postal_code, table.c.commune_name, table.c.id),
+                list(inserts.values())
+            )
+            new_ids = {(postal_code, name): commune_id for postal_code, name, commune_id in results}
+        if updates:
+            self.db.execute(
+                update(table).where(table.c.id == bindparam('commune_id')),
+                list(updates.values())
+            )
+        if inserts or updates:
+            self.db.commit()
+
+        for key, row in inserts.items():
+            index[key] = (new_ids[key], row['content_hash'])
+        for key, row in updates.items():
+            index[key] = (row['commune_id'], row['content_hash'])
+        return len(inserts), len(updates), unchanged
+
+    def _load_upsert(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]]) -> ImportStats:
+        """
+        Loads the rows with set-based INSERT ... ON CONFLICT DO UPDATE batches.
+
+        Relies on the unique constraint on (postal_code, commune_name): each
+        batch costs one statement (plus one key lookup on SQLite, which has
+        no way to tell inserted from updated rows in RETURNING). Conflicting
+        rows whose content hash is unchanged are left untouched.
+
+        Args:
+            communes_data: Iterable of records or dictionaries
+
+        Returns:
+            Import statistics
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect not in _UPSERT_INSERTS:
+            raise ValueError(f"Stratégie upsert non supportée pour le dialecte {dialect}")
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+        logger.info(f"Début du chargement des communes (upsert {dialect}, lots de {self.batch_size})")
+
+        # Un INSERT multi-lignes porte un paramètre par colonne insérée et par ligne,
+        # plus celui de removed_at dans la clause ON CONFLICT
+        max_size = (SQLITE_MAX_VARIABLES - 1) // len(_UPSERT_COLUMNS) if dialect == "sqlite" else None
+        self._load_batches(map(as_record, communes_data), lambda rows: self._upsert_batch(dialect, rows), stats,
+                           max_size=max_size)
+
+        logger.info(f"Chargement terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour, "
+                    f"{stats.total_unchanged} inchangées")
+        return stats
+
+    def _upsert_batch(self, dialect: str, batch: List[CommuneRecord]) -> Tuple[int, int, int]:
+        """
+        Upserts one batch of records in a single statement and commits it.
+
+        Args:
+            dialect: Name of the database dialect.
+            batch: Records of the batch.
+
+        Returns:
+            Number of inserted, updated and unchanged rows.
+        """
+        # Une clé ne peut apparaître qu'une fois par INSERT ... ON CONFLICT : la dernière l'emporte
+        rows = {
+            (record.code_postal, record.nom_commune_complet): dict(zip(_UPSERT_COLUMNS, (
+                record.code_postal, record.nom_commune_complet, record.departement, record.search_key,
+                content_hash(record),
+            )))
+            for record in batch
+        }
+
+        table = self.table
+        statement = _UPSERT_INSERTS[dialect](table).values(list(rows.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.postal_code, table.c.commune_name],
+            set_={
+                'departement': statement.excluded.departement,
+                'search_key': statement.excluded.search_key,
+                'content_hash': statement.excluded.content_hash,
+                'removed_at': None,
+            },
+            # Lignes identiques à la base (et non supprimées) : aucune écriture
+            where=or_(
+                table.c.content_hash.is_distinct_from(statement.excluded.content_hash),
+                table.c.removed_at.isnot(None),
+            )
+        )
+
+        if dialect == "postgresql":
+            # xmax = 0 pour une ligne insérée, identifiant de transaction pour une ligne mise à jour ;
+            # les lignes ignorées par la clause WHERE ne sont pas renvoyées
+            results = self.db.execute(statement.returning(literal_column("(xmax = 0)"))).scalars().all()
+            self.db.commit()
+            imported = sum(1 for inserted in results if inserted)
+            return imported, len(results) - imported, len(rows) - len(results)
+
+        existing = self.db.execute(
+            select(table.c.postal_code, table.c.commune_name, table.c.content_hash, table.c.removed_at).where(
+                tuple_(table.c.postal_code, table.c.commune_name).in_(list(rows.keys()))
+            )
+        ).all()
+        unchanged = sum(1 for postal_code, name, row_hash, removed_at in existing
+                        if removed_at is None and row_hash == rows[(postal_code, name)]['content_hash'])
+        self.db.execute(statement)
+        self.db.commit()
+        return len(rows) - len(existing), len(existing) - unchanged, unchanged
+
+    def _load_copy(self, communes_data: Iterable[Union[CommuneRecord, Dict[str, Any]]]) -> ImportStats:
+        """
+        Streams the rows into an UNLOGGED staging table with COPY FROM STDIN,
+        then merges them into communes with a single set-based statement.
+
+        The whole load runs in one transaction: concurrent copy loads are
+        serialized by an exclusive lock on the staging table. If it fails,
+        every row is rejected and, with a quarantine file, written to it.
+
+        Args:
+            communes_data: Iterable of records or dictionaries
+
+        Returns:
+            Import statistics
+        """
+        dialect = self.db.get_bind().dialect.name
+        if dialect != "postgresql":
+            raise ValueError(f"Stratégie copy réservée à PostgreSQL (dialecte : {dialect})")
+
+        stats = ImportStats(
+            total_processed=0,
+            total_imported=0,
+            total_updated=0,
+            errors=[]
+        )
+        logger.info(f"Début du chargement des communes (COPY via {STAGING_TABLE})")
+
+        # Chargement en une seule transaction : annulable seulement avant son début
+        self.progress.checkpoint()
+        # Copie des lignes envoyées, pour les mettre en quarantaine si le chargement échoue
+        spool = tempfile.TemporaryFile('w+', encoding='utf-8', newline='') if self.quarantine_path else None
+        stream = CopyStream(map(as_record, communes_data), spool=spool)
         try:
+            self.db.execute(text(
+                f"CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE} ("
+                "position BIGINT NOT NULL, "
+                "postal_code VARCHAR(5), "
+                "commune_name VARCHAR(255), "
+                "departement VARCHAR(3), "
+                "search_key VARCHAR(255), "
+                "content_hash VARCHAR(32))"
+            ))
+            # Table de staging créée par une version antérieure
+            self.db.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32)"))
+            self.db.execute(text(f"ALTER TABLE {STAGING_TABLE} ADD COLUMN IF NOT EXISTS search_key VARCHAR(255)"))
+            self.db.execute(text(f"LOCK TABLE {STAGING_TABLE} IN ACCESS EXCLUSIVE MODE"))
+            self.db.execute(text(f"TRUNCATE {STAGING_TABLE}"))
+
+            cursor = self.db.connection().connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {STAGING_TABLE} (position, postal_code, commune_name, departement, search_key, content_hash) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    stream
+                )
+            finally:
+                cursor.close()
+            stats.total_processed = stream.count
+            logger.info(f"COPY terminé : {stream.count} lignes en staging")
+
+            # DISTINCT ON : une seule ligne par clé, la dernière du flux l'emporte ;
+            # les lignes dont l'empreinte est inchangée ne sont pas réécrites
+            distinct, imported, updated = self.db.execute(text(
+                "WITH source AS ("
+                "SELECT DISTINCT ON (postal_code, commune_name) "
+                "postal_code, commune_name, departement, search_key, content_hash "
+                f"FROM {STAGING_TABLE} "
+                "ORDER BY postal_code, commune_name, position DESC), "
+                "merged AS ("
+                f"INSERT INTO {self.table.name} AS target "
+                "(postal_code, commune_name, departement, search_key, content_hash) "
+                "SELECT postal_code, commune_name, departement, search_key, content_hash FROM source "
+                "ON CONFLICT (postal_code, commune_name) DO UPDATE SET "
+                "departement = EXCLUDED.departement, search_key = EXCLUDED.search_key, "
+                "content_hash = EXCLUDED.content_hash, removed_at = NULL "
+                "WHERE target.content_hash IS DISTINCT FROM EXCLUDED.content_hash "
+                "OR target.removed_at IS NOT NULL "
+                "RETURNING (xmax = 0) AS inserted) "
+                "SELECT (SELECT count(*) FROM source), "
+                "count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged"
+            )).one()
+
+            self.db.execute(text(f"TRUNCATE {STAGING_TABLE}"))
             self.db.commit()
-            logger.info(f"Chargement terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour")
+
+            stats.total_imported = imported
+            stats.total_updated = updated
+            stats.total_unchanged = distinct - imported - updated
+            self.progress.advance("load", stats.total_processed)
+            if self.on_committed is not None:
+                self.on_committed(stats.total_processed)
+            logger.info(f"Chargement terminé : {stats.total_imported} créées, {stats.total_updated} mises à jour, "
+                        f"{stats.total_unchanged} inchangées")
+
         except Exception as e:
-            logger.error(f"Erreur lors du commit final : {e}")
+            error_msg = f"Erreur chargement COPY : {str(e)}"
+            logger.error(error_msg)
+            stats.errors.append(error_msg)
             self.db.rollback()
-            stats.errors.append(f"Erreur commit final : {str(e)}")
-        
+            # Chargement en une seule transaction : aucune ligne n'est conservée,
+            # y compris celles que COPY n'a pas lues
+            stream.drain()
+            stats.total_processed = stream.count
+            stats.total_rejected = stream.count
+            if spool is not None:
+                self._quarantine_spool(spool, str(getattr(e, 'orig', None) or e))
+        finally:
+            if spool is not None:
+                spool.close()
+
         return stats
 
+    def _quarantine_spool(self, spool: IO[str], reason: str, rows_per_write: int = 10000) -> None:
+        """Writes the records spooled by a failed COPY to the quarantine file"""
+        spool.seek(0)
+        rows = csv.reader(spool)
+        while batch := [CommuneRecord._make(row) for row in islice(rows, rows_per_write)]:
+            write_quarantine(self.quarantine_path, batch, reason)
+
+    def remove_stale(self, seen_keys: Set[Tuple[str, str]], mode: str = "tombstone") -> int:
+        """
+        Handles the communes of the database that are missing from the source.
+
+        Must only be called after a complete and successful load: every
+        imported key absent from seen_keys is considered removed from the
+        source. Rows created or edited through the API (content_hash NULL)
+        are never touched.
+
+        Args:
+            seen_keys: (postal_code, commune_name) keys of the whole source.
+            mode: One of STALE_ROW_MODES.
+
+        Returns:
+            Number of stale communes (tombstoned, deleted or only counted).
+        """
+        if mode not in STALE_ROW_MODES:
+            raise ValueError(f"Traitement des communes obsolètes inconnu : {mode} "
+                             f"(attendu : {', '.join(STALE_ROW_MODES)})")
+
+        if self.dry_run and not self._table_exists():
+            return 0
+
+        table = self.table
+        rows = self.db.execute(
+            select(table.c.id, table.c.postal_code, table.c.commune_name).where(
+                table.c.removed_at.is_(None),
+                # Communes saisies par l'API : hors du périmètre de la source
+                table.c.content_hash.isnot(None),
+            )
+        )
+        stale_ids = [commune_id for commune_id, postal_code, name in rows if (postal_code, name) not in seen_keys]
+        logger.info(f"{len(stale_ids)} communes absentes de la source (mode {mode})")
+        if not stale_ids or mode == "keep":
+            return len(stale_ids)
+
+        removed_at = datetime.now(timezone.utc)
+        for start in range(0, len(stale_ids), self.batch_size):
+            ids = stale_ids[start:start + self.batch_size]
+            if mode == "delete":
+                self.db.execute(delete(table).where(table.c.id.in_(ids)))
+            else:
+                self.db.execute(update(table).where(table.c.id.in_(ids)).values(removed_at=removed_at))
+        self.db.commit()
+        # Lignes retirées hors de l'index des clés : relu au prochain chargement
+        self.reset_key_index()
+        return len(stale_ids)
+
     def get_load_statistics(self) -> Dict[str, Any]:
         """
         Returns the current statistics from the database.
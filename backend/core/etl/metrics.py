@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from core.etl.progress import PHASES
+from schemas.commune import BatchStats, ImportStats, PhaseStats
+
+T = TypeVar('T')
+
+
+class _PhaseMeter:
+    """Cumul des mesures d'une étape"""
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows = 0
+        self.round_trips = 0
+        self.peak_memory: Optional[int] = None
+
+    def to_stats(self, name: str) -> PhaseStats:
+        return PhaseStats(
+            name=name,
+            rows=self.rows,
+            wall_seconds=round(self.wall, 3),
+            cpu_seconds=round(self.cpu, 3),
+            rows_per_second=round(self.rows / self.wall, 1) if self.wall > 0 and self.rows else None,
+            peak_memory_bytes=self.peak_memory,
+            db_round_trips=self.round_trips,
+        )
+
+
+class Measure:
+    """Mesure en cours d'une étape, dont le code mesuré renseigne le nombre de lignes"""
+
+    def __init__(self):
+        self.rows = 0
+
+
+class RunInstrumentation:
+    """Mesures d'un import par étape et par lot : durées, CPU, débit, mémoire et allers-retours base"""
+
+    def __init__(self, trace_memory: bool = False, clock: Callable[[], float] = time.perf_counter):
+        """
+        Initializes the instrumentation of a run.
+
+        CPU time is the time of the thread doing the work (time.thread_time),
+        so that the concurrent stages of the pipelined mode are measured
+        separately; the CPU of transform worker processes and of the
+        database server is not included.
+
+        Database round trips are the statements and commits sent through
+        the engine given to start() by threads with a current phase (see
+        measure() and in_phase()). The engine is shared with the API and
+        the other jobs, so the requests of threads without a phase are not
+        counted.
+
+        Args:
+            trace_memory: Measures the peak of Python allocations per phase
+                with tracemalloc (slows the run down noticeably). Phases
+                running concurrently share the peak.
+            clock: Wall clock, in seconds.
+        """
+        self.trace_memory = trace_memory
+        self.clock = clock
+        self.batches: List[BatchStats] = []
+        self.peak_memory: Optional[int] = None
+        self._meters: Dict[str, _PhaseMeter] = {phase: _PhaseMeter() for phase in PHASES}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._engine: Optional[Union[Engine, Connection]] = None
+        self._started_tracing = False
+
+    def start(self, engine: Any = None) -> None:
+        """
+        Starts counting the round trips of an engine and, if requested,
+        tracing memory allocations.
+
+        Args:
+            engine: Engine (or connection) of the loaded database; anything
+                else, such as a test double, is ignored.
+        """
+        if isinstance(engine, (Engine, Connection)):
+            self._engine = engine
+            event.listen(engine, "before_cursor_execute", self._on_round_trip)
+            event.listen(engine, "commit", self._on_round_trip)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """Stops the counting and the memory tracing started by start()"""
+        if self._engine is not None:
+            event.remove(self._engine, "before_cursor_execute", self._on_round_trip)
+            event.remove(self._engine, "commit", self._on_round_trip)
+            self._engine = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _on_round_trip(self, *args: Any) -> None:
+        phase = getattr(self._local, 'phase', None)
+        if phase is None:
+            # Requête étrangère à l'import (API, suivi des jobs)
+            return
+        self._local.round_trips = getattr(self._local, 'round_trips', 0) + 1
+        with self._lock:
+            self._meters[phase].round_trips += 1
+
+    def _thread_round_trips(self) -> int:
+        return getattr(self._local, 'round_trips', 0)
+
+    @contextmanager
+    def in_phase(self, phase: Optional[str]) -> Iterator[None]:
+        """
+        Attributes the round trips of the current thread to a phase, without
+        measuring its time (e.g. the threads of the parallel load partitions).
+
+        Args:
+            phase: One of PHASES, or None to stop counting them.
+        """
+        previous_phase = getattr(self._local, 'phase', None)
+        self._local.phase = phase
+        try:
+            yield
+        finally:
+            self._local.phase = previous_phase
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[Measure]:
+        """
+        Measures a piece of work of a phase, accumulated with the previous ones.
+
+        Args:
+            phase: One of PHASES.
+
+        Yields:
+            The measure, whose rows attribute the caller sets.
+        """
+        measure = Measure()
+        previous_phase = getattr(self._local, 'phase', None)
+        self._local.phase = phase
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall_start = self.clock()
+        cpu_start = time.thread_time()
+        try:
+            yield measure
+        finally:
+            wall = self.clock() - wall_start
+            cpu = time.thread_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] if tracing else None
+            self._local.phase = previous_phase
+            with self._lock:
+                meter = self._meters[phase]
+                meter.wall += wall
+                meter.cpu += cpu
+                meter.rows += measure.rows
+                if peak is not None:
+                    meter.peak_memory = max(meter.peak_memory or 0, peak)
+                    self.peak_memory = max(self.peak_memory or 0, peak)
+
+    def iterate(self, phase: str, iterable: Iterable[T], rows: Callable[[T], int] = len) -> Iterator[T]:
+        """
+        Measures the production of each item of an iterable (e.g. the chunks
+        read by the extract phase).
+
+        Args:
+            phase: One of PHASES.
+            iterable: Items produced by the phase.
+            rows: Number of rows of an item.
+
+        Yields:
+            The items of the iterable.
+        """
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self.measure(phase) as measure:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    measure.rows = rows(item)
+                yield item
+        finally:
+            # Fermeture du flux source (fichier, connexion HTTP) avec l'itérateur mesuré
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    @contextmanager
+    def batch(self) -> Iterator[Measure]:
+        """
+        Measures one load batch: wall time and round trips of the thread.
+
+        Yields:
+            The measure, whose rows attribute the caller sets.
+        """
+        measure = Measure()
+        round_trips = self._thread_round_trips()
+        start = self.clock()
+        try:
+            yield measure
+        finally:
+            batch = BatchStats(
+                rows=measure.rows,
+                wall_seconds=round(self.clock() - start, 4),
+                db_round_trips=self._thread_round_trips() - round_trips,
+            )
+            with self._lock:
+                batch.index = len(self.batches)
+                self.batches.append(batch)
+
+    def phase_stats(self) -> List[PhaseStats]:
+        """Returns the statistics of the phases, in pipeline order"""
+        with self._lock:
+            return [self._meters[phase].to_stats(phase) for phase in PHASES]
+
+
+def write_run_report(path: str, stats: ImportStats, **context: Any) -> None:
+    """
+    Writes the machine-readable report of a run (JSON), atomically.
+
+    Args:
+        path: Path of the report file.
+        stats: Statistics of the run, with the phase and batch measures.
+        **context: Information on the run (source, options...).
+    """
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        **context,
+        'stats': stats.model_dump(mode='json'),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,92 @@
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from schemas.etl import EtlProgress
+
+# Étapes suivies par l'avancement d'un import
+PHASES = ("extract", "transform", "load")
+
+
+class ETLCancelled(Exception):
+    """Import interrompu par une demande d'annulation"""
+
+
+class ProgressTracker:
+    """Avancement d'un import (lignes par étape) et demande d'annulation coopérative"""
+
+    def __init__(self, expected_rows: Optional[int] = None, clock: Callable[[], float] = time.monotonic,
+                 on_checkpoint: Optional[Callable[["ProgressTracker"], None]] = None):
+        """
+        Initializes the tracker.
+
+        Args:
+            expected_rows: Number of rows expected in the source, for the ETA
+                (optional, set by the pipeline when it becomes known).
+            clock: Time source, in seconds.
+            on_checkpoint: Called with the tracker at each checkpoint, before
+                the cancellation check (e.g. to publish the progress).
+        """
+        self.expected_rows = expected_rows
+        self.rows: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.phase: Optional[str] = None
+        self.clock = clock
+        self.on_checkpoint = on_checkpoint
+        self.started = clock()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def advance(self, phase: str, rows: int) -> None:
+        """
+        Records rows handled by a phase (thread-safe).
+
+        Args:
+            phase: One of PHASES.
+            rows: Number of rows handled since the last call.
+        """
+        with self._lock:
+            self.rows[phase] += rows
+            self.phase = phase
+
+    def cancel(self) -> None:
+        """Requests the cancellation, effective at the next checkpoint"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """Tells whether the cancellation was requested"""
+        return self._cancel.is_set()
+
+    def checkpoint(self) -> None:
+        """
+        Called between batches and chunks: the only places a run stops.
+
+        Raises:
+            ETLCancelled: If the cancellation was requested.
+        """
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(self)
+        if self.cancelled:
+            raise ETLCancelled("Import annulé")
+
+    def snapshot(self) -> EtlProgress:
+        """Returns the progress so far, with the load rate and the ETA"""
+        with self._lock:
+            rows = dict(self.rows)
+            phase = self.phase
+        elapsed = self.clock() - self.started
+
+        loaded = rows["load"]
+        rate = loaded / elapsed if elapsed > 0 and loaded else None
+        eta = None
+        if rate and self.expected_rows:
+            eta = round(max(self.expected_rows - loaded, 0) / rate, 1)
+
+        return EtlProgress(
+            phase=phase,
+            rows=rows,
+            expected_rows=self.expected_rows,
+            elapsed_seconds=round(elapsed, 1),
+            rows_per_second=round(rate, 1) if rate else None,
+            eta_seconds=eta,
+        )
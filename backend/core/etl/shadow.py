@@ -0,0 +1,173 @@
+import logging
+from typing import Dict, Tuple
+
+from sqlalchemy import MetaData, Table, UniqueConstraint, insert, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import AddConstraint, CreateTable
+
+from db.models.commune import Commune
+
+logger = logging.getLogger(__name__)
+
+SHADOW_TABLE = "communes_shadow"
+SHADOW_SUFFIX = "_shadow"
+
+# Attente maximale du verrou de la table communes lors de la bascule (lectures en cours)
+SWAP_LOCK_TIMEOUT = "5s"
+
+
+def _unique_constraint(table: Table) -> UniqueConstraint:
+    return next(c for c in table.constraints if isinstance(c, UniqueConstraint))
+
+
+def build_shadow_table(dialect: str) -> Table:
+    """
+    Builds the definition of the shadow table, a copy of communes.
+
+    Index names are derived from the table name, explicitly named indexes
+    get a suffix. On PostgreSQL, where constraint names must also be unique
+    in the schema, the unique constraint gets a suffix as well.
+
+    Args:
+        dialect: Name of the database dialect.
+
+    Returns:
+        The shadow Table, in its own MetaData.
+    """
+    shadow = Commune.__table__.to_metadata(MetaData(), name=SHADOW_TABLE)
+    # to_metadata garde le nom des index déclarés dans __table_args__
+    live_names = {index.name for index in Commune.__table__.indexes}
+    for index in shadow.indexes:
+        if index.name in live_names:
+            index.name = f"{index.name}{SHADOW_SUFFIX}"
+    if dialect == "postgresql":
+        unique = _unique_constraint(shadow)
+        unique.name = f"{unique.name}{SHADOW_SUFFIX}"
+    return shadow
+
+
+def _live_index_names(shadow: Table) -> Dict[str, str]:
+    """Maps each shadow index name to the name of the live index on the same columns"""
+    live = {tuple(column.name for column in index.columns): index.name for index in Commune.__table__.indexes}
+    return {index.name: live[tuple(column.name for column in index.columns)] for index in shadow.indexes}
+
+
+def prepare_shadow_table(db: Session) -> Table:
+    """
+    Creates the shadow table and fills it with a copy of communes.
+
+    The copy keeps the ids, tombstones and rows created through the API;
+    the load then applies the source to the shadow table like to the live
+    one. Secondary indexes (and on PostgreSQL the unique constraint) are
+    built after the bulk copy.
+
+    Args:
+        db: Database session.
+
+    Returns:
+        The shadow Table, committed and ready to be loaded.
+    """
+    dialect = db.get_bind().dialect.name
+    shadow = build_shadow_table(dialect)
+    unique = _unique_constraint(shadow)
+
+    db.execute(text(f"DROP TABLE IF EXISTS {SHADOW_TABLE}"))
+    if dialect == "postgresql":
+        # Contrainte d'unicité créée après la copie ; SQLite ne sait pas l'ajouter après coup
+        shadow.constraints.discard(unique)
+        db.execute(CreateTable(shadow))
+        shadow.constraints.add(unique)
+    else:
+        db.execute(CreateTable(shadow))
+
+    columns = [column.name for column in shadow.columns]
+    live = Commune.__table__
+    copied = db.execute(
+        insert(shadow).from_select(columns, select(*(live.c[name] for name in columns)))
+    ).rowcount
+
+    if dialect == "postgresql":
+        db.execute(AddConstraint(unique))
+        _sync_sequence(db)
+    for index in shadow.indexes:
+        index.create(db.connection())
+
+    db.commit()
+    logger.info(f"Table fantôme {SHADOW_TABLE} prête : {copied} communes copiées")
+    return shadow
+
+
+def _sync_sequence(db: Session) -> Tuple[str, str]:
+    """
+    Moves the id sequence of the shadow table past every id ever issued by
+    the live one, so that new rows never reuse an id.
+
+    Returns:
+        Names of the live and shadow sequences.
+    """
+    live_sequence = db.execute(text("SELECT pg_get_serial_sequence('communes', 'id')")).scalar_one()
+    shadow_sequence = db.execute(text(f"SELECT pg_get_serial_sequence('{SHADOW_TABLE}', 'id')")).scalar_one()
+    db.execute(
+        text(f"SELECT setval(:shadow, GREATEST((SELECT last_value FROM {live_sequence}), "
+             f"(SELECT coalesce(max(id), 1) FROM {SHADOW_TABLE})))"),
+        {'shadow': shadow_sequence}
+    )
+    return live_sequence, shadow_sequence
+
+
+def swap_shadow_table(db: Session, shadow: Table) -> None:
+    """
+    Replaces communes with the shadow table in a single transaction.
+
+    Readers keep using the previous table until the commit, then see the new
+    one as a whole; the swap itself only holds the lock for a few renames.
+    Writes made to communes while the shadow table was being loaded are lost.
+
+    Args:
+        db: Database session.
+        shadow: Shadow table returned by prepare_shadow_table.
+    """
+    dialect = db.get_bind().dialect.name
+    index_names = _live_index_names(shadow)
+    live_unique = _unique_constraint(Commune.__table__).name
+
+    try:
+        if dialect == "postgresql":
+            db.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+            db.execute(text("LOCK TABLE communes IN ACCESS EXCLUSIVE MODE"))
+            live_sequence, shadow_sequence = _sync_sequence(db)
+            db.execute(text("DROP TABLE communes"))
+            db.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO communes"))
+            db.execute(text(f"ALTER SEQUENCE {shadow_sequence} RENAME TO {live_sequence.split('.')[-1]}"))
+            db.execute(text(f"ALTER TABLE communes RENAME CONSTRAINT {SHADOW_TABLE}_pkey TO communes_pkey"))
+            db.execute(text(f"ALTER TABLE communes RENAME CONSTRAINT {_unique_constraint(shadow).name} "
+                            f"TO {live_unique}"))
+            for shadow_name, live_name in index_names.items():
+                db.execute(text(f"ALTER INDEX {shadow_name} RENAME TO {live_name}"))
+        else:
+            # SQLite ne renomme pas les index : ils sont recréés sous leur nom définitif
+            db.execute(text("DROP TABLE communes"))
+            for shadow_name in index_names:
+                db.execute(text(f"DROP INDEX {shadow_name}"))
+            db.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO communes"))
+            for index in Commune.__table__.indexes:
+                index.create(db.connection())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info("Bascule effectuée : la table fantôme remplace communes")
+
+
+def drop_shadow_table(db: Session) -> None:
+    """
+    Drops the shadow table after a failed load, leaving communes untouched.
+
+    Args:
+        db: Database session.
+    """
+    db.rollback()
+    db.execute(text(f"DROP TABLE IF EXISTS {SHADOW_TABLE}"))
+    db.commit()
+    logger.info(f"Table fantôme {SHADOW_TABLE} supprimée, communes inchangée")
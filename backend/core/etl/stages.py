@@ -0,0 +1,209 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from schemas.commune import StageStats
+
+logger = logging.getLogger(__name__)
+
+# Marque de fin de flux transmise d'une étape à la suivante
+_END = object()
+
+# Période de vérification de l'arrêt demandé pendant une attente sur une file
+_POLL_SECONDS = 0.1
+
+
+class StageCancelled(Exception):
+    """Arrêt d'une étape suite à l'échec d'une autre"""
+
+
+class _StageMeter:
+    """Mesures d'une étape : éléments, lignes, temps de travail et d'attente"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+
+    def to_stats(self) -> StageStats:
+        return StageStats(
+            name=self.name,
+            items=self.items,
+            rows=self.rows,
+            busy_seconds=round(self.busy, 3),
+            input_wait_seconds=round(self.input_wait, 3),
+            output_wait_seconds=round(self.output_wait, 3),
+            rows_per_second=round(self.rows / self.busy, 1) if self.busy > 0 else None,
+        )
+
+
+def _count_rows(item: Any) -> int:
+    return len(item) if hasattr(item, '__len__') else 0
+
+
+class StagePipeline:
+    """Étapes exécutées en parallèle et reliées par des files bornées"""
+
+    def __init__(self, source_name: str, source: Iterable[Any],
+                 stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+                 sink_name: str, sink: Callable[[Any], None], queue_depth: int = 2):
+        """
+        Initializes the pipeline.
+
+        The source and each intermediate stage run in their own thread; the
+        sink runs in the calling thread, which owns the database session. At
+        most queue_depth items wait between two stages, which bounds memory.
+
+        Args:
+            source_name: Name of the source stage in the statistics.
+            source: Iterable producing the items (iterated in its own thread).
+            stages: (name, function) pairs applied in order; a function
+                returning None drops the item.
+            sink_name: Name of the last stage in the statistics.
+            sink: Function consuming each item, called in the calling thread.
+            queue_depth: Maximum number of items waiting between two stages.
+        """
+        self.source = source
+        self.stages = list(stages)
+        self.sink = sink
+        self.queue_depth = max(1, queue_depth)
+        self.meters = [_StageMeter(source_name)] + [_StageMeter(name) for name, _ in self.stages] \
+            + [_StageMeter(sink_name)]
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_lock = threading.Lock()
+
+    def _fail(self, error: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _put(self, output: queue.Queue, item: Any, meter: _StageMeter) -> None:
+        start = time.perf_counter()
+        while True:
+            if self._stop.is_set():
+                raise StageCancelled()
+            try:
+                output.put(item, timeout=_POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        meter.output_wait += time.perf_counter() - start
+
+    def _get(self, source: queue.Queue, meter: _StageMeter) -> Any:
+        start = time.perf_counter()
+        while True:
+            if self._stop.is_set():
+                raise StageCancelled()
+            try:
+                item = source.get(timeout=_POLL_SECONDS)
+                break
+            except queue.Empty:
+                continue
+        meter.input_wait += time.perf_counter() - start
+        return item
+
+    def _run_source(self, output: queue.Queue) -> None:
+        meter = self.meters[0]
+        try:
+            iterator = iter(self.source)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _END)
+                meter.busy += time.perf_counter() - start
+                if item is _END:
+                    break
+                meter.items += 1
+                meter.rows += _count_rows(item)
+                self._put(output, item, meter)
+            self._put(output, _END, meter)
+        except StageCancelled:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Libère la source (réponse HTTP, fichier) même en cas d'arrêt anticipé
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+
+    def _run_stage(self, position: int, func: Callable[[Any], Any],
+                   source: queue.Queue, output: queue.Queue) -> None:
+        meter = self.meters[position]
+        try:
+            while True:
+                item = self._get(source, meter)
+                if item is _END:
+                    self._put(output, _END, meter)
+                    return
+                start = time.perf_counter()
+                result = func(item)
+                meter.busy += time.perf_counter() - start
+                meter.items += 1
+                meter.rows += _count_rows(result)
+                if result is not None:
+                    self._put(output, result, meter)
+        except StageCancelled:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def stage_stats(self) -> List[StageStats]:
+        """Returns the statistics measured so far for each stage, in order"""
+        return [meter.to_stats() for meter in self.meters]
+
+    def run(self) -> List[StageStats]:
+        """
+        Runs every stage until the source is exhausted or a stage fails.
+
+        Returns:
+            The statistics of each stage, in order.
+
+        Raises:
+            Exception: The first error raised by a stage, once all the
+                threads are stopped.
+        """
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_source, args=(queues[0],),
+                                    name=f"etl-{self.meters[0].name}", daemon=True)]
+        for position, (name, func) in enumerate(self.stages, start=1):
+            threads.append(threading.Thread(target=self._run_stage,
+                                            args=(position, func, queues[position - 1], queues[position]),
+                                            name=f"etl-{name}", daemon=True))
+        for thread in threads:
+            thread.start()
+
+        meter = self.meters[-1]
+        try:
+            while True:
+                item = self._get(queues[-1], meter)
+                if item is _END:
+                    break
+                start = time.perf_counter()
+                self.sink(item)
+                meter.busy += time.perf_counter() - start
+                meter.items += 1
+                meter.rows += _count_rows(item)
+        except StageCancelled:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+
+        stats = self.stage_stats()
+        for stage in stats:
+            logger.info(f"Étape {stage.name} : {stage.items} blocs, {stage.rows} lignes, "
+                        f"{stage.busy_seconds}s de travail, {stage.input_wait_seconds}s d'attente en entrée, "
+                        f"{stage.output_wait_seconds}s d'attente en sortie")
+        if self._error is not None:
+            raise self._error
+        return stats
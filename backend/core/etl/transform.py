@@ -1,17 +1,179 @@
+from itertools import repeat
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 import logging
-from db.models.commune import Commune
+from core.config import settings
+from db.models.commune import (
+    SEARCH_KEY_COMBINING_MARKS,
+    SEARCH_KEY_LIGATURES,
+    SEARCH_KEY_SEPARATORS,
+    Commune,
+)
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    pa = None
 
 logger = logging.getLogger(__name__)
 
+# Colonnes du CSV source utilisées par le pipeline
+REQUIRED_COLUMNS = ['code_postal', 'nom_commune_complet']
+
+# Département par préfixe à 3 chiffres du code postal (000 à 999)
+_DEPARTEMENT_BY_PREFIX = np.array(
+    [Commune.calculate_departement(f"{prefix:03d}00") for prefix in range(1000)],
+    dtype=object
+)
+
+
+# Clé de dédoublonnage des communes
+DEDUPLICATION_KEY = ['code_postal', 'nom_commune_complet']
+
+
+class CommuneRecord(NamedTuple):
+    """Ligne transformée transmise au chargement (tuple compact, sans dict par ligne)"""
+    code_postal: str
+    nom_commune_complet: str
+    departement: str
+    # Calculée par le chargement si absente (cf. Commune.normalize_search_key)
+    search_key: Optional[str] = None
+
+
+def _write_ipc_stream(sink: Any, table: "pa.Table") -> None:
+    """Writes a table as an Arrow IPC stream; every reference to sink is released on return"""
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+def _write_shared_frame(df: pd.DataFrame) -> Tuple[str, int]:
+    """
+    Writes a DataFrame to a new shared memory block in Arrow IPC format.
+
+    Args:
+        df: DataFrame to share, index included.
+
+    Returns:
+        Name of the shared memory block and size of the IPC stream. The
+        block stays allocated until the reader unlinks it.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    mock = pa.MockOutputStream()
+    _write_ipc_stream(mock, table)
+    size = mock.size()
+
+    shm = SharedMemory(create=True, size=size)
+    try:
+        # Écriture directe dans le segment, sans tampon intermédiaire
+        _write_ipc_stream(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return shm.name, size
+
+
+def _read_ipc_stream(buffer: memoryview, size: int) -> pd.DataFrame:
+    """Reads an Arrow IPC stream into a DataFrame that no longer references buffer"""
+    with pa.ipc.open_stream(pa.py_buffer(buffer[:size])) as reader:
+        table = reader.read_all()
+    # Copie profonde (colonnes et index) : rien ne doit pointer vers le segment partagé
+    df = table.to_pandas().copy(deep=True)
+    df.index = df.index.copy(deep=True)
+    return df
+
+
+def _unlink_shared_frame(name: str) -> None:
+    """Frees a shared memory block written by _write_shared_frame, if still allocated"""
+    try:
+        SharedMemory(name=name).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _read_shared_frame(name: str, size: int) -> pd.DataFrame:
+    """
+    Reads a DataFrame written by _write_shared_frame, then frees the block.
+
+    Args:
+        name: Name of the shared memory block.
+        size: Size of the IPC stream.
+
+    Returns:
+        The DataFrame, copied out of the shared memory.
+    """
+    shm = SharedMemory(name=name)
+    try:
+        df = _read_ipc_stream(shm.buf, size)
+    finally:
+        shm.close()
+        shm.unlink()
+    return df
+
+
+def _transform_partition(name: str, size: int) -> Tuple[str, int]:
+    """
+    Cleans one partition and adds its departments, in a worker process.
+
+    Input and output go through shared memory, only the block names and
+    sizes are pickled.
+
+    Args:
+        name: Shared memory block holding the filtered partition.
+        size: Size of the IPC stream.
+
+    Returns:
+        Shared memory block name and size of the transformed partition.
+    """
+    transformer = DataTransformer()
+    partition = _read_shared_frame(name, size)
+    result = transformer.add_derived_columns(transformer.clean_data(partition))
+    return _write_shared_frame(result)
+
 
 class DataTransformer:
     """Classe responsable de la transformation des données"""
     
-    def __init__(self):
-        """Initialise le transformateur"""
-        pass
+    def __init__(self, workers: Optional[int] = None, parallel_min_rows: Optional[int] = None):
+        """
+        Initialise le transformateur
+
+        Args:
+            workers: Nombre de processus pour le nettoyage des gros fichiers
+                (défaut : settings.ETL_TRANSFORM_WORKERS, 1 : transformation en série)
+            parallel_min_rows: Nombre de lignes à partir duquel la transformation
+                est répartie entre les processus (défaut : settings.ETL_TRANSFORM_PARALLEL_MIN_ROWS)
+        """
+        self.workers = workers or settings.ETL_TRANSFORM_WORKERS
+        self.parallel_min_rows = (settings.ETL_TRANSFORM_PARALLEL_MIN_ROWS
+                                  if parallel_min_rows is None else parallel_min_rows)
+        # Processus de transformation, démarrés au premier gros lot et gardés jusqu'à close() :
+        # les chunks suivants ne repayent ni le démarrage ni l'import de pandas / pyarrow
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        """Returns the process pool of the transformer, started by its first parallel transform"""
+        if self._pool is None:
+            # spawn : pas de fork d'un processus multi-thread (serveur, pipeline par étapes)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self) -> None:
+        """
+        Stops the worker processes of the parallel transform, at the end of
+        an import. A later parallel transform starts new ones.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
     
     def filter_required_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -23,7 +185,7 @@ class DataTransformer:
         Returns:
             DataFrame with only the required columns.
         """
-        required_columns = ['code_postal', 'nom_commune_complet']
+        required_columns = REQUIRED_COLUMNS
         
         # Vérification de la présence des colonnes
         missing_columns = [col for col in required_columns if col not in df.columns]
@@ -32,8 +194,9 @@ class DataTransformer:
             logger.info(f"Colonnes disponibles : {list(df.columns)}")
             raise ValueError(f"Colonnes manquantes dans le CSV : {missing_columns}")
         
-        # Filtrage des colonnes
-        filtered_df = df[required_columns].copy()
+        # Filtrage des colonnes : une seule copie, des colonnes utiles uniquement, indépendante
+        # du DataFrame source (sans l'avertissement SettingWithCopy d'une sélection df[...])
+        filtered_df = df.reindex(columns=required_columns)
         logger.info(f"Filtrage effectué : {len(filtered_df)} lignes conservées")
         
         return filtered_df
@@ -48,26 +211,26 @@ class DataTransformer:
         Returns:
             Cleaned DataFrame.
         """
-        cleaned_df = df.copy()
-        
         # Suppression des lignes avec des valeurs manquantes critiques
-        initial_count = len(cleaned_df)
-        cleaned_df = cleaned_df.dropna(subset=['code_postal', 'nom_commune_complet'])
+        initial_count = len(df)
+        cleaned_df = df.dropna(subset=['code_postal', 'nom_commune_complet'])
         
-        cleaned_df['code_postal'] = cleaned_df['code_postal'].astype(str).str.strip()
+        postal_codes = cleaned_df['code_postal'].astype(str).str.strip()
         
-        # Filtrage des codes postaux valides (5 chiffres)
-        cleaned_df = cleaned_df[cleaned_df['code_postal'].str.match(r'^\d{5}$')]
+        # Filtrage des codes postaux valides (5 chiffres) : seule sélection de lignes systématique
+        valid_codes = postal_codes.str.match(r'^\d{5}$').to_numpy(dtype=bool)
+        cleaned_df = cleaned_df[valid_codes]
 
-        # Nettoyage et mise en majuscules des noms de communes
-        cleaned_df['nom_commune_complet'] = (
-            cleaned_df['nom_commune_complet']
-            .astype(str)
-            .str.strip()
-            .str.upper()
+        # Nettoyage et mise en majuscules des noms de communes ; assign remplace les
+        # colonnes sur un nouveau DataFrame, celui de l'appelant n'est jamais modifié
+        cleaned_df = cleaned_df.assign(
+            code_postal=postal_codes[valid_codes],
+            nom_commune_complet=cleaned_df['nom_commune_complet'].astype(str).str.strip().str.upper(),
         )
         
-        cleaned_df = cleaned_df.drop_duplicates(subset=['code_postal', 'nom_commune_complet'])
+        duplicates = cleaned_df.duplicated(subset=DEDUPLICATION_KEY)
+        if duplicates.any():
+            cleaned_df = cleaned_df[~duplicates]
         
         final_count = len(cleaned_df)
         logger.info(f"Nettoyage terminé : {initial_count} -> {final_count} lignes "
@@ -75,6 +238,50 @@ class DataTransformer:
         
         return cleaned_df
     
+    @staticmethod
+    def compute_departements(postal_codes: pd.Series) -> pd.Series:
+        """
+        Vectorized equivalent of Commune.calculate_departement.
+
+        The department only depends on the first three digits of the postal
+        code, so the column is decoded once into a numpy code-point matrix and
+        mapped through a 1000-entry lookup table built with
+        calculate_departement itself.
+
+        Args:
+            postal_codes: Series of 5-character postal codes.
+
+        Returns:
+            Series of department numbers, aligned on the input index.
+
+        Raises:
+            ValueError: If a postal code is invalid.
+        """
+        # Tableau unicode de largeur fixe : un 6e caractère trahit un code trop long,
+        # les valeurs manquantes deviennent 'nan' / 'None' / '<NA>' et sont rejetées
+        codes = postal_codes.to_numpy(dtype=object).astype('U6')
+        points = codes.view(np.uint32).reshape(-1, 6)
+
+        invalid = (points[:, 4] == 0) | (points[:, 5] != 0)
+
+        # Soustraction non signée : tout caractère hors '0'-'9' dépasse 9
+        digits = points[:, :5] - np.uint32(ord('0'))
+        numeric = (digits <= 9).all(axis=1)
+        # calculate_departement convertit les codes corses en entier
+        invalid |= ~numeric & (codes.astype('U2') == "20")
+
+        if invalid.any():
+            raise ValueError(f"Code postal invalide: {postal_codes[invalid].iloc[0]}")
+
+        prefixes = np.where(numeric, digits[:, 0] * 100 + digits[:, 1] * 10 + digits[:, 2], 0)
+        departements = _DEPARTEMENT_BY_PREFIX[prefixes]
+
+        # Codes non numériques (hors Corse) : même découpage que le modèle
+        if not numeric.all():
+            departements[~numeric] = [Commune.calculate_departement(code) for code in codes[~numeric]]
+
+        return pd.Series(departements, index=postal_codes.index, dtype=object)
+
     def add_departement_column(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Adds the department column calculated from the postal code.
@@ -85,16 +292,54 @@ class DataTransformer:
         Returns:
             DataFrame with the department column added.
         """
-        df_with_dept = df.copy()
-        
-        # Use lambda wrapper to handle mocking properly
-        df_with_dept['departement'] = df_with_dept['code_postal'].apply(
-            lambda x: Commune.calculate_departement(x)
-        )
+        # Copie paresseuse : seule la nouvelle colonne est allouée
+        df_with_dept = df.assign(departement=self.compute_departements(df['code_postal']))
 
         logger.debug(f"Département ajoutée!!!")
 
         return df_with_dept
+
+    @staticmethod
+    def compute_search_keys(names: pd.Series) -> pd.Series:
+        """
+        Vectorized equivalent of Commune.normalize_search_key.
+
+        Args:
+            names: Series of municipality names.
+
+        Returns:
+            Series of search keys, aligned on the input index. Missing
+            names stay missing.
+        """
+        folded = names.str.upper()
+        for ligature, replacement in SEARCH_KEY_LIGATURES.items():
+            folded = folded.str.replace(ligature, replacement, regex=False)
+        folded = folded.str.normalize('NFKD').str.replace(SEARCH_KEY_COMBINING_MARKS, '', regex=True)
+        return folded.str.replace(SEARCH_KEY_SEPARATORS, ' ', regex=True).str.strip()
+
+    def add_search_key_column(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds the search key column computed from the municipality name.
+
+        Args:
+            df: DataFrame with the nom_commune_complet column.
+
+        Returns:
+            DataFrame with the search_key column added.
+        """
+        return df.assign(search_key=self.compute_search_keys(df['nom_commune_complet']))
+
+    def add_derived_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Adds the columns computed from the cleaned data (department, search key).
+
+        Args:
+            df: Cleaned DataFrame.
+
+        Returns:
+            DataFrame ready for import.
+        """
+        return self.add_search_key_column(self.add_departement_column(df))
     
     def transform_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -109,15 +354,86 @@ class DataTransformer:
         logger.info("Début de la transformation des données")
         
         filtered_df = self.filter_required_columns(df)
-        
-        cleaned_df = self.clean_data(filtered_df)
-        
-        final_df = self.add_departement_column(cleaned_df)
+
+        if self.workers > 1 and len(filtered_df) >= max(self.parallel_min_rows, self.workers):
+            final_df = self._transform_parallel(filtered_df)
+        else:
+            cleaned_df = self.clean_data(filtered_df)
+
+            final_df = self.add_derived_columns(cleaned_df)
         
         logger.info(f"Transformation terminée : {len(final_df)} communes prêtes à importer")
         
         return final_df
     
+    def _transform_parallel(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Runs clean_data and add_derived_columns on contiguous partitions
+        in a process pool.
+
+        Partitions travel through shared memory as Arrow IPC streams instead
+        of being pickled. Each partition keeps the first occurrence of its
+        duplicates and the partitions are concatenated in order, so keeping
+        the first occurrence again across partitions gives the same rows,
+        order, index and values as the serial transform.
+
+        Args:
+            df: DataFrame filtered on the required columns.
+
+        Returns:
+            Transformed DataFrame, identical to the serial result.
+        """
+        if pa is None:
+            logger.warning("pyarrow absent : transformation en série")
+            return self.add_derived_columns(self.clean_data(df))
+
+        # Tous les segments créés (entrées et sorties) sont libérés en fin de transformation,
+        # y compris ceux d'un lot interrompu par une erreur
+        blocks: List[Tuple[str, int]] = []
+        outputs: List[Tuple[str, int]] = []
+        try:
+            try:
+                for start, stop in self._partition_bounds(len(df)):
+                    blocks.append(_write_shared_frame(df.iloc[start:stop]))
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                # Colonnes de types mélangés, non représentables en Arrow
+                logger.warning(f"Transformation parallèle impossible ({e}) : transformation en série")
+                return self.add_derived_columns(self.clean_data(df))
+
+            logger.info(f"Transformation parallèle : {len(blocks)} partitions sur {self.workers} processus")
+            pool = self._process_pool()
+            futures = [pool.submit(_transform_partition, name, size) for name, size in blocks]
+            # Partitions toutes terminées : les segments produits par celles réussies sont tous connus
+            wait(futures)
+            outputs = [future.result() for future in futures if future.exception() is None]
+            for future in futures:
+                if isinstance(future.exception(), BrokenProcessPool):
+                    # Processus arrêté brutalement (mémoire...) : pool inutilisable, recréé au prochain lot
+                    self.close()
+                future.result()
+
+            results = [_read_shared_frame(name, size) for name, size in outputs]
+        finally:
+            for name, _ in blocks + outputs:
+                _unlink_shared_frame(name)
+
+        combined = pd.concat(results)
+        duplicates = combined.duplicated(subset=DEDUPLICATION_KEY)
+        if duplicates.any():
+            combined = combined[~duplicates]
+        elif len(combined) == len(df):
+            # Aucune ligne supprimée : la transformation en série garde l'index d'origine (RangeIndex compris)
+            combined.index = df.index
+
+        logger.info(f"Nettoyage terminé : {len(df)} -> {len(combined)} lignes "
+                    f"({len(df) - len(combined)} lignes supprimées)")
+        return combined
+
+    def _partition_bounds(self, rows: int) -> List[Tuple[int, int]]:
+        """Splits rows positions into one contiguous range per worker"""
+        edges = np.linspace(0, rows, self.workers + 1).astype(int)
+        return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
     def to_dict_list(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
         """
         Converts the DataFrame into a list of dictionaries.
@@ -130,8 +446,37 @@ class DataTransformer:
         """
 
         # Conversion en dictionnaires avec gestion des valeurs NaN
-        records = df.fillna('').to_dict('records')
+        # (fillna n'est appliqué, et le DataFrame copié, que s'il y a des NaN)
+        if df.isna().to_numpy().any():
+            df = df.fillna('')
+        records = df.to_dict('records')
         
         logger.info(f"Conversion en dictionnaires : {len(records)} enregistrements")
         
-        return records
\ No newline at end of file
+        return records
+
+    def iter_records(self, df: pd.DataFrame) -> Iterator[CommuneRecord]:
+        """
+        Streams the DataFrame rows as CommuneRecord tuples.
+
+        The rows are zipped from the column arrays and built lazily, so no
+        dictionary per row and no full list is materialised.
+
+        Args:
+            df: Transformed DataFrame.
+
+        Yields:
+            One CommuneRecord per row, NaN values replaced by empty strings.
+            A missing optional column (search_key) is left to its default.
+        """
+        columns = []
+        for field in CommuneRecord._fields:
+            if field not in df.columns and field in CommuneRecord._field_defaults:
+                columns.append(repeat(CommuneRecord._field_defaults[field]))
+                continue
+            column = df[field]
+            if column.isna().any():
+                column = column.fillna('')
+            columns.append(column.to_numpy(dtype=object))
+
+        yield from map(CommuneRecord._make, zip(*columns))
@@ -0,0 +1,259 @@
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from core.config import settings
+from core.lock import EtlLock
+from db.models.etl_run import EtlRun
+from schemas.commune import ImportStats
+from schemas.etl import EtlJobCreate, EtlJobOut
+
+if TYPE_CHECKING:
+    from core.etl.progress import ProgressTracker
+
+logger = logging.getLogger(__name__)
+
+# États d'un import lancé par l'API
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Intervalle minimal entre deux synchronisations de l'avancement avec la base
+PROGRESS_SYNC_SECONDS = 1.0
+
+
+class JobConflictError(Exception):
+    """Un import des communes est déjà en cours"""
+
+
+class JobNotFoundError(Exception):
+    """Import inconnu"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class _ProgressSync:
+    """Publie l'avancement d'un import dans etl_runs et y lit la demande d'annulation"""
+
+    def __init__(self, engine: Engine, job_id: int, interval: float):
+        self.engine = engine
+        self.job_id = job_id
+        self.interval = interval
+        self._last_sync: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, tracker: "ProgressTracker") -> None:
+        now = tracker.clock()
+        if self._last_sync is not None and now - self._last_sync < self.interval:
+            return
+        # Chargement parallèle : une seule partition synchronise à la fois
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sync = now
+            with self.engine.begin() as connection:
+                connection.execute(
+                    update(EtlRun).where(EtlRun.id == self.job_id)
+                    .values(progress=tracker.snapshot().model_dump())
+                )
+                cancel_requested = connection.execute(
+                    select(EtlRun.cancel_requested).where(EtlRun.id == self.job_id)
+                ).scalar_one()
+        except Exception as e:
+            # Le suivi ne doit jamais interrompre l'import
+            logger.warning(f"Avancement de l'import {self.job_id} non enregistré : {str(e)}")
+            return
+        finally:
+            self._lock.release()
+        # Annulation demandée par un autre worker
+        if cancel_requested:
+            tracker.cancel()
+
+
+class ETLJobManager:
+    """Lancement, suivi et annulation des imports des communes en tâche de fond"""
+
+    def __init__(self, engine: Engine, lock_file: Optional[str] = None,
+                 pipeline_factory: Optional[Callable[..., Any]] = None,
+                 sync_interval: float = PROGRESS_SYNC_SECONDS):
+        """
+        Initializes the manager.
+
+        Runs are stored in the etl_runs table, so that every API worker can
+        list them, follow their progress and request their cancellation.
+        The import itself runs in a thread of the worker that started it,
+        under the same EtlLock as the startup import.
+
+        Args:
+            engine: Engine of the database.
+            lock_file: Lock file used when the database is not PostgreSQL
+                (default: settings.ETL_LOCK_FILE).
+            pipeline_factory: Builds the pipeline from a session, the source
+                URL and keyword options (default: CommunesETLPipeline).
+            sync_interval: Minimal interval in seconds between two progress
+                writes (and cancellation reads) in the database.
+        """
+        self.engine = engine
+        self.lock_file = lock_file
+        self.pipeline_factory = pipeline_factory
+        self.sync_interval = sync_interval
+        self.session_factory = sessionmaker(bind=engine)
+        self._trackers: Dict[int, "ProgressTracker"] = {}
+        self._threads: Dict[int, threading.Thread] = {}
+
+    def start(self, db: Session, options: EtlJobCreate) -> EtlJobOut:
+        """
+        Starts an import in a background thread.
+
+        Args:
+            db: Database session of the request.
+            options: Options of the import.
+
+        Returns:
+            The started run.
+
+        Raises:
+            JobConflictError: If an import is already running, in this
+                process or in another one.
+        """
+        lock = EtlLock(self.engine, self.lock_file)
+        if not lock.acquire(blocking=False):
+            raise JobConflictError("Un import des communes est déjà en cours")
+
+        try:
+            # Verrou obtenu : un import encore "running" a été interrompu (arrêt du processus)
+            db.execute(
+                update(EtlRun).where(EtlRun.status == JOB_RUNNING)
+                .values(status=JOB_FAILED, finished_at=_now())
+            )
+            run = EtlRun(status=JOB_RUNNING, started_at=_now(), cancel_requested=False,
+                         options=options.model_dump(exclude_none=True))
+            db.add(run)
+            db.commit()
+            db.refresh(run)
+
+            # Import différé : pandas et pyarrow ne ralentissent pas le démarrage de l'API
+            from core.etl.progress import ProgressTracker
+
+            tracker = ProgressTracker(expected_rows=self._expected_rows(db),
+                                      on_checkpoint=_ProgressSync(self.engine, run.id, self.sync_interval))
+            self._trackers[run.id] = tracker
+            thread = threading.Thread(target=self._run, args=(run.id, options, tracker, lock),
+                                      name=f"etl-job-{run.id}", daemon=True)
+            self._threads[run.id] = thread
+            thread.start()
+        except Exception:
+            lock.release()
+            raise
+
+        logger.info(f"Import {run.id} lancé")
+        return self._to_job(run)
+
+    def _expected_rows(self, db: Session) -> Optional[int]:
+        """Number of rows processed by the last successful import, for the ETA"""
+        stats = db.execute(
+            select(EtlRun.stats).where(EtlRun.status == JOB_SUCCEEDED).order_by(EtlRun.id.desc()).limit(1)
+        ).scalar_one_or_none()
+        return (stats or {}).get('total_processed') or None
+
+    def _run(self, job_id: int, options: EtlJobCreate, tracker: "ProgressTracker", lock: EtlLock) -> None:
+        db = self.session_factory()
+        try:
+            pipeline_factory = self.pipeline_factory
+            if pipeline_factory is None:
+                from core.etl import CommunesETLPipeline
+                pipeline_factory = CommunesETLPipeline
+
+            pipeline = pipeline_factory(
+                db, settings.CSV_COMMUNES_URL, progress=tracker,
+                **options.model_dump(exclude={'force'}, exclude_none=True)
+            )
+            stats = pipeline.run_full_pipeline(force=options.force)
+            if stats.errors and tracker.cancelled:
+                status = JOB_CANCELLED
+            else:
+                status = JOB_FAILED if stats.errors else JOB_SUCCEEDED
+        except Exception as e:
+            error_msg = f"Erreur lors de l'import {job_id} : {str(e)}"
+            logger.error(error_msg)
+            stats = ImportStats(total_processed=0, total_imported=0, total_updated=0, errors=[error_msg])
+            status = JOB_FAILED
+        finally:
+            db.close()
+
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    update(EtlRun).where(EtlRun.id == job_id).values(
+                        status=status, finished_at=_now(),
+                        progress=tracker.snapshot().model_dump(), stats=stats.model_dump()
+                    )
+                )
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement de l'import {job_id} : {str(e)}")
+        finally:
+            lock.release()
+            self._trackers.pop(job_id, None)
+            logger.info(f"Import {job_id} terminé : {status}")
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> None:
+        """Waits for the end of a run started by this process"""
+        thread = self._threads.get(job_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def _to_job(self, run: EtlRun) -> EtlJobOut:
+        """Builds the API view of a run, with the live progress if it runs in this process"""
+        job = EtlJobOut.model_validate(run)
+        tracker = self._trackers.get(run.id)
+        if tracker is not None and job.status == JOB_RUNNING:
+            # Avancement en mémoire, plus récent que la dernière synchronisation
+            job.progress = tracker.snapshot()
+        return job
+
+    def get(self, db: Session, job_id: int) -> EtlJobOut:
+        """
+        Returns a run.
+
+        Raises:
+            JobNotFoundError: If the run does not exist.
+        """
+        run = db.get(EtlRun, job_id)
+        if run is None:
+            raise JobNotFoundError(f"Import {job_id} introuvable")
+        return self._to_job(run)
+
+    def list(self, db: Session, limit: int = 20) -> List[EtlJobOut]:
+        """Returns the most recent runs first"""
+        runs = db.execute(select(EtlRun).order_by(EtlRun.id.desc()).limit(limit)).scalars()
+        return [self._to_job(run) for run in runs]
+
+    def cancel(self, db: Session, job_id: int) -> EtlJobOut:
+        """
+        Requests the cancellation of a run, applied at its next batch.
+
+        Raises:
+            JobNotFoundError: If the run does not exist.
+            JobConflictError: If the run is already over.
+        """
+        run = db.get(EtlRun, job_id)
+        if run is None:
+            raise JobNotFoundError(f"Import {job_id} introuvable")
+        if run.status != JOB_RUNNING:
+            raise JobConflictError(f"Import {job_id} déjà terminé ({run.status})")
+
+        run.cancel_requested = True
+        db.commit()
+        tracker = self._trackers.get(job_id)
+        if tracker is not None:
+            tracker.cancel()
+        logger.info(f"Annulation de l'import {job_id} demandée")
+        return self._to_job(run)
@@ -0,0 +1,111 @@
+import fcntl
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Clé du verrou consultatif PostgreSQL de l'import des communes
+ADVISORY_LOCK_KEY = 4_263_001
+
+LOCK_FILE_NAME = "communes_etl.lock"
+
+
+class EtlLock:
+    """Verrou inter-processus garantissant qu'un seul import des communes s'exécute"""
+
+    def __init__(self, engine: Engine, lock_file: Optional[str] = None):
+        """
+        Initializes the lock.
+
+        On PostgreSQL, a session-level advisory lock held on a dedicated
+        connection serializes every process using the database, whatever
+        the host. Elsewhere, an flock on a local file serializes the
+        processes of the host. Both are released if the process dies.
+
+        Args:
+            engine: Engine of the database being loaded.
+            lock_file: Path of the lock file for the other databases
+                (default: settings.ETL_LOCK_FILE, or a file in the temporary directory).
+        """
+        self.engine = engine
+        self.lock_file = lock_file or settings.ETL_LOCK_FILE or os.path.join(tempfile.gettempdir(), LOCK_FILE_NAME)
+        self._connection: Optional[Connection] = None
+        self._fd: Optional[int] = None
+
+    @property
+    def uses_advisory_lock(self) -> bool:
+        """Tells whether the lock is a PostgreSQL advisory lock"""
+        return self.engine.dialect.name == "postgresql"
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Acquires the lock.
+
+        Args:
+            blocking: Wait for the lock instead of giving up if it is held.
+
+        Returns:
+            True if the lock is now held by this instance.
+        """
+        if self.uses_advisory_lock:
+            connection = self.engine.connect()
+            try:
+                if blocking:
+                    connection.execute(text("SELECT pg_advisory_lock(:key)"), {'key': ADVISORY_LOCK_KEY})
+                    acquired = True
+                else:
+                    acquired = connection.execute(
+                        text("SELECT pg_try_advisory_lock(:key)"), {'key': ADVISORY_LOCK_KEY}
+                    ).scalar_one()
+                # Verrou de session : la connexion ne reste pas en transaction
+                connection.commit()
+            except Exception:
+                connection.close()
+                raise
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+            return True
+
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        """Releases the lock if this instance holds it"""
+        if self._connection is not None:
+            try:
+                self._connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': ADVISORY_LOCK_KEY})
+                self._connection.commit()
+            finally:
+                self._connection.close()
+                self._connection = None
+        if self._fd is not None:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "EtlLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
@@ -0,0 +1,158 @@
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.lock import EtlLock
+from crud.commune import backfill_search_keys
+from schemas.commune import ImportStats
+from schemas.etl import StartupStatus
+
+logger = logging.getLogger(__name__)
+
+# États de l'import de démarrage
+STATUS_PENDING = "pending"
+STATUS_WAITING = "waiting"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+STATUS_DONE_ELSEWHERE = "done_elsewhere"
+
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_SKIPPED, STATUS_DONE_ELSEWHERE)
+
+
+class StartupETL:
+    """Import des communes et rattrapage des clés de recherche exécutés en tâche de fond au démarrage de l'API"""
+
+    def __init__(self, session_factory: Callable[[], Session], engine: Engine,
+                 enabled: Optional[bool] = None, lock_file: Optional[str] = None,
+                 pipeline_factory: Optional[Callable[..., Any]] = None):
+        """
+        Initializes the startup import.
+
+        Args:
+            session_factory: Factory of the database sessions.
+            engine: Engine of the database, used for the inter-process lock.
+            enabled: Run the import at startup (default: settings.ETL_ON_STARTUP).
+            lock_file: Lock file used when the database is not PostgreSQL
+                (default: settings.ETL_LOCK_FILE).
+            pipeline_factory: Builds the pipeline from a session and the source URL
+                (default: CommunesETLPipeline).
+        """
+        self.session_factory = session_factory
+        self.engine = engine
+        self.enabled = settings.ETL_ON_STARTUP if enabled is None else enabled
+        self.lock_file = lock_file
+        self.pipeline_factory = pipeline_factory
+        self.status = STATUS_PENDING
+        self.stats: Optional[ImportStats] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        """Tells whether the startup import is over (whatever its outcome)"""
+        return self.status in FINISHED_STATUSES
+
+    def start(self) -> None:
+        """
+        Starts the background thread: the import, unless disabled (then
+        marked skipped), followed by the search key backfill (see
+        crud.commune.backfill_search_keys).
+        """
+        if not self.enabled:
+            logger.info("Import des communes au démarrage désactivé (ETL_ON_STARTUP)")
+            self.status = STATUS_SKIPPED
+
+        self._thread = threading.Thread(target=self._run, name="etl-startup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the end of the import.
+
+        Args:
+            timeout: Maximum wait in seconds, None to wait indefinitely.
+
+        Returns:
+            True if the import is over.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def _run(self) -> None:
+        lock = EtlLock(self.engine, self.lock_file)
+        try:
+            if not lock.acquire(blocking=False):
+                if not self.enabled:
+                    # Clés de recherche rattrapées par le worker qui détient le verrou
+                    return
+                # Un autre worker importe déjà : attente de la fin de son import, sans le refaire
+                logger.info("Import des communes en cours dans un autre processus : attente de sa fin")
+                self.status = STATUS_WAITING
+                lock.acquire()
+                lock.release()
+                self.status = STATUS_DONE_ELSEWHERE
+                logger.info(f"Import des communes au démarrage terminé : {self.status}")
+                return
+
+            try:
+                if self.enabled:
+                    self._import()
+                # Après l'import, qui a déjà rempli la clé des lignes importées
+                self._backfill_search_keys()
+            finally:
+                lock.release()
+        except Exception as e:
+            if not self.enabled:
+                # Import désactivé : seul le rattrapage des clés a échoué
+                logger.error(f"Erreur lors du calcul des clés de recherche manquantes : {str(e)}")
+                return
+            self._fail(e)
+
+    def _import(self) -> None:
+        """Runs the import, holding the lock"""
+        try:
+            self.status = STATUS_RUNNING
+            logger.info("Import des communes en tâche de fond")
+            pipeline_factory = self.pipeline_factory
+            if pipeline_factory is None:
+                # Import différé : pandas et pyarrow ne ralentissent pas le démarrage de l'API
+                from core.etl import CommunesETLPipeline
+                pipeline_factory = CommunesETLPipeline
+
+            db = self.session_factory()
+            try:
+                self.stats = pipeline_factory(db, settings.CSV_COMMUNES_URL).run_full_pipeline()
+            finally:
+                db.close()
+            self.status = STATUS_FAILED if self.stats.errors else STATUS_SUCCEEDED
+        except Exception as e:
+            self._fail(e)
+        finally:
+            logger.info(f"Import des communes au démarrage terminé : {self.status}")
+
+    def _fail(self, error: Exception) -> None:
+        error_msg = f"Erreur lors de l'import des communes au démarrage : {str(error)}"
+        logger.error(error_msg)
+        self.stats = ImportStats(total_processed=0, total_imported=0, total_updated=0, errors=[error_msg])
+        self.status = STATUS_FAILED
+
+    def _backfill_search_keys(self) -> None:
+        """Fills the missing search keys, without ever failing the startup"""
+        try:
+            db = self.session_factory()
+            try:
+                backfill_search_keys(db)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul des clés de recherche manquantes : {str(e)}")
+
+    def to_status(self) -> StartupStatus:
+        """Returns the readiness report of the startup import"""
+        return StartupStatus(ready=self.ready, status=self.status, stats=self.stats)
@@ -1,13 +1,17 @@
 import logging
-from sqlalchemy import func
+from sqlalchemy.orm import load_only
 from typing import List, Optional
 
 from schemas.commune import CommuneCreate, CommuneUpdate
-from db.models.commune import Commune
+from db.models.commune import LOOKUP_INCLUDED_COLUMNS, Commune
 
 
 logger = logging.getLogger(__name__)
 
+# Colonnes chargées par les recherches par nom (champs de CommuneOut et removed_at) : code postal
+# de la clé et colonnes incluses dans ix_communes_search_key_postal_code, sans accès à la table
+LOOKUP_COLUMNS = tuple(getattr(Commune, name) for name in ("postal_code", *LOOKUP_INCLUDED_COLUMNS))
+
 def create_commune(db, commune_data: CommuneCreate) -> Commune:
         """
         Creates or updates a municipality.
@@ -19,19 +23,27 @@ def create_commune(db, commune_data: CommuneCreate) -> Commune:
             Municipality object created or updated.
         """
 
-        existing_commune = get_commune_by_name_and_postal(
+        # Identité exacte des imports (code postal, nom en majuscules) : une graphie voisine
+        # ("Saint Etienne" pour "SAINT-ÉTIENNE") crée une commune au lieu de renommer l'existante
+        existing_commune = get_commune_by_identity(
             db,
             commune_data.name, 
-            commune_data.postalCode
+            commune_data.postalCode,
+            include_removed=True
         )
         
         if existing_commune:
+            if existing_commune.removed_at is not None:
+                # Commune retirée par un import incrémental : on la rétablit
+                existing_commune.removed_at = None
+                db.flush()
             logger.info(f"Mise à jour de la commune existante : {commune_data.name}")
             return update_commune(db, existing_commune.id, commune_data)
         
         db_commune = Commune(
             postal_code=commune_data.postalCode,
             commune_name=commune_data.name.upper(),
+            search_key=Commune.normalize_search_key(commune_data.name),
             departement=commune_data.departement,
             latitude=commune_data.latitude,
             longitude=commune_data.longitude
@@ -52,13 +64,16 @@ def get_commune_by_id(db, commune_id: int) -> Optional[Commune]:
         municipality_id: ID of the municipality.
         
     Returns:
-        Municipality object or None if not found.
+        Municipality object or None if not found (or removed from the source).
     """
-    return db.query(Commune).filter(Commune.id == commune_id).first()
+    return db.query(Commune).filter(
+        Commune.id == commune_id,
+        Commune.removed_at.is_(None)
+    ).first()
 
 def get_commune_by_name(db, nom_commune: str) -> Optional[Commune]:
     """
-    Retrieves a municipality by name (case-insensitive search)
+    Retrieves a municipality by name (case, accent and punctuation insensitive search)
     
     Args:
         municipality_name: Name of the municipality to search for
@@ -67,8 +82,9 @@ def get_commune_by_name(db, nom_commune: str) -> Optional[Commune]:
         Municipality object or None if not found
     """
 
-    commune = db.query(Commune).filter(
-        func.upper(Commune.commune_name) == nom_commune.upper()
+    commune = db.query(Commune).options(load_only(*LOOKUP_COLUMNS)).filter(
+        Commune.search_key == Commune.normalize_search_key(nom_commune),
+        Commune.removed_at.is_(None)
     ).first()
     
     if commune:
@@ -78,21 +94,80 @@ def get_commune_by_name(db, nom_commune: str) -> Optional[Commune]:
     
     return commune
 
-def get_commune_by_name_and_postal(db, nom_commune: str, postal_code: str) -> Optional[Commune]:
+def get_commune_by_name_and_postal(db, nom_commune: str, postal_code: str,
+                                   include_removed: bool = False) -> Optional[Commune]:
     """
-    Retrieves a municipality by its name and postal code.
+    Retrieves a municipality by its name (compared on the search key) and postal code.
     
     Args:
         municipality_name: Name of the municipality.
         postal_code: Postal code.
+        include_removed: Also return a municipality removed from the source (tombstone).
         
     Returns:
         Municipality object or None if not found.
     """
-    return db.query(Commune).filter(
-        func.upper(Commune.commune_name) == nom_commune.upper(),
+    query = db.query(Commune).options(load_only(*LOOKUP_COLUMNS)).filter(
+        Commune.search_key == Commune.normalize_search_key(nom_commune),
         Commune.postal_code == postal_code
-    ).first()
+    )
+    if not include_removed:
+        query = query.filter(Commune.removed_at.is_(None))
+    return query.first()
+
+def get_commune_by_identity(db, nom_commune: str, postal_code: str,
+                            include_removed: bool = False) -> Optional[Commune]:
+    """
+    Retrieves a municipality by its exact import identity (postal code and uppercase name).
+
+    Unlike get_commune_by_name_and_postal, accents and punctuation must
+    match: this is the key the imports write on (uq_communes_postal_code_commune_name).
+
+    Args:
+        municipality_name: Name of the municipality.
+        postal_code: Postal code.
+        include_removed: Also return a municipality removed from the source (tombstone).
+
+    Returns:
+        Municipality object or None if not found.
+    """
+    query = db.query(Commune).filter(
+        Commune.postal_code == postal_code,
+        Commune.commune_name == nom_commune.upper()
+    )
+    if not include_removed:
+        query = query.filter(Commune.removed_at.is_(None))
+    return query.first()
+
+def backfill_search_keys(db, batch_size: int = 1000) -> int:
+    """
+    Fills the search key of the municipalities that have none.
+
+    Rows written by the imports always carry one; rows created or updated
+    through the API before the search_key column existed are never
+    rewritten by an import and would stay invisible to the name lookups.
+
+    Args:
+        batch_size: Rows updated per transaction.
+
+    Returns:
+        Number of municipalities updated.
+    """
+    updated = 0
+    while True:
+        communes = db.query(Commune).options(load_only(Commune.id, Commune.commune_name)).filter(
+            Commune.search_key.is_(None)
+        ).limit(batch_size).all()
+        if not communes:
+            break
+        for commune in communes:
+            commune.search_key = Commune.normalize_search_key(commune.commune_name)
+        db.commit()
+        updated += len(communes)
+
+    if updated:
+        logger.info(f"Clé de recherche calculée pour {updated} communes")
+    return updated
 
 def update_commune(db, commune_id: int, commune_update) -> Optional[Commune]:
     """
@@ -113,6 +188,7 @@ def update_commune(db, commune_id: int, commune_update) -> Optional[Commune]:
     # Update fields
     if hasattr(commune_update, 'name'):
         db_commune.commune_name = commune_update.name.upper()
+        db_commune.search_key = Commune.normalize_search_key(commune_update.name)
     if hasattr(commune_update, 'postalCode'):
         db_commune.postal_code = commune_update.postalCode
         # Recalculate department when postal code changes
@@ -123,6 +199,9 @@ def update_commune(db, commune_id: int, commune_update) -> Optional[Commune]:
         db_commune.latitude = commune_update.latitude
     if hasattr(commune_update, 'longitude'):
         db_commune.longitude = commune_update.longitude
+
+    # Modifiée hors import : le prochain import réécrira la ligne depuis la source
+    db_commune.content_hash = None
     
     db.commit()
     db.refresh(db_commune)
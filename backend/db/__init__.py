@@ -1 +1,2 @@
-from db.models.commune import Commune
\ No newline at end of file
+from db.models.commune import Commune
+from db.models.etl_run import EtlRun
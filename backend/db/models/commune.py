@@ -1,7 +1,21 @@
-from sqlalchemy import Column, Integer, String, Float, Index
+import re
+import unicodedata
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, Integer, String, Float, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from db.base import Base
 
+# Ligatures sans décomposition Unicode (NFKD laisse Œ et Æ intacts)
+SEARCH_KEY_LIGATURES = {"Œ": "OE", "Æ": "AE"}
+# Accents isolés par la décomposition NFKD
+SEARCH_KEY_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]+")
+# Tirets, apostrophes, espaces et autres séparateurs : un seul espace
+SEARCH_KEY_SEPARATORS = re.compile(r"[^0-9A-Z]+")
+
+# Colonnes lues par les recherches par nom, hors clé de l'index (cf. crud.commune)
+LOOKUP_INCLUDED_COLUMNS = ["id", "commune_name", "departement", "latitude", "longitude", "removed_at"]
+
 
 class Commune(Base):
     """
@@ -12,21 +26,47 @@ class Commune(Base):
         postal_code: Postal code of the municipality
         commune_name: Full name of the municipality (in uppercase)
         departement: Department number
+        search_key: Normalized name used by the name lookups (see normalize_search_key)
+        content_hash: Hash of the imported row, used to skip unchanged rows on import
+        removed_at: Date the municipality disappeared from the source (tombstone), None if present
 
     """
     __tablename__ = "communes"
+    __table_args__ = (
+        # Identité d'une commune pour les imports (cible des INSERT ... ON CONFLICT)
+        UniqueConstraint("postal_code", "commune_name", name="uq_communes_postal_code_commune_name"),
+        # Recherches par nom (crud.commune) : clé normalisée, puis code postal ; les champs de
+        # CommuneOut et removed_at sont inclus pour un parcours d'index seul sur PostgreSQL
+        Index(
+            "ix_communes_search_key_postal_code", "search_key", "postal_code",
+            postgresql_include=LOOKUP_INCLUDED_COLUMNS,
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     postal_code = Column(String(5), nullable=False, index=True)
     
     commune_name = Column(String(255), nullable=False, index=True)
+
+    # Nom normalisé (majuscules, sans accents ni ponctuation) : cible des recherches par nom,
+    # indexée avec le code postal (ix_communes_search_key_postal_code).
+    # Base antérieure à la colonne : l'ajouter (ALTER TABLE communes ADD COLUMN search_key
+    # VARCHAR(255), puis l'index) ; l'import suivant la remplit pour les lignes importées et
+    # la tâche de fond du démarrage de l'API pour les autres (core.startup,
+    # crud.commune.backfill_search_keys)
+    search_key = Column(String(255), nullable=True)
     
     departement = Column(String(3), nullable=False, index=True)
     
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
 
+    # Empreinte de la ligne source (cf. core.etl.load.content_hash), None si modifiée hors import
+    content_hash = Column(String(32), nullable=True)
+
+    removed_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
     def __repr__(self):
         """Représentation string du modèle pour le debug"""
         return f"<Commune(nom='{self.commune_name}', postal_code='{self.postal_code}', dept='{self.departement}')>"
@@ -65,3 +105,31 @@ class Commune(Base):
         
         return postal_code[:2]
 
+    @staticmethod
+    def normalize_search_key(name: Optional[str]) -> Optional[str]:
+        """
+        Normalizes a municipality name for the name lookups.
+
+        Rules:
+        - Uppercase, ligatures Œ/Æ spelled OE/AE
+        - Accents removed (NFKD decomposition)
+        - Any run of other characters than A-Z and 0-9 becomes one space,
+          leading and trailing spaces removed
+
+        "Saint-Étienne", "SAINT ETIENNE" and " saint  étienne " share the key
+        "SAINT ETIENNE".
+
+        Args:
+            name: Municipality name.
+
+        Returns:
+            Search key, None if the name is None.
+        """
+        if name is None:
+            return None
+
+        folded = name.upper()
+        for ligature, replacement in SEARCH_KEY_LIGATURES.items():
+            folded = folded.replace(ligature, replacement)
+        folded = SEARCH_KEY_COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", folded))
+        return SEARCH_KEY_SEPARATORS.sub(" ", folded).strip()
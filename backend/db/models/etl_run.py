@@ -0,0 +1,36 @@
+from sqlalchemy import Boolean, Column, DateTime, Integer, JSON, String
+from db.base import Base
+
+
+class EtlRun(Base):
+    """
+    Model representing one import of the communes started through the API
+
+    Attributes:
+        id: Unique auto-incrementing identifier
+        status: running, succeeded, failed or cancelled
+        started_at: Start date of the import
+        finished_at: End date of the import, None while running
+        cancel_requested: Cancellation requested, applied at the next batch
+        progress: Last progress snapshot (schemas.etl.EtlProgress)
+        stats: Import statistics once finished (schemas.commune.ImportStats)
+        options: Options of the import (schemas.etl.EtlJobCreate)
+    """
+    __tablename__ = "etl_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    status = Column(String(20), nullable=False, index=True)
+
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    progress = Column(JSON, nullable=True)
+    stats = Column(JSON, nullable=True)
+    options = Column(JSON, nullable=True)
+
+    def __repr__(self):
+        """Représentation string du modèle pour le debug"""
+        return f"<EtlRun(id={self.id}, status='{self.status}')>"
@@ -1,4 +1,7 @@
-from db.session import SessionLocal
+from fastapi import Request
+
+from core.jobs import ETLJobManager
+from db.session import SessionLocal, engine
 
 def get_db():
     db = SessionLocal()
@@ -6,3 +9,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_etl_jobs(request: Request) -> ETLJobManager:
+    """Returns the ETL job manager of the application, created on first use"""
+    if getattr(request.app.state, "etl_jobs", None) is None:
+        request.app.state.etl_jobs = ETLJobManager(engine)
+    return request.app.state.etl_jobs
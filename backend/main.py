@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 import logging
@@ -7,7 +8,8 @@ from core.config import settings
 from db.base import Base
 from db.session import SessionLocal, engine
 from api.v1.router import api_v1
-from core.etl import CommunesETLPipeline
+from core.jobs import ETLJobManager
+from core.startup import StartupETL
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,7 +18,27 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI(title=settings.PROJECT_NAME)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the tables, then starts the communes import and the backfill of
+    the missing search keys in the background.
+
+    The API serves requests right away; /api/v1/health/ready tells when the
+    import is over. Only one process runs it at a time (see EtlLock).
+    """
+    Base.metadata.create_all(bind=engine)
+
+    app.state.etl_jobs = ETLJobManager(engine)
+    app.state.startup_etl = StartupETL(SessionLocal, engine)
+    app.state.startup_etl.start()
+    yield
+
+    if not app.state.startup_etl.ready:
+        logger.warning("Arrêt de l'API pendant l'import des communes : import interrompu")
+
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +48,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
-
 app.include_router(api_v1, prefix="/api/v1")
 
 @app.exception_handler(HTTPException)
@@ -48,12 +68,3 @@ async def general_exception_handler(request, exc: Exception):
         status_code=500,
         content={"detail": "Erreur interne du serveur"}
     )
-
-
-def setup_villa():
-    db = SessionLocal()
-
-    etl = CommunesETLPipeline(db, settings.CSV_COMMUNES_URL)
-    etl.run_full_pipeline()
-
-setup_villa()
@@ -53,9 +53,51 @@ class CommuneOut(CommuneBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class StageStats(BaseModel):
+    """Schéma pour les statistiques d'une étape du pipeline"""
+    name: str = Field(..., description="Nom de l'étape")
+    items: int = Field(0, description="Nombre de blocs traités")
+    rows: int = Field(0, description="Nombre de lignes produites")
+    busy_seconds: float = Field(0.0, description="Temps de travail en secondes")
+    input_wait_seconds: float = Field(0.0, description="Temps d'attente de l'étape précédente en secondes")
+    output_wait_seconds: float = Field(0.0, description="Temps d'attente de l'étape suivante en secondes")
+    rows_per_second: Optional[float] = Field(None, description="Débit de l'étape en lignes par seconde de travail")
+
+
+class PhaseStats(BaseModel):
+    """Schéma pour les mesures d'une étape d'un import"""
+    name: str = Field(..., description="Nom de l'étape (extract, transform ou load)")
+    rows: int = Field(0, description="Nombre de lignes produites")
+    wall_seconds: float = Field(0.0, description="Durée de l'étape en secondes")
+    cpu_seconds: float = Field(0.0, description="Temps CPU du thread de l'étape en secondes")
+    rows_per_second: Optional[float] = Field(None, description="Débit de l'étape en lignes par seconde")
+    peak_memory_bytes: Optional[int] = Field(None, description="Pic des allocations Python (tracemalloc)")
+    db_round_trips: int = Field(0, description="Nombre de requêtes et de commits envoyés à la base")
+
+
+class BatchStats(BaseModel):
+    """Schéma pour les mesures d'un lot chargé"""
+    index: int = Field(0, description="Position du lot dans l'import")
+    rows: int = Field(0, description="Nombre de lignes du lot")
+    wall_seconds: float = Field(0.0, description="Durée du lot en secondes")
+    db_round_trips: int = Field(0, description="Nombre de requêtes et de commits envoyés à la base")
+
+
 class ImportStats(BaseModel):
     """Schéma pour les statistiques d'import"""
     total_processed: int = Field(..., description="Nombre de lignes traitées")
     total_imported: int = Field(..., description="Nombre de communes importées")
     total_updated: int = Field(..., description="Nombre de communes mises à jour")
-    errors: List[str] = Field(default_factory=list, description="Liste des erreurs rencontrées")
\ No newline at end of file
+    total_unchanged: int = Field(0, description="Nombre de communes déjà à jour, non réécrites")
+    total_rejected: int = Field(0, description="Nombre de lignes rejetées (mises en quarantaine)")
+    total_removed: int = Field(0, description="Nombre de communes absentes de la source (import incrémental)")
+    errors: List[str] = Field(default_factory=list, description="Liste des erreurs rencontrées")
+    source_unchanged: bool = Field(False, description="Source identique au dernier import, chargement ignoré")
+    dry_run: bool = Field(False, description="Delta calculé sans écriture en base")
+    duration_seconds: Optional[float] = Field(None, description="Durée du chargement en secondes")
+    rows_per_second: Optional[float] = Field(None, description="Débit du chargement en lignes par seconde")
+    resumed_from: Optional[int] = Field(None, description="Lignes déjà validées par l'import interrompu repris")
+    stages: Optional[List[StageStats]] = Field(None, description="Statistiques par étape (mode pipeliné)")
+    phases: Optional[List[PhaseStats]] = Field(None, description="Mesures par étape : durées, CPU, mémoire, requêtes")
+    batches: Optional[List[BatchStats]] = Field(None, description="Mesures par lot chargé (rapport d'import uniquement)")
+    peak_memory_bytes: Optional[int] = Field(None, description="Pic des allocations Python de l'import (tracemalloc)")
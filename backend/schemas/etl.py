@@ -0,0 +1,44 @@
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, Literal, Optional
+
+from schemas.commune import ImportStats
+
+
+class StartupStatus(BaseModel):
+    """Schéma pour l'état de l'import des communes au démarrage"""
+    ready: bool = Field(..., description="Import de démarrage terminé, l'API sert des données à jour")
+    status: str = Field(..., description="État de l'import de démarrage")
+    stats: Optional[ImportStats] = Field(None, description="Statistiques de l'import, une fois terminé")
+
+
+class EtlProgress(BaseModel):
+    """Schéma pour l'avancement d'un import"""
+    phase: Optional[str] = Field(None, description="Dernière étape ayant progressé")
+    rows: Dict[str, int] = Field(default_factory=dict, description="Lignes traitées par étape")
+    expected_rows: Optional[int] = Field(None, description="Nombre de lignes attendu (dernier import ou fichier)")
+    elapsed_seconds: float = Field(0.0, description="Durée écoulée en secondes")
+    rows_per_second: Optional[float] = Field(None, description="Débit du chargement en lignes par seconde")
+    eta_seconds: Optional[float] = Field(None, description="Estimation du temps restant en secondes")
+
+
+class EtlJobCreate(BaseModel):
+    """Schéma pour le lancement d'un import"""
+    force: bool = Field(False, description="Importe même si la source est inchangée")
+    load_strategy: Optional[Literal["orm", "upsert", "copy"]] = Field(None, description="Stratégie de chargement")
+    incremental: Optional[bool] = Field(None, description="Traite les communes disparues de la source")
+    shadow_swap: Optional[bool] = Field(None, description="Charge une copie de la table puis la substitue")
+    pipelined: Optional[bool] = Field(None, description="Exécute les étapes en parallèle")
+
+
+class EtlJobOut(BaseModel):
+    """Schéma pour un import lancé par l'API"""
+    id: int
+    status: str = Field(..., description="running, succeeded, failed ou cancelled")
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    cancel_requested: bool = False
+    progress: Optional[EtlProgress] = None
+    stats: Optional[ImportStats] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -70,6 +70,25 @@ def client(
         yield client
 
 
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """
+    Engine on a fresh SQLite file holding the schema, usable from several
+    threads (parallel load partitions, jobs).
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'communes.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine):
+    session = sessionmaker(bind=sqlite_engine)()
+    yield session
+    session.close()
+
+
 @pytest.fixture
 def sample_commune():
     return {
@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+from core.etl.batching import AdaptiveBatchSizer
+from core.etl.load import SQLITE_MAX_VARIABLES, DataLoader
+from core.etl.transform import CommuneRecord
+from db.models.commune import Commune
+
+
+def test_fast_batches_grow_up_to_maximum():
+    sizer = AdaptiveBatchSizer(1000, minimum=100, maximum=5000, target_seconds=1.0)
+
+    sizes = [sizer.record(sizer.size, 0.1) for _ in range(4)]
+
+    # Au plus un doublement par lot, puis plafonné
+    assert sizes == [2000, 4000, 5000, 5000]
+
+
+def test_slow_batches_shrink_down_to_minimum():
+    sizer = AdaptiveBatchSizer(1000, minimum=300, maximum=5000, target_seconds=1.0)
+
+    sizes = [sizer.record(sizer.size, 10.0) for _ in range(3)]
+
+    assert sizes == [500, 300, 300]
+
+
+def test_size_converges_to_target_duration():
+    sizer = AdaptiveBatchSizer(1000, minimum=100, maximum=50000, target_seconds=2.0)
+
+    # Débit constant de 3000 lignes/s : 6000 lignes par lot de 2 secondes
+    for _ in range(10):
+        sizer.record(sizer.size, sizer.size / 3000)
+
+    assert sizer.size == 6000
+    assert sizer.last_rows_per_second == pytest.approx(3000)
+
+
+def test_partial_and_fixed_batches_keep_size():
+    sizer = AdaptiveBatchSizer(1000, minimum=100, maximum=5000, target_seconds=1.0)
+    assert sizer.record(200, 0.01) == 1000
+
+    fixed = AdaptiveBatchSizer(1000, minimum=100, maximum=5000, target_seconds=0)
+    assert fixed.record(1000, 0.01) == 1000
+    assert fixed.last_seconds == 0.01
+
+
+def test_bounds_include_initial_size():
+    sizer = AdaptiveBatchSizer(10, minimum=100, maximum=50, target_seconds=1.0)
+
+    assert (sizer.minimum, sizer.maximum) == (10, 50)
+
+
+def test_batches_follow_size_changes():
+    sizer = AdaptiveBatchSizer(2, minimum=1, maximum=100, target_seconds=1.0)
+    sizes = []
+
+    for batch in sizer.batches(range(15)):
+        sizes.append(len(batch))
+        sizer.record(len(batch), 0.0)
+
+    assert sizes == [2, 4, 8, 1]
+
+
+@pytest.mark.parametrize("strategy", ["orm", "upsert"])
+def test_loader_grows_batches_on_fast_database(sqlite_session, strategy):
+    records = [CommuneRecord(f"{i:05d}", f"COMMUNE {i}", "01") for i in range(3100)]
+    loader = DataLoader(sqlite_session, strategy=strategy, batch_size=100, batch_target_seconds=60)
+    batch_sizes = []
+    apply_batch = loader._load_batch
+
+    def spy(batch, *args):
+        batch_sizes.append(len(batch))
+        return apply_batch(batch, *args)
+
+    loader._load_batch = spy
+    stats = loader.load_communes(records)
+
+    assert batch_sizes == [100, 200, 400, 800, 1600]
+    assert stats.total_imported == 3100
+    assert sqlite_session.query(Commune).count() == 3100
+
+
+def test_loader_fixed_batch_size(sqlite_session):
+    records = [CommuneRecord(f"{i:05d}", f"COMMUNE {i}", "01") for i in range(250)]
+    loader = DataLoader(sqlite_session, batch_size=100, batch_target_seconds=0)
+    batch_sizes = []
+    apply_batch = loader._load_batch
+
+    def spy(batch, *args):
+        batch_sizes.append(len(batch))
+        return apply_batch(batch, *args)
+
+    loader._load_batch = spy
+    loader.load_communes(records)
+
+    assert batch_sizes == [100, 100, 50]
+
+
+def test_sqlite_upsert_batches_stay_below_variable_limit(sqlite_session):
+    records = [CommuneRecord(f"{i:05d}", f"COMMUNE {i}", "01") for i in range(20000)]
+    loader = DataLoader(sqlite_session, strategy="upsert", batch_size=20000, batch_target_seconds=0)
+
+    stats = loader.load_communes(records)
+
+    assert stats.errors == []
+    assert stats.total_imported == 20000
+
+
+def test_sqlite_upsert_batches_fit_stock_variable_limit(sqlite_engine, sqlite_session):
+    # Limite des builds SQLite par défaut, plus basse que celle du build local
+    @event.listens_for(sqlite_engine, "connect")
+    def limit_variables(dbapi_connection, connection_record):
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, SQLITE_MAX_VARIABLES)
+
+    sqlite_engine.dispose()
+    records = [CommuneRecord(f"{i:05d}", f"COMMUNE {i}", "01") for i in range(9000)]
+    loader = DataLoader(sqlite_session, strategy="upsert", batch_size=9000, batch_target_seconds=0)
+
+    stats = loader.load_communes(records)
+
+    assert stats.errors == []
+    assert stats.total_imported == 9000
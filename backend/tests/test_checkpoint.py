@@ -0,0 +1,187 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from core.etl import CommunesETLPipeline
+from core.etl.checkpoint import RunCheckpoint
+from core.etl.extract import DataExtractor
+from core.etl.load import DataLoader
+from db.models.commune import Commune
+
+
+CSV = "code_postal,nom_commune_complet\n" + "".join(
+    f"{1000 + i:05d},Commune {i}\n" for i in range(100)
+)
+
+
+def fake_download(url, path, **kwargs):
+    """Téléchargement de substitution écrivant la source dans le fichier partiel du cache"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(CSV)
+    return {'etag': None, 'last_modified': None}
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return {'cache_dir': str(tmp_path / "cache"), 'checkpoint_dir': str(tmp_path / "checkpoints")}
+
+
+def make_pipeline(session, dirs, **options):
+    pipeline = CommunesETLPipeline(session, "https://example.com/communes.csv", load_strategy="orm", **dirs,
+                                   **options)
+    pipeline.loader.batch_size = 10
+    pipeline.loader.batch_target_seconds = 0
+    return pipeline
+
+
+def crash_after(batches_count):
+    """_apply_orm_batch interrompant le processus au lot donné"""
+    apply_batch = DataLoader._apply_orm_batch
+    batches = []
+
+    def apply(loader, index, rows):
+        batches.append(len(rows))
+        if len(batches) == batches_count:
+            raise KeyboardInterrupt
+        return apply_batch(loader, index, rows)
+
+    return apply
+
+
+def recording(batches):
+    apply_batch = DataLoader._apply_orm_batch
+
+    def apply(loader, index, rows):
+        batches.append(len(rows))
+        return apply_batch(loader, index, rows)
+
+    return apply
+
+
+@pytest.fixture(autouse=True)
+def source():
+    with patch('core.etl.extract.download_to_file', side_effect=fake_download):
+        yield
+
+
+def test_resume_after_crash_loads_only_remaining_batches(sqlite_session, dirs):
+    pipeline = make_pipeline(sqlite_session, dirs, chunk_size=0)
+    with patch.object(DataLoader, '_apply_orm_batch', crash_after(4)), pytest.raises(KeyboardInterrupt):
+        pipeline.run_full_pipeline()
+
+    assert sqlite_session.query(Commune).count() == 30
+    checkpoint = RunCheckpoint(dirs['checkpoint_dir'], pipeline.extractor.cache.load_metadata()['sha256'], 0)
+    assert checkpoint.load()
+    assert checkpoint.offset == 30
+    assert checkpoint.has_artifact
+
+    batches = []
+    resumed = make_pipeline(sqlite_session, dirs, chunk_size=0)
+    with patch.object(DataExtractor, 'extract_dataframe') as extract, \
+            patch.object(DataLoader, '_apply_orm_batch', recording(batches)):
+        stats = resumed.run_full_pipeline()
+
+    # Artefact transformé réutilisé, lots déjà validés non rejoués
+    extract.assert_not_called()
+    assert sum(batches) == 70
+    assert stats.errors == []
+    assert stats.resumed_from == 30
+    assert stats.total_imported == 70
+    assert sqlite_session.query(Commune).count() == 100
+    assert not checkpoint.load()
+    assert resumed.extractor.cache.is_loaded()
+
+
+def test_resume_without_pyarrow_transforms_the_source_again(sqlite_session, dirs):
+    with patch('core.etl.checkpoint.pyarrow', None):
+        pipeline = make_pipeline(sqlite_session, dirs, chunk_size=0)
+        with patch.object(DataLoader, '_apply_orm_batch', crash_after(4)), pytest.raises(KeyboardInterrupt):
+            pipeline.run_full_pipeline()
+
+        checkpoint = RunCheckpoint(dirs['checkpoint_dir'], pipeline.extractor.cache.load_metadata()['sha256'], 0)
+        assert checkpoint.load()
+        assert checkpoint.offset == 30
+        assert not checkpoint.has_artifact
+
+        batches = []
+        with patch.object(DataLoader, '_apply_orm_batch', recording(batches)):
+            stats = make_pipeline(sqlite_session, dirs, chunk_size=0).run_full_pipeline()
+
+    assert sum(batches) == 70
+    assert stats.errors == []
+    assert stats.resumed_from == 30
+    assert sqlite_session.query(Commune).count() == 100
+
+
+def test_streaming_resume_keeps_skipped_keys(sqlite_session, dirs):
+    options = {'chunk_size': 25, 'incremental': True, 'stale_rows': "delete"}
+    pipeline = make_pipeline(sqlite_session, dirs, **options)
+    with patch.object(DataLoader, '_apply_orm_batch', crash_after(3)), pytest.raises(KeyboardInterrupt):
+        pipeline.run_full_pipeline()
+    assert sqlite_session.query(Commune).count() == 20
+
+    batches = []
+    with patch.object(DataLoader, '_apply_orm_batch', recording(batches)):
+        stats = make_pipeline(sqlite_session, dirs, **options).run_full_pipeline()
+
+    assert sum(batches) == 80
+    assert stats.resumed_from == 20
+    # Les communes chargées avant l'interruption sont bien vues dans la source
+    assert stats.total_removed == 0
+    assert sqlite_session.query(Commune).count() == 100
+
+
+def test_database_outage_keeps_checkpoint_before_failed_batch(sqlite_session, dirs):
+    apply_batch = DataLoader._apply_orm_batch
+    batches = []
+
+    def outage(loader, index, rows):
+        batches.append(len(rows))
+        if len(batches) == 4:
+            raise OperationalError("UPDATE communes", {}, Exception("server closed the connection"))
+        return apply_batch(loader, index, rows)
+
+    pipeline = make_pipeline(sqlite_session, dirs, chunk_size=0)
+    with patch.object(DataLoader, '_apply_orm_batch', outage):
+        stats = pipeline.run_full_pipeline()
+
+    # Import arrêté au lot en échec, sans le rejeter : la reprise le rejouera
+    assert stats.errors and stats.total_rejected == 0
+    assert sqlite_session.query(Commune).count() == 30
+    checkpoint = RunCheckpoint(dirs['checkpoint_dir'], pipeline.extractor.cache.load_metadata()['sha256'], 0)
+    assert checkpoint.load()
+    assert checkpoint.offset == 30
+
+    stats = make_pipeline(sqlite_session, dirs, chunk_size=0).run_full_pipeline()
+
+    assert stats.errors == []
+    assert stats.resumed_from == 30
+    assert sqlite_session.query(Commune).count() == 100
+    assert not checkpoint.load()
+
+
+def test_completed_run_leaves_no_checkpoint(sqlite_session, dirs):
+    stats = make_pipeline(sqlite_session, dirs, chunk_size=0).run_full_pipeline()
+
+    assert stats.errors == []
+    assert stats.resumed_from is None
+    assert sqlite_session.query(Commune).count() == 100
+    assert not RunCheckpoint(dirs['checkpoint_dir'], "", 0).load()
+
+
+def test_checkpoint_of_another_snapshot_is_discarded(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path), "a" * 64, 0)
+    checkpoint.write_artifact(pd.DataFrame({'code_postal': ["75001"], 'nom_commune_complet': ["Paris"]}))
+    checkpoint.advance(1)
+
+    same = RunCheckpoint(str(tmp_path), "a" * 64, 0)
+    assert same.load()
+    assert same.offset == 1
+    assert same.read_artifact().to_dict('records') == [{'code_postal': "75001", 'nom_commune_complet': "Paris"}]
+
+    # Autre chunking : l'ordre des lignes chargées n'est plus le même
+    assert not RunCheckpoint(str(tmp_path), "a" * 64, 1000).load()
+    assert not (tmp_path / "checkpoint-transformed.arrow").exists()
+    assert not RunCheckpoint(str(tmp_path), "a" * 64, 0).load()
@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.etl.__main__ import EXIT_LOCKED, main
+from core.lock import EtlLock
+from db.models.commune import Commune
+
+
+CSV_V1 = "code_postal,nom_commune_complet\n75001,Paris\n69001,Lyon\n20000,Ajaccio\n"
+CSV_V2 = "code_postal,nom_commune_complet\n75001,Paris\n20000,Ajaccio\n97400,Saint-Denis\n"
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'communes.db'}"
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr("core.config.settings.ETL_LOCK_FILE", str(tmp_path / "etl.lock"))
+
+
+def write_source(path, content):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(content)
+    return str(path)
+
+
+def communes(database_url):
+    engine = create_engine(database_url)
+    with sessionmaker(bind=engine)() as session:
+        rows = {(c.postal_code, c.commune_name, c.departement) for c in session.query(Commune)}
+    engine.dispose()
+    return rows
+
+
+def test_imports_local_file(tmp_path, database_url, capsys):
+    source = write_source(tmp_path / "communes.csv.gz", CSV_V1)
+    report = tmp_path / "report.json"
+
+    assert main([source, "--database-url", database_url, "--chunk-size", "0", "--report", str(report)]) == 0
+
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["total_imported"] == 3
+    assert communes(database_url) == {("75001", "PARIS", "75"), ("69001", "LYON", "69"), ("20000", "AJACCIO", "2A")}
+    assert json.loads(report.read_text(encoding='utf-8'))["source"] == source
+
+
+def test_dry_run_prints_delta_without_writing(tmp_path, database_url, capsys):
+    main([write_source(tmp_path / "v1.csv.gz", CSV_V1), "--database-url", database_url])
+    capsys.readouterr()
+    before = communes(database_url)
+
+    source = write_source(tmp_path / "v2.csv.gz", CSV_V2)
+    assert main([source, "--database-url", database_url, "--dry-run", "--incremental",
+                 "--stale-rows", "delete"]) == 0
+
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["dry_run"] is True
+    assert (stats["total_imported"], stats["total_unchanged"], stats["total_removed"]) == (1, 2, 1)
+    assert communes(database_url) == before
+
+
+def test_dry_run_on_empty_database(tmp_path, database_url, capsys):
+    source = write_source(tmp_path / "communes.csv.gz", CSV_V1)
+
+    assert main([f"file://{source}", "--database-url", database_url, "--dry-run"]) == 0
+
+    assert json.loads(capsys.readouterr().out)["total_imported"] == 3
+
+
+def test_missing_file_fails(tmp_path, database_url, capsys):
+    assert main([str(tmp_path / "absent.csv"), "--database-url", database_url]) == 1
+    assert json.loads(capsys.readouterr().out)["errors"]
+
+
+def test_running_import_is_not_overlapped(tmp_path, database_url):
+    source = write_source(tmp_path / "communes.csv.gz", CSV_V1)
+    engine = create_engine(database_url)
+
+    with EtlLock(engine):
+        assert main([source, "--database-url", database_url]) == EXIT_LOCKED
+    engine.dispose()
@@ -63,3 +63,9 @@ def test_get_all_communes(client):
     data = response.json()
     assert isinstance(data, list)
     assert len(data) >= 2 
+
+def test_get_commune_by_name_ignores_accents_and_punctuation(client):
+    client.post("/api/v1/commune/", json={"name": "Saint-Étienne", "postalCode": "42000", "departement": "42"})
+    response = client.get("/api/v1/commune/communes/saint etienne")
+    assert response.status_code == 200
+    assert response.json()["commune_name"] == "SAINT-ÉTIENNE"
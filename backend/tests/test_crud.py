@@ -0,0 +1,47 @@
+from crud.commune import (
+    backfill_search_keys,
+    create_commune,
+    get_commune_by_name,
+    get_commune_by_name_and_postal,
+)
+from db.models.commune import Commune
+from schemas.commune import CommuneCreate
+
+
+def commune(name, postal_code="42000", departement="42"):
+    return CommuneCreate(name=name, postalCode=postal_code, departement=departement)
+
+
+def test_create_commune_matches_exact_identity_only(sqlite_session):
+    imported = create_commune(sqlite_session, commune("Saint-Étienne"))
+
+    # Même identité à la casse près : mise à jour de la commune existante
+    assert create_commune(sqlite_session, commune("saint-étienne")).id == imported.id
+    # Graphie voisine : nouvelle commune, l'identité d'import de l'existante est conservée
+    other = create_commune(sqlite_session, commune("Saint Etienne"))
+
+    assert other.id != imported.id
+    assert sqlite_session.get(Commune, imported.id).commune_name == "SAINT-ÉTIENNE"
+    assert sqlite_session.query(Commune).count() == 2
+
+
+def test_name_lookups_fold_accents_and_punctuation(sqlite_session):
+    create_commune(sqlite_session, commune("L'Haÿ-les-Roses", "94240", "94"))
+
+    assert get_commune_by_name(sqlite_session, "l hay les roses").postal_code == "94240"
+    assert get_commune_by_name_and_postal(sqlite_session, "L’HAŸ LES ROSES", "94240") is not None
+    assert get_commune_by_name_and_postal(sqlite_session, "L HAY LES ROSES", "94000") is None
+
+
+def test_backfill_search_keys_fills_rows_without_key(sqlite_session):
+    sqlite_session.add_all([
+        Commune(postal_code="42000", commune_name="SAINT-ÉTIENNE", departement="42"),
+        Commune(postal_code="75001", commune_name="PARIS", departement="75", search_key="PARIS"),
+        Commune(postal_code="01400", commune_name="---", departement="01"),
+    ])
+    sqlite_session.commit()
+
+    assert backfill_search_keys(sqlite_session, batch_size=1) == 2
+    assert backfill_search_keys(sqlite_session) == 0
+    assert get_commune_by_name(sqlite_session, "Saint Etienne").postal_code == "42000"
+    assert sqlite_session.query(Commune).filter_by(postal_code="01400").one().search_key == ""
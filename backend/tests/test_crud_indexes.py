@@ -0,0 +1,92 @@
+"""
+Plans d'exécution des recherches par nom de crud.commune
+
+La requête réellement émise par le crud est capturée puis passée à EXPLAIN
+(EXPLAIN QUERY PLAN sur SQLite). Sur PostgreSQL, ignorés sauf si
+TEST_POSTGRES_URL pointe vers une base jetable.
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from core.etl.load import DataLoader
+from core.etl.transform import CommuneRecord
+from crud.commune import LOOKUP_COLUMNS, get_commune_by_name, get_commune_by_name_and_postal
+from db.base import Base
+from db.models.commune import Commune
+
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+DATABASES = [
+    "sqlite://",
+    pytest.param(POSTGRES_URL, marks=pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL non défini")),
+]
+
+LOOKUP_INDEX = "ix_communes_search_key_postal_code"
+
+
+@pytest.fixture(params=DATABASES, ids=["sqlite", "postgresql"])
+def engine(request):
+    engine = create_engine(request.param)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    with sessionmaker(bind=engine)() as session:
+        DataLoader(session).load_communes(
+            [CommuneRecord(f"{i:05d}", f"SAINT-ÉTIENNE-{i}", "01") for i in range(3000)]
+        )
+    # Statistiques du planificateur ; sur PostgreSQL, VACUUM marque les pages visibles,
+    # condition d'un parcours d'index seul
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("VACUUM ANALYZE communes" if engine.dialect.name == "postgresql" else "ANALYZE")
+
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def explain(engine, lookup):
+    """Runs lookup and returns the plan of the SELECT it issued, as one string"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    with sessionmaker(bind=engine)() as session:
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            assert lookup(session) is not None
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+    (statement, parameters), = statements
+    prefix = "EXPLAIN" if engine.dialect.name == "postgresql" else "EXPLAIN QUERY PLAN"
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"{prefix} {statement}", parameters).all()
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+@pytest.mark.parametrize("lookup", [
+    lambda session: get_commune_by_name(session, "saint etienne 1234"),
+    lambda session: get_commune_by_name_and_postal(session, "Saint-Étienne-1234", "01234"),
+    lambda session: get_commune_by_name_and_postal(session, "SAINT ETIENNE 1234", "01234", include_removed=True),
+], ids=["name", "name_and_postal", "name_and_postal_with_removed"])
+def test_name_lookups_use_the_search_key_index(engine, lookup):
+    plan = explain(engine, lookup)
+
+    if engine.dialect.name == "postgresql":
+        # Champs de CommuneOut inclus dans l'index : la table n'est pas lue
+        assert f"Index Only Scan using {LOOKUP_INDEX}" in plan
+    else:
+        assert f"USING INDEX {LOOKUP_INDEX}" in plan
+
+
+def test_lookup_columns_are_all_in_the_index():
+    index, = [index for index in Commune.__table__.indexes if index.name == LOOKUP_INDEX]
+    indexed = {column.name for column in index.columns} | set(index.dialect_options["postgresql"]["include"])
+
+    assert {column.key for column in LOOKUP_COLUMNS} <= indexed
@@ -0,0 +1,191 @@
+import gzip
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyarrow as pa
+import pytest
+import requests
+
+from core.etl.download import (
+    decompress_bytes,
+    detect_compression,
+    download_to_file,
+    is_retryable,
+    open_decompressed,
+)
+from core.etl.extract import DataExtractor
+
+
+CSV_CONTENT = ("code_postal,nom_commune_complet\n"
+               + "".join(f"{i:05d},Commune {i}\n" for i in range(1000, 21000))).encode('utf-8')
+
+
+class FlakyRangeHandler(BaseHTTPRequestHandler):
+    """Serveur local qui coupe la connexion au milieu des premiers transferts"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.payload
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and server.support_range and self.headers.get('If-Range') == server.etag:
+            start = int(range_header.split('=')[1].rstrip('-'))
+
+        remaining = body[start:]
+        self.send_response(206 if start else 200)
+        self.send_header('Content-Length', str(len(remaining)))
+        self.send_header('ETag', server.etag)
+        if start:
+            self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+
+        if server.drops_left > 0:
+            server.drops_left -= 1
+            # Envoie un tiers du corps puis coupe brutalement la connexion
+            self.wfile.write(remaining[:len(remaining) // 3])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(remaining)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyRangeHandler)
+    server.payload = CSV_CONTENT
+    server.etag = '"v1"'
+    server.support_range = True
+    server.drops_left = 0
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/communes.csv"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_resumes_with_range(flaky_server, tmp_path):
+    flaky_server.drops_left = 2
+    part_path = str(tmp_path / "source.part")
+
+    result = download_to_file(flaky_server.url, part_path, retries=3, backoff=0)
+
+    assert result['etag'] == '"v1"'
+    with open(part_path, 'rb') as f:
+        assert f.read() == CSV_CONTENT
+    assert 'Range' not in flaky_server.requests[0]
+    assert flaky_server.requests[1]['Range'].startswith('bytes=')
+    assert flaky_server.requests[1]['If-Range'] == '"v1"'
+
+
+def test_download_restarts_without_range_support(flaky_server, tmp_path):
+    flaky_server.drops_left = 1
+    flaky_server.support_range = False
+    part_path = str(tmp_path / "source.part")
+
+    download_to_file(flaky_server.url, part_path, retries=2, backoff=0)
+
+    with open(part_path, 'rb') as f:
+        assert f.read() == CSV_CONTENT
+
+
+def test_download_gives_up_after_retries(flaky_server, tmp_path):
+    flaky_server.drops_left = 5
+
+    with pytest.raises(requests.exceptions.RequestException):
+        download_to_file(flaky_server.url, str(tmp_path / "source.part"), retries=1, backoff=0)
+
+    assert len(flaky_server.requests) == 2
+
+
+def test_partial_file_from_previous_run_is_resumed(flaky_server, tmp_path):
+    flaky_server.drops_left = 1
+    part_path = str(tmp_path / "source.part")
+    with pytest.raises(requests.exceptions.RequestException):
+        download_to_file(flaky_server.url, part_path, retries=0, backoff=0)
+
+    download_to_file(flaky_server.url, part_path, retries=0, backoff=0)
+
+    with open(part_path, 'rb') as f:
+        assert f.read() == CSV_CONTENT
+    assert 'Range' in flaky_server.requests[1]
+
+
+def test_partial_file_of_another_version_is_discarded(flaky_server, tmp_path):
+    flaky_server.drops_left = 1
+    part_path = str(tmp_path / "source.part")
+    with pytest.raises(requests.exceptions.RequestException):
+        download_to_file(flaky_server.url, part_path, retries=0, backoff=0)
+
+    flaky_server.etag = '"v2"'
+    flaky_server.payload = CSV_CONTENT.replace(b"Commune", b"Ville")
+    download_to_file(flaky_server.url, part_path, retries=0, backoff=0)
+
+    with open(part_path, 'rb') as f:
+        assert f.read() == flaky_server.payload
+
+
+def test_is_retryable():
+    response = requests.Response()
+    response.status_code = 503
+    assert is_retryable(requests.exceptions.HTTPError(response=response))
+    assert is_retryable(requests.exceptions.ConnectionError())
+
+    response.status_code = 404
+    assert not is_retryable(requests.exceptions.HTTPError(response=response))
+    assert not is_retryable(requests.exceptions.RequestException())
+
+
+def test_detect_compression():
+    assert detect_compression(gzip.compress(b"abc")[:4]) == "gzip"
+    assert detect_compression(pa.compress(b"abc", 'zstd', asbytes=True)[:4]) == "zstd"
+    assert detect_compression(b"code") is None
+
+
+@pytest.mark.parametrize("compress", [
+    gzip.compress,
+    lambda data: pa.compress(data, 'zstd', asbytes=True),
+])
+def test_open_decompressed_streams(compress):
+    stream = open_decompressed(io.BytesIO(compress(CSV_CONTENT)))
+
+    assert stream.read() == CSV_CONTENT
+    assert decompress_bytes(compress(CSV_CONTENT)) == CSV_CONTENT
+
+
+@pytest.mark.parametrize("compress", [
+    gzip.compress,
+    lambda data: pa.compress(data, 'zstd', asbytes=True),
+])
+@pytest.mark.parametrize("csv_profile", ["default", "fast"])
+def test_compressed_mirror_through_cache(flaky_server, tmp_path, compress, csv_profile):
+    flaky_server.payload = compress(CSV_CONTENT)
+    flaky_server.drops_left = 1
+    extractor = DataExtractor(flaky_server.url, cache_dir=str(tmp_path), csv_profile=csv_profile,
+                              retries=2, backoff=0)
+
+    df = extractor.extract_dataframe()
+
+    assert len(df) == 20000
+    assert df.iloc[0]['code_postal'] == '01000'
+    assert sum(len(chunk) for chunk in extractor.stream_dataframes(chunk_size=5000)) == 20000
+
+
+def test_compressed_mirror_streamed_without_cache(flaky_server):
+    flaky_server.payload = gzip.compress(CSV_CONTENT)
+    extractor = DataExtractor(flaky_server.url, cache_dir="", retries=0)
+
+    chunks = list(extractor.stream_dataframes(chunk_size=5000))
+
+    assert [len(chunk) for chunk in chunks] == [5000, 5000, 5000, 5000]
+    assert extractor.download_csv().encode('utf-8') == CSV_CONTENT
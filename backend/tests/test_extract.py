@@ -1,7 +1,8 @@
+import io
 import pytest
 import pandas as pd
 import requests
-from unittest.mock import Mock, patch
+from unittest.mock import MagicMock, Mock, patch
 
 from core.etl.extract import DataExtractor
 
@@ -26,6 +27,10 @@ def test_init_with_url():
 def test_init_without_url():
     with patch('core.etl.extract.settings') as mock_settings:
         mock_settings.csv_communes_url = "https://default.com/data.csv"
+        mock_settings.ETL_CACHE_DIR = ""
+        mock_settings.ETL_CSV_PROFILE = "default"
+        mock_settings.ETL_DOWNLOAD_RETRIES = 0
+        mock_settings.ETL_DOWNLOAD_BACKOFF = 0.0
         extractor = DataExtractor()
         assert extractor.csv_url == "https://default.com/data.csv"
 
@@ -136,4 +141,104 @@ def test_extract_dataframe_real_csv_format():
         assert result is not None
         assert result.iloc[0]['nom'] == 'Paris'
         assert result.iloc[0]['code_postal'] == '75001'
-        assert result.iloc[0]['population'] == 2161000
\ No newline at end of file
+        assert result.iloc[0]['population'] == 2161000
+
+
+@patch('core.etl.extract.requests.get')
+def test_stream_dataframes_yields_chunks(mock_get, extractor):
+    csv_bytes = "nom,code_postal\n" + "\n".join(f"Ville{i},{i:05d}" for i in range(5))
+    mock_response = MagicMock()
+    mock_response.raw = io.BytesIO(csv_bytes.encode())
+    mock_response.__enter__.return_value = mock_response
+    mock_get.return_value = mock_response
+
+    chunks = list(extractor.stream_dataframes(chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert chunks[0].iloc[0]['code_postal'] == '00000'
+    mock_get.assert_called_with("https://example.com/test.csv", timeout=30, stream=True)
+
+
+@patch('core.etl.extract.requests.get')
+def test_stream_dataframes_download_fails(mock_get, extractor):
+    mock_response = MagicMock()
+    mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError("404")
+    mock_get.return_value = mock_response
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        list(extractor.stream_dataframes(chunk_size=2))
+
+
+@pytest.fixture
+def full_csv_data():
+    return """code_commune_INSEE,nom_commune_postal,code_postal,nom_commune_complet,latitude
+01001,L ABERGEMENT CLEMENCIAT,01400,L'Abergement-Clémenciat,46.15
+2A004,AJACCIO,20000,Ajaccio,41.93
+97101,LES ABYMES,97139,Les Abymes,16.27"""
+
+
+@patch.object(DataExtractor, 'download_csv')
+def test_extract_dataframe_fast_profile(mock_download, full_csv_data):
+    mock_download.return_value = full_csv_data
+
+    extractor = DataExtractor("https://test.com", csv_profile="fast")
+    result = extractor.extract_dataframe()
+
+    assert list(result.columns) == ['code_postal', 'nom_commune_complet']
+    assert list(result['code_postal']) == ['01400', '20000', '97139']
+    assert result['code_postal'].dtype == pd.StringDtype("pyarrow")
+    assert result.iloc[0]['nom_commune_complet'] == "L'Abergement-Clémenciat"
+
+
+@patch.object(DataExtractor, 'download_csv')
+def test_fast_profile_matches_default_after_transform(mock_download, full_csv_data):
+    from core.etl.transform import DataTransformer
+
+    mock_download.return_value = full_csv_data
+    transformer = DataTransformer()
+
+    default_df = transformer.transform_data(DataExtractor("https://test.com").extract_dataframe())
+    fast_df = transformer.transform_data(DataExtractor("https://test.com", csv_profile="fast").extract_dataframe())
+
+    assert transformer.to_dict_list(fast_df) == transformer.to_dict_list(default_df)
+
+
+@patch('core.etl.extract.requests.get')
+def test_stream_dataframes_fast_profile(mock_get, full_csv_data):
+    mock_response = MagicMock()
+    mock_response.raw = io.BytesIO(full_csv_data.encode())
+    mock_response.__enter__.return_value = mock_response
+    mock_get.return_value = mock_response
+
+    extractor = DataExtractor("https://test.com", csv_profile="fast")
+    chunks = list(extractor.stream_dataframes(chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert list(chunks[0].columns) == ['code_postal', 'nom_commune_complet']
+    assert chunks[0].iloc[0]['code_postal'] == '01400'
+
+
+def test_fast_profile_falls_back_without_pyarrow():
+    with patch('core.etl.extract.pa_csv', None):
+        extractor = DataExtractor("https://test.com", csv_profile="fast")
+
+    assert extractor.csv_profile == "default"
+
+
+def test_unknown_csv_profile():
+    with pytest.raises(ValueError):
+        DataExtractor("https://test.com", csv_profile="turbo")
+
+
+def test_local_file_source_is_read_without_network(tmp_path):
+    path = tmp_path / "communes.csv"
+    path.write_text("code_postal,nom_commune_complet\n01000,Bourg-en-Bresse\n", encoding='utf-8')
+
+    with patch('core.etl.extract.requests.get') as mock_get:
+        for source in (str(path), f"file://{path}"):
+            extractor = DataExtractor(source, cache_dir=str(tmp_path / "cache"))
+            assert extractor.cache is None
+            assert extractor.extract_dataframe().iloc[0]['code_postal'] == '01000'
+            assert [len(chunk) for chunk in extractor.stream_dataframes(10)] == [1]
+
+    mock_get.assert_not_called()
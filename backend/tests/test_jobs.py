@@ -0,0 +1,208 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.router import api_v1
+from core.etl import CommunesETLPipeline
+from core.etl.load import DataLoader
+from core.etl.progress import ETLCancelled, ProgressTracker
+from core.jobs import ETLJobManager
+from db.models.commune import Commune
+from db.models.etl_run import EtlRun
+from deps import get_db
+from schemas.commune import ImportStats
+
+
+class FakePipeline:
+    """Pipeline chargeant 3 lots de 10 lignes, chaque lot attendant le feu vert du test"""
+
+    proceed: threading.Event = None
+    created = []
+
+    def __init__(self, db, csv_url, progress, **options):
+        self.progress = progress
+        self.options = options
+        FakePipeline.created.append(self)
+
+    def run_full_pipeline(self, force=False):
+        try:
+            for _ in range(3):
+                self.progress.checkpoint()
+                assert FakePipeline.proceed.wait(5)
+                self.progress.advance("load", 10)
+        except ETLCancelled as e:
+            return ImportStats(total_processed=0, total_imported=0, total_updated=0, errors=[str(e)])
+        return ImportStats(total_processed=30, total_imported=30, total_updated=0, errors=[])
+
+
+@pytest.fixture
+def jobs(sqlite_engine, tmp_path):
+    FakePipeline.proceed = threading.Event()
+    FakePipeline.created = []
+    return ETLJobManager(sqlite_engine, lock_file=str(tmp_path / "etl.lock"), pipeline_factory=FakePipeline,
+                         sync_interval=0)
+
+
+@pytest.fixture
+def client(sqlite_engine, jobs):
+    app = FastAPI()
+    app.include_router(api_v1, prefix="/api/v1")
+    app.state.etl_jobs = jobs
+    session_factory = sessionmaker(bind=sqlite_engine)
+
+    def _get_test_db():
+        with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _get_test_db
+    with TestClient(app) as client:
+        yield client
+    FakePipeline.proceed.set()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_job_runs_in_background_and_is_recorded(client, jobs):
+    response = client.post("/api/v1/etl/jobs", json={"load_strategy": "upsert"})
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "running"
+    assert FakePipeline.created[0].options == {"load_strategy": "upsert"}
+
+    # Un seul import à la fois
+    assert client.post("/api/v1/etl/jobs", json={}).status_code == 409
+
+    FakePipeline.proceed.set()
+    jobs.wait(job["id"], 5)
+
+    job = client.get(f"/api/v1/etl/jobs/{job['id']}").json()
+    assert job["status"] == "succeeded"
+    assert job["finished_at"] is not None
+    assert job["progress"]["rows"]["load"] == 30
+    assert job["stats"]["total_imported"] == 30
+
+    history = client.get("/api/v1/etl/jobs").json()
+    assert [run["id"] for run in history] == [job["id"]]
+
+
+def test_progress_is_visible_while_running(client, jobs):
+    job = client.post("/api/v1/etl/jobs", json={}).json()
+    tracker = jobs._trackers[job["id"]]
+
+    tracker.advance("extract", 30)
+    progress = client.get(f"/api/v1/etl/jobs/{job['id']}").json()["progress"]
+
+    assert progress["rows"]["extract"] == 30
+    assert progress["phase"] == "extract"
+
+
+def test_eta_uses_previous_run(client, jobs):
+    first = client.post("/api/v1/etl/jobs", json={}).json()
+    FakePipeline.proceed.set()
+    jobs.wait(first["id"], 5)
+
+    FakePipeline.proceed.clear()
+    second = client.post("/api/v1/etl/jobs", json={}).json()
+    tracker = jobs._trackers[second["id"]]
+    tracker.advance("load", 10)
+    progress = client.get(f"/api/v1/etl/jobs/{second['id']}").json()["progress"]
+
+    assert progress["expected_rows"] == 30
+    assert progress["eta_seconds"] is not None
+    FakePipeline.proceed.set()
+    jobs.wait(second["id"], 5)
+
+
+def test_cancel_stops_between_batches(client, jobs):
+    job = client.post("/api/v1/etl/jobs", json={}).json()
+
+    response = client.post(f"/api/v1/etl/jobs/{job['id']}/cancel")
+    assert response.status_code == 202
+    assert response.json()["cancel_requested"] is True
+
+    FakePipeline.proceed.set()
+    jobs.wait(job["id"], 5)
+
+    job = client.get(f"/api/v1/etl/jobs/{job['id']}").json()
+    assert job["status"] == "cancelled"
+    assert job["progress"]["rows"]["load"] < 30
+    assert client.post(f"/api/v1/etl/jobs/{job['id']}/cancel").status_code == 409
+
+
+def test_cancel_requested_by_another_worker(client, jobs, sqlite_engine):
+    job = client.post("/api/v1/etl/jobs", json={}).json()
+
+    # Demande enregistrée en base sans passer par ce gestionnaire
+    with sessionmaker(bind=sqlite_engine)() as session:
+        session.get(EtlRun, job["id"]).cancel_requested = True
+        session.commit()
+
+    FakePipeline.proceed.set()
+    jobs.wait(job["id"], 5)
+
+    assert client.get(f"/api/v1/etl/jobs/{job['id']}").json()["status"] == "cancelled"
+
+
+def test_unknown_job(client):
+    assert client.get("/api/v1/etl/jobs/999").status_code == 404
+    assert client.post("/api/v1/etl/jobs/999/cancel").status_code == 404
+
+
+def test_invalid_options_are_rejected(client):
+    assert client.post("/api/v1/etl/jobs", json={"load_strategy": "bulk"}).status_code == 422
+
+
+def test_interrupted_run_is_marked_failed(client, jobs, sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as session:
+        session.add(EtlRun(status="running", started_at=pd.Timestamp.now(tz="UTC").to_pydatetime()))
+        session.commit()
+
+    job = client.post("/api/v1/etl/jobs", json={}).json()
+    FakePipeline.proceed.set()
+    jobs.wait(job["id"], 5)
+
+    statuses = [run["status"] for run in client.get("/api/v1/etl/jobs").json()]
+    assert statuses == ["succeeded", "failed"]
+
+
+def test_real_pipeline_cancels_between_load_batches(sqlite_engine):
+    session = sessionmaker(bind=sqlite_engine)()
+    tracker = ProgressTracker()
+    pipeline = CommunesETLPipeline(session, "https://example.com/test.csv", chunk_size=0, cache_dir="",
+                                   progress=tracker)
+    pipeline.loader.batch_size = 10
+    pipeline.loader.batch_target_seconds = 0
+    frame = pd.DataFrame({
+        'code_postal': [f"{i:05d}" for i in range(1000, 1100)],
+        'nom_commune_complet': [f"Commune {i}" for i in range(100)],
+    })
+    apply_batch = DataLoader._apply_orm_batch
+    batches = []
+
+    def apply_then_cancel(loader, index, rows):
+        batches.append(len(rows))
+        if len(batches) == 3:
+            tracker.cancel()
+        return apply_batch(loader, index, rows)
+
+    with patch.object(pipeline.extractor, 'extract_dataframe', return_value=frame), \
+            patch.object(DataLoader, '_apply_orm_batch', apply_then_cancel):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.errors == ["Erreur critique dans le pipeline ETL : Import annulé"]
+    # Les lots validés avant l'annulation restent en base
+    assert session.query(Commune).count() == 30
+    assert tracker.rows == {"extract": 100, "transform": 100, "load": 30}
+    session.close()
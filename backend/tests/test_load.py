@@ -1,8 +1,12 @@
+import io
+
 import pytest
 from unittest.mock import Mock, patch
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
-from core.etl.load import DataLoader
+from core.etl.load import CopyStream, DataLoader, content_hash, partition_by_departement
+from core.etl.transform import CommuneRecord
 from db.models.commune import Commune
 from schemas.commune import ImportStats
 
@@ -43,100 +47,6 @@ def test_init_loader(mock_db_session):
     assert loader.db == mock_db_session
 
 
-def test_load_communes_new_communes(loader, mock_db_session, sample_communes_data):
-    # Mock : aucune commune existante
-    mock_db_session.query().filter().first.return_value = None
-    
-    result = loader.load_communes(sample_communes_data)
-    
-    assert result.total_processed == 3
-    assert result.total_imported == 3
-    assert result.total_updated == 0
-    assert len(result.errors) == 0
-    assert mock_db_session.add.call_count == 3
-    assert mock_db_session.commit.call_count == 1
-
-
-def test_load_communes_existing_communes(loader, mock_db_session, sample_communes_data):
-    # Mock : communes existantes
-    existing_commune = Mock()
-    mock_db_session.query().filter().first.return_value = existing_commune
-    
-    result = loader.load_communes(sample_communes_data)
-    
-    assert result.total_processed == 3
-    assert result.total_imported == 0
-    assert result.total_updated == 3
-    assert len(result.errors) == 0
-    assert mock_db_session.add.call_count == 0
-
-
-def test_load_communes_mixed_new_and_existing(loader, mock_db_session):
-    communes_data = [
-        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'},
-        {'code_postal': '69001', 'nom_commune_complet': 'LYON', 'departement': '69'}
-    ]
-    
-    # Premier appel : commune existante, deuxième : nouvelle commune
-    existing_commune = Mock()
-    mock_db_session.query().filter().first.side_effect = [existing_commune, None]
-    
-    result = loader.load_communes(communes_data)
-    
-    assert result.total_processed == 2
-    assert result.total_imported == 1
-    assert result.total_updated == 1
-    assert len(result.errors) == 0
-
-
-def test_load_communes_with_error(loader, mock_db_session):
-    communes_data = [
-        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'}
-    ]
-    
-    # Simuler une erreur lors de la création
-    mock_db_session.query().filter().first.return_value = None
-    mock_db_session.add.side_effect = Exception("Database error")
-    
-    result = loader.load_communes(communes_data)
-    
-    assert result.total_processed == 1
-    assert result.total_imported == 0
-    assert result.total_updated == 0
-    assert len(result.errors) == 1
-    assert "Database error" in result.errors[0]
-    assert mock_db_session.rollback.called
-
-
-def test_load_communes_commit_every_1000(loader, mock_db_session):
-    # Créer 1500 communes pour tester le commit périodique
-    communes_data = []
-    for i in range(1500):
-        communes_data.append({
-            'code_postal': f'{i:05d}',
-            'nom_commune_complet': f'COMMUNE_{i}',
-            'departement': f'{i//1000 + 1:02d}'
-        })
-    
-    mock_db_session.query().filter().first.return_value = None
-    
-    loader.load_communes(communes_data)
-    
-    # Doit committer à 1000 et à la fin
-    assert mock_db_session.commit.call_count == 2
-
-
-def test_load_communes_final_commit_error(loader, mock_db_session, sample_communes_data):
-    mock_db_session.query().filter().first.return_value = None
-    mock_db_session.commit.side_effect = Exception("Commit error")
-    
-    result = loader.load_communes(sample_communes_data)
-    
-    assert len(result.errors) == 1
-    assert "Commit error" in result.errors[0]
-    assert mock_db_session.rollback.called
-
-
 def test_get_load_statistics_success(loader, mock_db_session):
     # Mock des requêtes
     mock_db_session.query().count.return_value = 100
@@ -189,69 +99,413 @@ def test_get_load_statistics_error(loader, mock_db_session):
     assert 'Database error' in result['error']
 
 
-def test_load_communes_empty_list(loader, mock_db_session):
-    result = loader.load_communes([])
-    
-    assert result.total_processed == 0
-    assert result.total_imported == 0
+def test_unknown_load_strategy(mock_db_session):
+    with pytest.raises(ValueError):
+        DataLoader(mock_db_session, strategy="magic")
+
+
+def test_load_communes_new_communes(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session)
+
+    result = loader.load_communes(sample_communes_data)
+
+    assert result.total_processed == 3
+    assert result.total_imported == 3
     assert result.total_updated == 0
+    assert result.total_unchanged == 0
     assert len(result.errors) == 0
-    assert mock_db_session.commit.call_count == 1
+    assert sqlite_session.query(Commune).count() == 3
 
 
-def test_load_communes_creates_correct_commune_object(loader, mock_db_session):
-    communes_data = [
-        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'}
+def test_load_communes_existing_communes(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session)
+    loader.load_communes(sample_communes_data)
+
+    changed = [dict(data, departement='99') for data in sample_communes_data]
+    result = loader.load_communes(changed)
+
+    assert result.total_processed == 3
+    assert result.total_imported == 0
+    assert result.total_updated == 3
+    assert result.total_unchanged == 0
+    assert {c.departement for c in sqlite_session.query(Commune)} == {'99'}
+    assert sqlite_session.query(Commune).count() == 3
+
+
+def test_load_communes_stores_search_key(sqlite_session):
+    records = [
+        CommuneRecord('42000', 'SAINT-ÉTIENNE', '42', 'SAINT ETIENNE'),
+        # Ligne sans clé (dictionnaire ou tuple construit à la main) : calculée au chargement
+        {'code_postal': '94240', 'nom_commune_complet': "L'HAŸ-LES-ROSES", 'departement': '94'},
     ]
-    
-    mock_db_session.query().filter().first.return_value = None
-    
-    with patch('core.etl.load.Commune') as mock_commune:
-        loader.load_communes(communes_data)
-        
-        mock_commune.assert_called_once_with(
-            postal_code='75001',
-            commune_name='PARIS',
-            departement='75'
-        )
 
+    DataLoader(sqlite_session).load_communes(records)
+
+    assert {c.commune_name: c.search_key for c in sqlite_session.query(Commune)} == {
+        'SAINT-ÉTIENNE': 'SAINT ETIENNE', "L'HAŸ-LES-ROSES": 'L HAY LES ROSES'
+    }
 
-def test_load_communes_updates_existing_commune_correctly(loader, mock_db_session):
+
+def test_load_communes_mixed_new_existing_and_unchanged(sqlite_session, sample_communes_data):
+    DataLoader(sqlite_session).load_communes(sample_communes_data)
     communes_data = [
-        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'}
+        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'},
+        {'code_postal': '69001', 'nom_commune_complet': 'LYON', 'departement': '99'},
+        {'code_postal': '33000', 'nom_commune_complet': 'BORDEAUX', 'departement': '33'},
     ]
-    
-    existing_commune = Mock()
-    existing_commune.departement = '74'  # Ancienne valeur
-    mock_db_session.query().filter().first.return_value = existing_commune
-    
-    loader.load_communes(communes_data)
-    
-    assert existing_commune.departement == '75'  # Nouvelle valeur
 
+    result = DataLoader(sqlite_session).load_communes(communes_data)
 
-def test_load_communes_query_filter_correctly(loader, mock_db_session, sample_communes_data):
-    # Set up the mock chain properly to avoid extra calls during assertion
-    query_mock = mock_db_session.query.return_value
-    filter_mock = query_mock.filter.return_value
-    filter_mock.first.return_value = None
-    
+    assert result.total_processed == 3
+    assert result.total_imported == 1
+    assert result.total_updated == 1
+    assert result.total_unchanged == 1
+    assert sqlite_session.query(Commune).filter_by(commune_name='LYON').one().departement == '99'
+
+
+def test_load_communes_updates_keep_ids(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session)
     loader.load_communes(sample_communes_data)
-    
-    # Vérifier que query() a été appelé avec Commune
-    mock_db_session.query.assert_called_with(Commune)
-    
-    # Vérifier que filter a été appelé (3 fois pour 3 communes)
-    # Use the stored query_mock to avoid extra calls
-    assert query_mock.filter.call_count == 3
+    ids = {c.commune_name: c.id for c in sqlite_session.query(Commune)}
 
+    loader.load_communes([dict(data, departement='99') for data in sample_communes_data])
 
-@patch('core.etl.load.logger')
-def test_load_communes_logs_correctly(mock_logger, loader, mock_db_session, sample_communes_data):
-    mock_db_session.query().filter().first.return_value = None
-    
+    sqlite_session.expire_all()
+    assert {c.commune_name: c.id for c in sqlite_session.query(Commune)} == ids
+
+
+def test_load_communes_unchanged_rows_issue_no_write(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session)
     loader.load_communes(sample_communes_data)
-    
-    # Vérifier les logs
+    # Import suivant : l'index des clés est relu
+    loader.reset_key_index()
+    statements = []
+    event.listen(sqlite_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    with patch.object(sqlite_session, 'commit', wraps=sqlite_session.commit) as mock_commit:
+        result = loader.load_communes(sample_communes_data)
+
+    assert result.total_unchanged == 3
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("SELECT")
+    assert mock_commit.call_count == 0
+
+
+def test_load_communes_duplicate_keys_in_batch(sqlite_session):
+    records = [
+        CommuneRecord('75001', 'PARIS', '74'),
+        CommuneRecord('75001', 'PARIS', '75'),
+    ]
+
+    result = DataLoader(sqlite_session).load_communes(records)
+
+    assert result.total_processed == 2
+    assert result.total_imported == 1
+    assert sqlite_session.query(Commune).one().departement == '75'
+
+
+def test_load_communes_with_error(sqlite_session):
+    records = [
+        CommuneRecord('75001', 'PARIS', '75'),
+        CommuneRecord('69001', 'LYON', None),
+        CommuneRecord('13001', 'MARSEILLE', '13'),
+    ]
+
+    result = DataLoader(sqlite_session, batch_size=2, quarantine_path="").load_communes(records)
+
+    # Seule la ligne fautive est rejetée, le reste de son lot est chargé
+    assert result.total_processed == 3
+    assert result.total_imported == 2
+    assert result.total_updated == 0
+    assert result.total_rejected == 1
+    assert len(result.errors) == 1
+    assert result.errors[0].startswith("Erreur ligne 2: NOT NULL constraint failed")
+    assert sorted(c.commune_name for c in sqlite_session.query(Commune)) == ['MARSEILLE', 'PARIS']
+
+
+def test_load_communes_bisects_to_every_bad_row(sqlite_session, tmp_path):
+    quarantine = tmp_path / "rejets.csv"
+    records = [CommuneRecord(f'{i:05d}', f'COMMUNE {i}', None if i in (3, 4, 17) else '01') for i in range(20)]
+    loader = DataLoader(sqlite_session, batch_size=8, quarantine_path=str(quarantine))
+
+    result = loader.load_communes(records)
+
+    assert (result.total_imported, result.total_rejected) == (17, 3)
+    assert [error.split(':')[0] for error in result.errors] == ["Erreur ligne 4", "Erreur ligne 5", "Erreur ligne 18"]
+    lines = quarantine.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == "code_postal,nom_commune_complet,departement,search_key,erreur"
+    assert [line.split(',')[0] for line in lines[1:]] == ['00003', '00004', '00017']
+    assert sqlite_session.query(Commune).count() == 17
+
+
+def test_load_communes_index_survives_failed_commit(sqlite_session):
+    loader = DataLoader(sqlite_session, batch_size=2, quarantine_path="")
+    records = [CommuneRecord('75001', 'PARIS', '75'), CommuneRecord('69001', 'LYON', '69')]
+
+    with patch.object(sqlite_session, 'commit', side_effect=Exception("Commit error")):
+        failed = loader.load_communes(records)
+    result = loader.load_communes(records)
+
+    # Erreur hors données : le lot entier est rejeté, sans bissection
+    assert (failed.total_imported, failed.total_rejected) == (0, 2)
+    assert "Erreur lot lignes 1-2: Commit error" in failed.errors[0]
+    assert result.total_imported == 2
+    assert sqlite_session.query(Commune).count() == 2
+
+
+def test_load_communes_commit_per_batch(sqlite_session):
+    communes_data = [
+        {'code_postal': f'{i:05d}', 'nom_commune_complet': f'COMMUNE_{i}', 'departement': f'{i//1000 + 1:02d}'}
+        for i in range(1500)
+    ]
+    loader = DataLoader(sqlite_session, batch_size=1000)
+
+    with patch.object(sqlite_session, 'commit', wraps=sqlite_session.commit) as mock_commit:
+        result = loader.load_communes(communes_data)
+
+    assert result.total_imported == 1500
+    assert mock_commit.call_count == 2
+
+
+def test_load_communes_commit_error(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session)
+
+    with patch.object(sqlite_session, 'commit', side_effect=Exception("Commit error")), \
+            patch.object(sqlite_session, 'rollback', wraps=sqlite_session.rollback) as mock_rollback:
+        result = loader.load_communes(sample_communes_data)
+
+    assert result.total_imported == 0
+    assert len(result.errors) == 1
+    assert "Commit error" in result.errors[0]
+    assert mock_rollback.called
+
+
+def test_load_communes_empty_list(sqlite_session):
+    result = DataLoader(sqlite_session).load_communes([])
+
+    assert result.total_processed == 0
+    assert result.total_imported == 0
+    assert result.total_updated == 0
+    assert len(result.errors) == 0
+
+
+@patch('core.etl.load.logger')
+def test_load_communes_logs_correctly(mock_logger, sqlite_session, sample_communes_data):
+    DataLoader(sqlite_session).load_communes(sample_communes_data)
+
     mock_logger.info.assert_any_call("Début du chargement de 3 communes")
-    mock_logger.info.assert_any_call("Chargement terminé : 3 créées, 0 mises à jour")
\ No newline at end of file
+    mock_logger.info.assert_any_call("Chargement terminé : 3 créées, 0 mises à jour, 0 inchangées")
+
+
+def test_load_communes_from_record_generator(sqlite_session):
+    records = (CommuneRecord(f'7500{i}', f'PARIS {i}', '75') for i in range(3))
+
+    result = DataLoader(sqlite_session).load_communes(records)
+
+    assert result.total_processed == 3
+    assert result.total_imported == 3
+
+
+def test_load_communes_reports_throughput(sqlite_session, sample_communes_data):
+    result = DataLoader(sqlite_session).load_communes(sample_communes_data)
+
+    assert result.duration_seconds is not None
+    assert result.rows_per_second is None or result.rows_per_second > 0
+
+
+def test_upsert_inserts_then_updates(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session, strategy="upsert", batch_size=2)
+
+    first = loader.load_communes(sample_communes_data)
+
+    assert first.total_processed == 3
+    assert first.total_imported == 3
+    assert first.total_updated == 0
+    assert sqlite_session.query(Commune).count() == 3
+
+    changed = [dict(data, departement='99') if data['code_postal'] == '69001' else data
+               for data in sample_communes_data]
+    changed.append({'code_postal': '33000', 'nom_commune_complet': 'BORDEAUX', 'departement': '33'})
+
+    second = loader.load_communes(changed)
+
+    assert second.total_processed == 4
+    assert second.total_imported == 1
+    assert second.total_updated == 1
+    assert second.total_unchanged == 2
+    assert sqlite_session.query(Commune).filter_by(commune_name='LYON').one().departement == '99'
+    assert sqlite_session.query(Commune).count() == 4
+
+
+def test_upsert_duplicate_keys_in_batch(sqlite_session):
+    loader = DataLoader(sqlite_session, strategy="upsert", batch_size=10)
+    records = [
+        CommuneRecord('75001', 'PARIS', '74'),
+        CommuneRecord('75001', 'PARIS', '75'),
+    ]
+
+    stats = loader.load_communes(records)
+
+    assert stats.total_imported == 1
+    assert sqlite_session.query(Commune).one().departement == '75'
+
+
+def test_upsert_batch_error_is_reported(sqlite_session):
+    loader = DataLoader(sqlite_session, strategy="upsert", batch_size=2, quarantine_path="")
+    records = [
+        CommuneRecord('75001', 'PARIS', '75'),
+        CommuneRecord('69001', 'LYON', None),
+        CommuneRecord('13001', 'MARSEILLE', '13'),
+    ]
+
+    stats = loader.load_communes(records)
+
+    assert stats.total_processed == 3
+    assert stats.total_imported == 2
+    assert stats.total_rejected == 1
+    assert len(stats.errors) == 1
+    assert "Erreur ligne 2" in stats.errors[0]
+    assert sqlite_session.query(Commune).count() == 2
+
+
+def test_upsert_unsupported_dialect(mock_db_session):
+    mock_db_session.get_bind.return_value.dialect.name = "mysql"
+    loader = DataLoader(mock_db_session, strategy="upsert")
+
+    with pytest.raises(ValueError):
+        loader.load_communes([])
+
+
+def test_copy_strategy_requires_postgresql(sqlite_session):
+    loader = DataLoader(sqlite_session, strategy="copy")
+
+    with pytest.raises(ValueError):
+        loader.load_communes([])
+
+
+def test_copy_stream_spools_and_drains_records():
+    spool = io.StringIO()
+    stream = CopyStream((CommuneRecord(f'7500{i}', f'PARIS {i}', '75', f'PARIS {i}') for i in range(5)),
+                        rows_per_fill=2, spool=spool)
+
+    stream.read(10)
+    stream.drain()
+
+    assert stream.count == 5
+    assert spool.getvalue().splitlines() == [f'7500{i},PARIS {i},75,PARIS {i}' for i in range(5)]
+
+
+def test_copy_stream_formats_csv_lines():
+    stream_records = [
+        CommuneRecord('75001', 'PARIS', '75'),
+        CommuneRecord('01400', 'SAINT-DENIS, "LE"', '01'),
+    ]
+    stream = CopyStream(stream_records, rows_per_fill=1)
+
+    first = stream.read(5)
+    rest = stream.read()
+
+    paris, saint_denis = (content_hash(record) for record in stream_records)
+    assert first + rest == f'0,75001,PARIS,75,,{paris}\n1,01400,"SAINT-DENIS, ""LE""",01,,{saint_denis}\n'
+    assert stream.count == 2
+    assert stream.read() == ''
+
+
+def test_content_hash_depends_on_every_field():
+    record = CommuneRecord('75001', 'PARIS', '75')
+
+    assert content_hash(record) == content_hash(CommuneRecord('75001', 'PARIS', '75'))
+    assert content_hash(record) != content_hash(record._replace(departement='74'))
+    assert content_hash(record) != content_hash(CommuneRecord('7500', '1PARIS', '75'))
+    assert len(content_hash(record)) == 32
+
+
+@pytest.mark.parametrize("strategy", ["orm", "upsert"])
+def test_row_modified_outside_import_is_rewritten(sqlite_session, sample_communes_data, strategy):
+    loader = DataLoader(sqlite_session, strategy=strategy)
+    loader.load_communes(sample_communes_data)
+    paris = sqlite_session.query(Commune).filter_by(commune_name='PARIS').one()
+    paris.departement = '99'
+    paris.content_hash = None
+    sqlite_session.commit()
+    loader.reset_key_index()
+
+    result = loader.load_communes(sample_communes_data)
+
+    assert (result.total_updated, result.total_unchanged) == (1, 2)
+    assert sqlite_session.query(Commune).filter_by(commune_name='PARIS').one().departement == '75'
+
+
+@pytest.mark.parametrize("mode, remaining, tombstoned", [
+    ("keep", 3, 0),
+    ("tombstone", 3, 1),
+    ("delete", 2, 0),
+])
+def test_remove_stale(sqlite_session, sample_communes_data, mode, remaining, tombstoned):
+    loader = DataLoader(sqlite_session)
+    loader.load_communes(sample_communes_data)
+
+    removed = loader.remove_stale({('75001', 'PARIS'), ('69001', 'LYON')}, mode=mode)
+
+    assert removed == 1
+    assert sqlite_session.query(Commune).count() == remaining
+    assert sqlite_session.query(Commune).filter(Commune.removed_at.isnot(None)).count() == tombstoned
+
+
+@pytest.mark.parametrize("mode", ["tombstone", "delete"])
+def test_remove_stale_keeps_api_communes(sqlite_session, sample_communes_data, mode):
+    loader = DataLoader(sqlite_session)
+    loader.load_communes(sample_communes_data)
+    # Créée par l'API, et commune importée modifiée par l'API : sans empreinte
+    sqlite_session.add(Commune(postal_code='33000', commune_name='BORDEAUX', departement='33'))
+    sqlite_session.query(Commune).filter_by(commune_name='LYON').one().content_hash = None
+    sqlite_session.commit()
+
+    removed = loader.remove_stale({('75001', 'PARIS')}, mode=mode)
+
+    assert removed == 1
+    assert {c.commune_name for c in sqlite_session.query(Commune).filter(Commune.removed_at.is_(None))} == \
+        {'PARIS', 'LYON', 'BORDEAUX'}
+
+
+def test_remove_stale_unknown_mode(sqlite_session):
+    with pytest.raises(ValueError):
+        DataLoader(sqlite_session).remove_stale(set(), mode="purge")
+
+
+@pytest.mark.parametrize("strategy", ["orm", "upsert"])
+def test_tombstoned_commune_is_restored_on_reimport(sqlite_session, sample_communes_data, strategy):
+    loader = DataLoader(sqlite_session, strategy=strategy)
+    loader.load_communes(sample_communes_data)
+    loader.remove_stale({('75001', 'PARIS'), ('69001', 'LYON')}, mode="tombstone")
+
+    result = loader.load_communes(sample_communes_data)
+
+    assert (result.total_imported, result.total_updated, result.total_unchanged) == (0, 1, 2)
+    assert sqlite_session.query(Commune).filter(Commune.removed_at.isnot(None)).count() == 0
+
+
+def test_partition_by_departement_keeps_departements_whole():
+    records = ([CommuneRecord(f'75{i:03d}', f'PARIS {i}', '75') for i in range(5)]
+               + [CommuneRecord(f'69{i:03d}', f'LYON {i}', '69') for i in range(3)]
+               + [CommuneRecord(f'13{i:03d}', f'MARSEILLE {i}', '13') for i in range(2)]
+               + [CommuneRecord('33000', 'BORDEAUX', '33')])
+
+    partitions = partition_by_departement(records, 2)
+
+    assert sorted(len(p) for p in partitions) == [5, 6]
+    assert sorted(r for p in partitions for r in p) == sorted(records)
+    departements = [{r.departement for r in p} for p in partitions]
+    assert not departements[0] & departements[1]
+    assert partition_by_departement(records[:2], 4) == [records[:2]]
+
+
+def test_parallel_load_falls_back_to_serial_on_sqlite(sqlite_session, sample_communes_data):
+    loader = DataLoader(sqlite_session, workers=4)
+
+    with patch.object(loader, '_load_parallel') as mock_parallel:
+        result = loader.load_communes(sample_communes_data)
+
+    mock_parallel.assert_not_called()
+    assert result.total_imported == 3
@@ -0,0 +1,171 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from core.etl import CommunesETLPipeline
+from core.etl.metrics import RunInstrumentation
+from core.etl.progress import ProgressTracker
+from db.base import Base
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_measures_accumulate_per_phase():
+    clock = FakeClock()
+    instrumentation = RunInstrumentation(clock=clock)
+
+    for rows in (100, 50):
+        with instrumentation.measure("transform") as measure:
+            clock.now += 0.5
+            measure.rows = rows
+
+    transform = instrumentation.phase_stats()[1]
+    assert transform.name == "transform"
+    assert transform.rows == 150
+    assert transform.wall_seconds == 1.0
+    assert transform.rows_per_second == 150.0
+    assert transform.peak_memory_bytes is None
+
+
+def test_iterate_measures_each_item():
+    clock = FakeClock()
+    instrumentation = RunInstrumentation(clock=clock)
+
+    def chunks():
+        for size in (3, 2):
+            clock.now += 1
+            yield list(range(size))
+
+    assert [len(chunk) for chunk in instrumentation.iterate("extract", chunks())] == [3, 2]
+    extract = instrumentation.phase_stats()[0]
+    assert extract.rows == 5
+    assert extract.wall_seconds == 2.0
+
+
+def test_round_trips_are_counted_per_phase_and_batch(sqlite_engine):
+    instrumentation = RunInstrumentation()
+    instrumentation.start(sqlite_engine)
+    try:
+        with sqlite_engine.connect() as connection:
+            with instrumentation.measure("extract"):
+                connection.execute(text("SELECT 1"))
+            with instrumentation.measure("load"), instrumentation.batch() as batch:
+                batch.rows = 10
+                connection.execute(text("SELECT 1"))
+                connection.execute(text("SELECT 2"))
+                connection.commit()
+
+        # Partition du chargement parallèle
+        def load_partition():
+            with instrumentation.in_phase("load"), sqlite_engine.connect() as worker_connection:
+                worker_connection.execute(text("SELECT 1"))
+
+        # Requête d'un autre thread sans étape courante (API) : non comptée
+        for target in (load_partition, lambda: sqlite_engine.connect().execute(text("SELECT 1")).close()):
+            worker = threading.Thread(target=target)
+            worker.start()
+            worker.join()
+    finally:
+        instrumentation.stop()
+
+    with sqlite_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    extract, transform, load = instrumentation.phase_stats()
+    assert extract.db_round_trips == 1
+    assert transform.db_round_trips == 0
+    assert load.db_round_trips == 4
+    assert [(b.index, b.rows, b.db_round_trips) for b in instrumentation.batches] == [(0, 10, 3)]
+
+
+def test_trace_memory_records_the_peak():
+    instrumentation = RunInstrumentation(trace_memory=True)
+    instrumentation.start()
+    try:
+        with instrumentation.measure("transform"):
+            data = bytearray(2_000_000)
+            del data
+    finally:
+        instrumentation.stop()
+
+    transform = instrumentation.phase_stats()[1]
+    assert transform.peak_memory_bytes >= 2_000_000
+    assert instrumentation.peak_memory == transform.peak_memory_bytes
+
+
+def test_pipeline_reports_phases_and_batches(sqlite_engine, tmp_path):
+    report_path = tmp_path / "reports" / "run.json"
+    frame = pd.DataFrame({
+        'code_postal': [f"{1000 + i:05d}" for i in range(25)],
+        'nom_commune_complet': [f"Commune {i}" for i in range(25)],
+    })
+    with sessionmaker(bind=sqlite_engine)() as session:
+        pipeline = CommunesETLPipeline(session, "https://example.com/test.csv", chunk_size=0, cache_dir="",
+                                       checkpoint_dir="", load_strategy="orm", report_path=str(report_path))
+        pipeline.loader.batch_size = 10
+        pipeline.loader.batch_target_seconds = 0
+        with patch.object(pipeline.extractor, 'extract_dataframe', return_value=frame):
+            stats = pipeline.run_full_pipeline()
+
+    assert stats.errors == []
+    assert [(phase.name, phase.rows) for phase in stats.phases] == [("extract", 25), ("transform", 25), ("load", 25)]
+    load = stats.phases[2]
+    assert load.db_round_trips > 0
+    assert load.wall_seconds > 0
+    # Mesures par lot dans le rapport seulement, pas dans les statistiques enregistrées (etl_runs)
+    assert stats.batches is None
+
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    assert report['source'] == "https://example.com/test.csv"
+    assert report['options']['mode'] == "batch"
+    assert report['stats']['total_imported'] == 25
+    assert [phase['name'] for phase in report['stats']['phases']] == ["extract", "transform", "load"]
+    batches = report['stats']['batches']
+    assert [batch['rows'] for batch in batches] == [10, 10, 5]
+    assert sum(batch['db_round_trips'] for batch in batches) <= load.db_round_trips
+
+
+def test_progress_publication_is_not_counted(tmp_path):
+    frame = pd.DataFrame({
+        'code_postal': [f"{1000 + i:05d}" for i in range(25)],
+        'nom_commune_complet': [f"Commune {i}" for i in range(25)],
+    })
+    published = []
+
+    def load_round_trips(name, publish_progress):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(engine)
+
+        def publish(tracker):
+            # Écriture de l'avancement d'un job, sur le moteur de l'import
+            if publish_progress:
+                with engine.begin() as connection:
+                    connection.execute(text("SELECT 1"))
+                published.append(tracker.rows['load'])
+
+        try:
+            with sessionmaker(bind=engine)() as session:
+                pipeline = CommunesETLPipeline(session, "https://example.com/test.csv", chunk_size=0, cache_dir="",
+                                               checkpoint_dir="", load_strategy="orm",
+                                               progress=ProgressTracker(on_checkpoint=publish))
+                pipeline.loader.batch_size = 10
+                pipeline.loader.batch_target_seconds = 0
+                with patch.object(pipeline.extractor, 'extract_dataframe', return_value=frame):
+                    stats = pipeline.run_full_pipeline()
+        finally:
+            engine.dispose()
+        assert stats.errors == []
+        return stats.phases[2].db_round_trips
+
+    assert load_round_trips("published.db", True) == load_round_trips("reference.db", False)
+    assert published
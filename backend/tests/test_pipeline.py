@@ -0,0 +1,141 @@
+import pytest
+import pandas as pd
+from unittest.mock import Mock, patch
+
+from core.etl import CommunesETLPipeline
+from core.etl.load import DataLoader
+from core.etl.transform import CommuneRecord
+from db.models.commune import Commune
+from schemas.commune import ImportStats
+
+
+@pytest.fixture
+def chunks():
+    return [
+        pd.DataFrame({
+            'code_postal': ['75001', '69001'],
+            'nom_commune_complet': ['Paris', 'Lyon']
+        }),
+        pd.DataFrame({
+            'code_postal': ['13001', 'ABCDE'],
+            'nom_commune_complet': ['Marseille', 'Invalide']
+        })
+    ]
+
+
+@pytest.fixture
+def pipeline():
+    return CommunesETLPipeline(Mock(), "https://example.com/test.csv", chunk_size=2)
+
+
+def test_streaming_pipeline_loads_each_chunk(pipeline, chunks):
+    loaded = []
+
+    def fake_load(communes_data):
+        communes_data = list(communes_data)
+        loaded.append(communes_data)
+        return ImportStats(
+            total_processed=len(communes_data),
+            total_imported=len(communes_data),
+            total_updated=0,
+            errors=[]
+        )
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)), \
+         patch.object(pipeline.loader, 'load_communes', side_effect=fake_load):
+        stats = pipeline.run_full_pipeline()
+
+    assert len(loaded) == 2
+    assert [c.code_postal for c in loaded[1]] == ['13001']
+    assert stats.total_processed == 3
+    assert stats.total_imported == 3
+    assert stats.errors == []
+
+
+def test_streaming_pipeline_never_builds_whole_dataframe(pipeline, chunks):
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)), \
+         patch.object(pipeline.extractor, 'extract_dataframe') as mock_extract, \
+         patch.object(pipeline.loader, 'load_communes',
+                      return_value=ImportStats(total_processed=1, total_imported=1, total_updated=0)):
+        pipeline.run_full_pipeline()
+
+    mock_extract.assert_not_called()
+
+
+def test_streaming_pipeline_extraction_error(pipeline):
+    with patch.object(pipeline.extractor, 'stream_dataframes', side_effect=Exception("Network error")):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.total_processed == 0
+    assert len(stats.errors) == 1
+    assert "Network error" in stats.errors[0]
+
+
+def test_streaming_pipeline_empty_source(pipeline):
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter([])):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.errors == ["Échec de l'extraction des données"]
+
+
+@pytest.mark.parametrize("chunk_size", [0, 2])
+def test_incremental_pipeline_applies_delta(sqlite_session, chunks, chunk_size):
+    def run(frames):
+        pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=chunk_size,
+                                       cache_dir="", incremental=True, stale_rows="tombstone")
+        with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(frames)), \
+             patch.object(pipeline.extractor, 'extract_dataframe', return_value=pd.concat(frames)):
+            return pipeline.run_full_pipeline()
+
+    first = run(chunks)
+    second = run([chunks[0].iloc[:1], pd.DataFrame({
+        'code_postal': ['13001'],
+        'nom_commune_complet': ['Marseille 1er'],
+    })])
+
+    assert (first.total_imported, first.total_removed) == (3, 0)
+    assert (second.total_imported, second.total_updated, second.total_unchanged, second.total_removed) == (1, 0, 1, 2)
+    active = sqlite_session.query(Commune).filter(Commune.removed_at.is_(None))
+    assert sorted(c.commune_name for c in active) == ['MARSEILLE 1ER', 'PARIS']
+
+
+@pytest.mark.parametrize("options", [{'chunk_size': 2}, {'chunk_size': 2, 'pipelined': True}],
+                         ids=["streaming", "pipelined"])
+def test_key_index_is_fetched_once_per_run(sqlite_session, chunks, options):
+    DataLoader(sqlite_session).load_communes([CommuneRecord('75001', 'PARIS', '75')])
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", cache_dir="",
+                                   load_strategy="orm", **options)
+    fetch = pipeline.loader._fetch_key_index
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', side_effect=lambda *args: iter(chunks)), \
+         patch.object(pipeline.loader, '_fetch_key_index', side_effect=fetch) as mock_fetch:
+        stats = pipeline.run_full_pipeline()
+        # Import suivant : index relu
+        pipeline.run_full_pipeline(force=True)
+
+    assert (stats.total_imported, stats.total_unchanged) == (2, 1)
+    assert mock_fetch.call_count == 2
+
+
+def test_pipeline_stops_transform_processes_at_the_end(pipeline, chunks):
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)), \
+         patch.object(pipeline.loader, 'load_communes', side_effect=Exception("Database down")), \
+         patch.object(pipeline.transformer, 'close') as mock_close:
+        pipeline.run_full_pipeline()
+
+    mock_close.assert_called_once_with()
+
+
+def test_incremental_pipeline_keeps_rows_after_load_error(sqlite_session, chunks):
+    DataLoader(sqlite_session).load_communes([CommuneRecord('33000', 'BORDEAUX', '33')])
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=2,
+                                   cache_dir="", incremental=True)
+    failed = ImportStats(total_processed=2, total_imported=0, total_updated=0, errors=["boom"])
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)), \
+         patch.object(pipeline.loader, 'load_communes', return_value=failed), \
+         patch.object(pipeline.loader, 'remove_stale') as mock_remove:
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.total_removed == 0
+    mock_remove.assert_not_called()
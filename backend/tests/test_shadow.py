@@ -0,0 +1,134 @@
+import os
+
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from core.etl import CommunesETLPipeline
+from core.etl.load import DataLoader
+from core.etl.shadow import SHADOW_TABLE, prepare_shadow_table, swap_shadow_table
+from core.etl.transform import CommuneRecord
+from db.base import Base
+from db.models.commune import Commune
+
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+DATABASES = [
+    "sqlite://",
+    pytest.param(POSTGRES_URL, marks=pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL non défini")),
+]
+
+
+@pytest.fixture(params=DATABASES, ids=["sqlite", "postgresql"])
+def session(request):
+    engine = create_engine(request.param)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {SHADOW_TABLE}")
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def existing(session):
+    DataLoader(session).load_communes([
+        CommuneRecord('75001', 'PARIS', '75'),
+        CommuneRecord('69001', 'LYON', '69'),
+    ])
+    return {c.commune_name: c.id for c in session.query(Commune)}
+
+
+def source_frame(*rows):
+    return pd.DataFrame({
+        'code_postal': [row[0] for row in rows],
+        'nom_commune_complet': [row[1] for row in rows],
+    })
+
+
+def run_pipeline(session, frame):
+    pipeline = CommunesETLPipeline(session, "https://example.com/test.csv", chunk_size=0, cache_dir="",
+                                   shadow_swap=True)
+    with patch.object(pipeline.extractor, 'extract_dataframe', return_value=frame):
+        return pipeline.run_full_pipeline()
+
+
+def test_swap_replaces_table_and_keeps_ids(session, existing):
+    stats = run_pipeline(session, source_frame(('75001', 'Paris'), ('69001', 'Lyon'), ('13001', 'Marseille')))
+
+    assert stats.errors == []
+    assert (stats.total_imported, stats.total_unchanged) == (1, 2)
+    ids = {c.commune_name: c.id for c in session.query(Commune)}
+    assert {name: ids[name] for name in existing} == existing
+    assert ids['MARSEILLE'] not in existing.values()
+
+    inspector = inspect(session.get_bind())
+    assert SHADOW_TABLE not in inspector.get_table_names()
+    assert ({index['name'] for index in inspector.get_indexes('communes')}
+            >= {index.name for index in Commune.__table__.indexes})
+    assert [c['name'] for c in inspector.get_unique_constraints('communes')] == ['uq_communes_postal_code_commune_name']
+
+
+def test_consecutive_swaps(session, existing):
+    first = run_pipeline(session, source_frame(('75001', 'Paris'), ('13001', 'Marseille')))
+    second = run_pipeline(session, source_frame(('75001', 'Paris'), ('33000', 'Bordeaux')))
+
+    assert first.errors == second.errors == []
+    assert session.query(Commune).count() == 4
+
+
+def test_new_rows_after_swap_get_fresh_ids(session, existing):
+    run_pipeline(session, source_frame(('75001', 'Paris'), ('13001', 'Marseille')))
+
+    session.add(Commune(postal_code='33000', commune_name='BORDEAUX', departement='33'))
+    session.commit()
+
+    assert session.query(Commune).count() == 4
+    assert len({c.id for c in session.query(Commune)}) == 4
+
+
+def test_readers_see_previous_table_until_swap(session, existing):
+    seen_before_swap = []
+
+    def check_then_swap(db, shadow):
+        seen_before_swap.append(sorted(c.commune_name for c in db.query(Commune)))
+        swap_shadow_table(db, shadow)
+
+    with patch('core.etl.swap_shadow_table', side_effect=check_then_swap):
+        run_pipeline(session, source_frame(('13001', 'Marseille')))
+
+    assert seen_before_swap == [['LYON', 'PARIS']]
+    assert sorted(c.commune_name for c in session.query(Commune)) == ['LYON', 'MARSEILLE', 'PARIS']
+
+
+def test_failed_load_leaves_table_untouched(session, existing):
+    with patch.object(DataLoader, '_apply_orm_batch', side_effect=RuntimeError("connexion perdue")):
+        failed = run_pipeline(session, source_frame(('13001', 'Marseille')))
+
+    assert len(failed.errors) == 1
+    assert sorted(c.commune_name for c in session.query(Commune)) == ['LYON', 'PARIS']
+    assert SHADOW_TABLE not in inspect(session.get_bind()).get_table_names()
+
+
+def test_incremental_swap_tombstones_on_shadow(session, existing):
+    pipeline = CommunesETLPipeline(session, "https://example.com/test.csv", chunk_size=0, cache_dir="",
+                                   shadow_swap=True, incremental=True, stale_rows="tombstone")
+    with patch.object(pipeline.extractor, 'extract_dataframe', return_value=source_frame(('75001', 'Paris'))):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.total_removed == 1
+    assert session.query(Commune).filter_by(commune_name='LYON').one().removed_at is not None
+    assert pipeline.loader.table is Commune.__table__
+
+
+def test_prepare_shadow_table_copies_rows(session, existing):
+    shadow = prepare_shadow_table(session)
+
+    rows = session.execute(shadow.select().order_by(shadow.c.id)).all()
+    assert [(row.id, row.commune_name) for row in rows] == sorted((i, name) for name, i in existing.items())
@@ -0,0 +1,167 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from core.etl import CommunesETLPipeline
+from core.etl.cache import SourceCache
+from core.etl.extract import DataExtractor
+from schemas.commune import ImportStats
+
+
+CSV_V1 = "code_postal,nom_commune_complet\n75001,Paris\n69001,Lyon\n"
+CSV_V2 = "code_postal,nom_commune_complet\n75001,Paris\n69001,Lyon\n13001,Marseille\n"
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+    """Serveur local de substitution à data.gouv.fr, avec support ETag / 304"""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body = server.payload.encode('utf-8')
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+        if server.send_etag and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        if server.send_etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def source_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SourceHandler)
+    server.payload = CSV_V1
+    server.send_etag = True
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/communes.csv"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_first_download_is_cached(source_server, cache_dir):
+    extractor = DataExtractor(source_server.url, cache_dir=cache_dir)
+
+    path = extractor.refresh_source()
+
+    assert path == extractor.cache.data_path
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == CSV_V1
+    assert extractor.source_changed is True
+    assert 'If-None-Match' not in source_server.requests[0]
+
+
+def test_conditional_request_returns_304(source_server, cache_dir):
+    DataExtractor(source_server.url, cache_dir=cache_dir).refresh_source()
+
+    extractor = DataExtractor(source_server.url, cache_dir=cache_dir)
+    extractor.refresh_source()
+
+    assert 'If-None-Match' in source_server.requests[1]
+    # Pas encore chargé en base : la source reste à traiter
+    assert extractor.source_changed is True
+
+    extractor.cache.mark_loaded()
+    extractor.refresh_source()
+    assert extractor.source_changed is False
+
+
+def test_modified_source_is_downloaded_again(source_server, cache_dir):
+    extractor = DataExtractor(source_server.url, cache_dir=cache_dir)
+    extractor.refresh_source()
+    extractor.cache.mark_loaded()
+
+    source_server.payload = CSV_V2
+    extractor.refresh_source()
+
+    assert extractor.source_changed is True
+    df = extractor.extract_dataframe()
+    assert len(df) == 3
+
+
+def test_unchanged_content_detected_without_etag(source_server, cache_dir):
+    source_server.send_etag = False
+    extractor = DataExtractor(source_server.url, cache_dir=cache_dir)
+    extractor.refresh_source()
+    extractor.cache.mark_loaded()
+
+    extractor.refresh_source()
+
+    assert extractor.source_changed is False
+
+
+def test_refresh_source_unreachable(cache_dir):
+    extractor = DataExtractor("http://127.0.0.1:1/communes.csv", cache_dir=cache_dir, retries=0)
+
+    assert extractor.refresh_source(timeout=1) is None
+    assert extractor.source_changed is None
+
+
+def test_cache_metadata_survives_reload(tmp_path):
+    cache = SourceCache(str(tmp_path), "https://example.com/a.csv")
+    cache.store([b"abc", b"def"], etag='"x"', last_modified=None)
+
+    reloaded = SourceCache(str(tmp_path), "https://example.com/a.csv")
+    metadata = reloaded.load_metadata()
+
+    assert metadata['sha256'] == hashlib.sha256(b"abcdef").hexdigest()
+    assert metadata['size'] == 6
+    assert reloaded.conditional_headers() == {'If-None-Match': '"x"'}
+
+
+def test_pipeline_skips_unchanged_source(source_server, cache_dir):
+    loaded_stats = ImportStats(total_processed=2, total_imported=2, total_updated=0, errors=[])
+
+    def run(force=False):
+        pipeline = CommunesETLPipeline(None, source_server.url, chunk_size=0, cache_dir=cache_dir)
+        with patch.object(pipeline.loader, 'load_communes', return_value=loaded_stats) as mock_load:
+            stats = pipeline.run_full_pipeline(force=force)
+        return stats, mock_load
+
+    first, first_load = run()
+    assert first.total_imported == 2
+    assert first_load.called
+
+    second, second_load = run()
+    assert second.source_unchanged is True
+    assert not second_load.called
+
+    forced, forced_load = run(force=True)
+    assert forced.source_unchanged is False
+    assert forced_load.called
+
+
+def test_pipeline_retries_source_after_failed_load(source_server, cache_dir):
+    failed_stats = ImportStats(total_processed=2, total_imported=0, total_updated=0, errors=["boom"])
+
+    pipeline = CommunesETLPipeline(None, source_server.url, chunk_size=0, cache_dir=cache_dir)
+    with patch.object(pipeline.loader, 'load_communes', return_value=failed_stats):
+        pipeline.run_full_pipeline()
+
+    pipeline = CommunesETLPipeline(None, source_server.url, chunk_size=0, cache_dir=cache_dir)
+    with patch.object(pipeline.loader, 'load_communes', return_value=failed_stats) as mock_load:
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.source_unchanged is False
+    assert mock_load.called
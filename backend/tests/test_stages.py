@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from core.etl import CommunesETLPipeline
+from core.etl.stages import StagePipeline
+from db.models.commune import Commune
+
+
+def test_stages_keep_order_and_report_stats():
+    loaded = []
+    pipeline = StagePipeline(
+        "extract", iter([[1, 2], [3], [4, 5, 6]]),
+        [("double", lambda chunk: [value * 2 for value in chunk])],
+        "load", loaded.append
+    )
+
+    stats = pipeline.run()
+
+    assert loaded == [[2, 4], [6], [8, 10, 12]]
+    assert [stage.name for stage in stats] == ["extract", "double", "load"]
+    assert [(stage.items, stage.rows) for stage in stats] == [(3, 6), (3, 6), (3, 6)]
+
+
+def test_stage_returning_none_drops_item():
+    loaded = []
+    pipeline = StagePipeline("extract", iter([[1], [], [2]]),
+                             [("filter", lambda chunk: chunk or None)], "load", loaded.append)
+
+    pipeline.run()
+
+    assert loaded == [[1], [2]]
+
+
+def test_queues_bound_items_in_flight():
+    produced = []
+    in_flight = []
+
+    def source():
+        for i in range(20):
+            produced.append(i)
+            yield [i]
+
+    def slow_load(item):
+        in_flight.append(len(produced) - item[0])
+        time.sleep(0.01)
+
+    StagePipeline("extract", source(), [("transform", lambda chunk: chunk)], "load", slow_load,
+                  queue_depth=1).run()
+
+    # Au plus : 1 bloc en chargement, 1 par file, 1 par étape en cours, 1 en lecture
+    assert max(in_flight) <= 5
+
+
+def test_slow_sink_shows_as_upstream_output_wait():
+    def slow_load(item):
+        time.sleep(0.05)
+
+    stats = StagePipeline("extract", iter([[i] for i in range(6)]), [], "load", slow_load,
+                          queue_depth=1).run()
+
+    extract, load = stats
+    assert extract.output_wait_seconds > 0.1
+    assert load.busy_seconds >= 0.25
+
+
+def test_error_in_stage_stops_pipeline_and_is_raised():
+    def source():
+        for i in range(1000):
+            yield [i]
+
+    def transform(chunk):
+        if chunk[0] == 3:
+            raise ValueError("bloc invalide")
+        return chunk
+
+    loaded = []
+    pipeline = StagePipeline("extract", source(), [("transform", transform)], "load", loaded.append)
+
+    with pytest.raises(ValueError, match="bloc invalide"):
+        pipeline.run()
+
+    assert loaded == [[0], [1], [2]]
+    assert pipeline.stage_stats()[0].items < 1000
+    assert [t for t in threading.enumerate() if t.name.startswith("etl-")] == []
+
+
+def test_error_in_sink_stops_producers():
+    closed = []
+
+    def source():
+        try:
+            for i in range(1000):
+                yield [i]
+        finally:
+            closed.append(True)
+
+    def load(item):
+        raise RuntimeError("base indisponible")
+
+    with pytest.raises(RuntimeError, match="base indisponible"):
+        StagePipeline("extract", source(), [], "load", load).run()
+
+    assert closed == [True]
+
+
+@pytest.fixture
+def chunks():
+    return [
+        pd.DataFrame({
+            'code_postal': ['75001', '69001'],
+            'nom_commune_complet': ['Paris', 'Lyon']
+        }),
+        pd.DataFrame({
+            'code_postal': ['13001', 'ABCDE'],
+            'nom_commune_complet': ['Marseille', 'Invalide']
+        })
+    ]
+
+
+def test_pipelined_pipeline_loads_all_chunks(sqlite_session, chunks):
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=2,
+                                   cache_dir="", pipelined=True)
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)) as stream:
+        stats = pipeline.run_full_pipeline()
+
+    stream.assert_called_once_with(2)
+    assert stats.errors == []
+    assert stats.total_imported == 3
+    assert sorted(c.commune_name for c in sqlite_session.query(Commune)) == ['LYON', 'MARSEILLE', 'PARIS']
+    assert [(stage.name, stage.items, stage.rows) for stage in stats.stages] == [
+        ("extract", 2, 4), ("transform", 2, 3), ("load", 2, 3)
+    ]
+
+
+def test_pipelined_pipeline_uses_default_chunk_size(sqlite_session, chunks):
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=0,
+                                   cache_dir="", pipelined=True)
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter(chunks)) as stream:
+        pipeline.run_full_pipeline()
+
+    stream.assert_called_once_with(50000)
+
+
+def test_pipelined_pipeline_extraction_error(sqlite_session):
+    def failing_stream(chunk_size):
+        raise Exception("Network error")
+        yield
+
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=2,
+                                   cache_dir="", pipelined=True)
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', side_effect=failing_stream):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.errors == ["Erreur critique dans le pipeline ETL : Network error"]
+    assert stats.stages[0].items == 0
+
+
+def test_pipelined_pipeline_empty_source(sqlite_session):
+    pipeline = CommunesETLPipeline(sqlite_session, "https://example.com/test.csv", chunk_size=2,
+                                   cache_dir="", pipelined=True)
+
+    with patch.object(pipeline.extractor, 'stream_dataframes', return_value=iter([])):
+        stats = pipeline.run_full_pipeline()
+
+    assert stats.errors == ["Échec de l'extraction des données"]
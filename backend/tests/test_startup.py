@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import Mock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+from core.lock import EtlLock
+from core.startup import StartupETL
+from crud.commune import backfill_search_keys
+from db.models.commune import Commune
+from schemas.commune import ImportStats
+
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def lock_file(tmp_path):
+    return str(tmp_path / "etl.lock")
+
+
+def ok_stats():
+    return ImportStats(total_processed=2, total_imported=2, total_updated=0, errors=[])
+
+
+def pipeline_factory(run_full_pipeline):
+    pipeline = Mock()
+    pipeline.run_full_pipeline.side_effect = run_full_pipeline
+    return Mock(return_value=pipeline)
+
+
+def test_lock_file_is_exclusive(engine, lock_file):
+    first, second = EtlLock(engine, lock_file), EtlLock(engine, lock_file)
+
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    first.release()
+    assert second.acquire(blocking=False)
+    second.release()
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL non défini")
+def test_advisory_lock_is_exclusive():
+    engine = create_engine(POSTGRES_URL)
+    first, second = EtlLock(engine), EtlLock(engine)
+    try:
+        assert first.uses_advisory_lock
+        assert first.acquire(blocking=False)
+        assert not second.acquire(blocking=False)
+        first.release()
+        assert second.acquire(blocking=False)
+        second.release()
+    finally:
+        first.release()
+        second.release()
+        engine.dispose()
+
+
+def test_startup_etl_runs_in_background(engine, lock_file):
+    release = threading.Event()
+
+    def slow_run():
+        release.wait(5)
+        return ok_stats()
+
+    factory = pipeline_factory(slow_run)
+    startup = StartupETL(Mock(), engine, enabled=True, lock_file=lock_file, pipeline_factory=factory)
+
+    startup.start()
+    assert not startup.ready
+    release.set()
+
+    assert startup.wait(5)
+    assert startup.status == "succeeded"
+    assert startup.stats.total_imported == 2
+
+
+def test_startup_etl_reports_failures(engine, lock_file):
+    failing = StartupETL(Mock(), engine, enabled=True, lock_file=lock_file,
+                         pipeline_factory=pipeline_factory(lambda: ImportStats(
+                             total_processed=0, total_imported=0, total_updated=0, errors=["réseau"])))
+    crashing = StartupETL(Mock(), engine, enabled=True, lock_file=lock_file,
+                          pipeline_factory=pipeline_factory(Mock(side_effect=RuntimeError("boom"))))
+
+    failing.start()
+    assert failing.wait(5)
+    crashing.start()
+    assert crashing.wait(5)
+
+    assert failing.status == crashing.status == "failed"
+    assert "boom" in crashing.stats.errors[0]
+    # Le verrou est libéré même en cas d'échec
+    assert EtlLock(engine, lock_file).acquire(blocking=False)
+
+
+def test_startup_etl_can_be_skipped(engine, lock_file):
+    factory = pipeline_factory(ok_stats)
+    startup = StartupETL(Mock(), engine, enabled=False, lock_file=lock_file, pipeline_factory=factory)
+
+    startup.start()
+
+    assert startup.ready
+    assert startup.status == "skipped"
+    factory.assert_not_called()
+
+
+def test_only_one_process_runs_the_import(engine, lock_file):
+    other_process = EtlLock(engine, lock_file)
+    assert other_process.acquire(blocking=False)
+
+    factory = pipeline_factory(ok_stats)
+    startup = StartupETL(Mock(), engine, enabled=True, lock_file=lock_file, pipeline_factory=factory)
+    startup.start()
+
+    deadline = time.time() + 5
+    while startup.status != "waiting" and time.time() < deadline:
+        time.sleep(0.01)
+    assert startup.status == "waiting"
+    assert not startup.ready
+
+    other_process.release()
+
+    assert startup.wait(5)
+    assert startup.status == "done_elsewhere"
+    factory.assert_not_called()
+
+
+def test_app_serves_while_import_runs(engine, lock_file):
+    release = threading.Event()
+
+    def slow_run():
+        release.wait(5)
+        return ok_stats()
+
+    def startup_etl(session_factory, _engine):
+        return StartupETL(session_factory, engine, enabled=True, lock_file=lock_file,
+                          pipeline_factory=pipeline_factory(slow_run))
+
+    with patch.object(main, 'engine', engine), patch.object(main, 'StartupETL', side_effect=startup_etl):
+        with TestClient(main.app) as client:
+            # Le démarrage n'attend pas l'import, toujours bloqué à ce stade
+            assert client.get("/api/v1/health/live").status_code == 200
+            response = client.get("/api/v1/health/ready")
+            assert response.status_code == 503
+            assert response.json()["status"] in ("pending", "running")
+
+            release.set()
+            assert main.app.state.startup_etl.wait(5)
+            response = client.get("/api/v1/health/ready")
+            assert response.status_code == 200
+            assert response.json()["ready"] is True
+            assert response.json()["stats"]["total_imported"] == 2
+
+
+@pytest.mark.parametrize("enabled", [True, False], ids=["after_import", "import_disabled"])
+def test_search_keys_are_backfilled_in_background(sqlite_engine, lock_file, enabled):
+    session_factory = sessionmaker(bind=sqlite_engine)
+    with session_factory() as session:
+        # Commune saisie par l'API avant la colonne search_key
+        session.add(Commune(postal_code="42000", commune_name="SAINT-ÉTIENNE", departement="42"))
+        session.commit()
+    release = threading.Event()
+
+    def slow_backfill(db):
+        release.wait(5)
+        return backfill_search_keys(db)
+
+    startup = StartupETL(session_factory, sqlite_engine, enabled=enabled, lock_file=lock_file,
+                         pipeline_factory=pipeline_factory(ok_stats))
+    with patch('core.startup.backfill_search_keys', side_effect=slow_backfill):
+        startup.start()
+        # Le démarrage n'attend pas le rattrapage, toujours bloqué à ce stade
+        assert startup._thread.is_alive()
+        release.set()
+        startup._thread.join(5)
+
+    assert startup.status == ("succeeded" if enabled else "skipped")
+    with session_factory() as session:
+        assert session.query(Commune).one().search_key == "SAINT ETIENNE"
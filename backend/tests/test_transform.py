@@ -1,8 +1,16 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
 import pytest
 import pandas as pd
-from unittest.mock import patch
+import pyarrow as pa
+from unittest.mock import Mock, patch
 
-from core.etl.transform import DataTransformer
+import core.etl.transform as transform_module
+from core.etl.transform import CommuneRecord, DataTransformer, _read_shared_frame, _write_shared_frame
+from db.models.commune import Commune
 
 
 @pytest.fixture
@@ -133,7 +141,7 @@ def test_transform_data_complete_pipeline(transformer, sample_dataframe):
         result = transformer.transform_data(sample_dataframe)
         
         assert 'departement' in result.columns
-        assert len(result.columns) == 3  # code_postal, nom_commune_complet, departement
+        assert len(result.columns) == 4  # code_postal, nom_commune_complet, departement, search_key
         assert len(result) == 4
 
 
@@ -205,4 +213,329 @@ def test_full_pipeline_integration(transformer):
         final_dict = transformer.to_dict_list(with_dept)
         
         assert len(final_dict) == 3  # Doublons et invalides supprimés
-        assert all('departement' in record for record in final_dict)
\ No newline at end of file
+        assert all('departement' in record for record in final_dict)
+
+def reference_departements(codes):
+    return [Commune.calculate_departement(code) for code in codes]
+
+
+def test_compute_departements_special_cases(transformer):
+    codes = pd.Series(['75001', '01000', '20000', '20199', '20200', '20999', '97139', '97600', '98000', '95000'])
+
+    result = transformer.compute_departements(codes)
+
+    assert list(result) == ['75', '01', '2A', '2A', '2B', '2B', '971', '976', '980', '95']
+
+
+def test_compute_departements_matches_calculate_departement_exhaustively(transformer):
+    # Tous les codes postaux à 5 chiffres possibles
+    codes = pd.Series([f'{i:05d}' for i in range(100000)])
+
+    result = transformer.compute_departements(codes)
+
+    assert list(result) == reference_departements(codes)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compute_departements_matches_on_random_samples(transformer, seed):
+    rng = random.Random(seed)
+    prefixes = ['20', '97', '98', '75', '01', '2']
+    codes = []
+    for _ in range(500):
+        prefix = rng.choice(prefixes)
+        codes.append(prefix + ''.join(rng.choice('0123456789') for _ in range(5 - len(prefix))))
+
+    # Index non contigu, comme après clean_data
+    series = pd.Series(codes, index=rng.sample(range(10000), len(codes)))
+    result = transformer.compute_departements(series)
+
+    assert list(result.index) == list(series.index)
+    assert list(result) == reference_departements(codes)
+
+
+def test_compute_departements_arrow_strings(transformer):
+    codes = pd.Series(['20100', '97411', '33000'], dtype=pd.StringDtype("pyarrow"))
+
+    assert list(transformer.compute_departements(codes)) == ['2A', '974', '33']
+
+
+@pytest.mark.parametrize("code", ['1234', '123456', None, '20A01'])
+def test_compute_departements_invalid_code(transformer, code):
+    with pytest.raises(ValueError):
+        transformer.compute_departements(pd.Series(['75001', code]))
+    with pytest.raises(ValueError):
+        Commune.calculate_departement(code)
+
+
+SEARCH_KEY_NAMES = [
+    "Saint-Étienne", "SAINT ETIENNE", " saint  étienne ", "L'Haÿ-les-Roses", "Œuilly", "Cœur-d'Écosse",
+    "LÆTITIA", "Saint-Denis (Réunion)", "Île-d’Yeu", "Ça", "Bois-Colombes  ", "Pont-l’Évêque", "---", "",
+]
+
+
+def test_compute_search_keys_folds_accents_and_punctuation(transformer):
+    keys = transformer.compute_search_keys(pd.Series(SEARCH_KEY_NAMES[:8]))
+
+    assert list(keys) == ["SAINT ETIENNE", "SAINT ETIENNE", "SAINT ETIENNE", "L HAY LES ROSES", "OEUILLY",
+                          "COEUR D ECOSSE", "LAETITIA", "SAINT DENIS REUNION"]
+
+
+def test_compute_search_keys_matches_normalize_search_key(transformer, sample_dataframe):
+    names = SEARCH_KEY_NAMES + list(sample_dataframe['nom_commune_complet'])
+    names = pd.Series(names, index=range(10, 10 + len(names)))
+
+    keys = transformer.compute_search_keys(names)
+
+    assert keys.index.equals(names.index)
+    assert list(keys) == [Commune.normalize_search_key(name) for name in names]
+
+
+def test_compute_search_keys_keeps_missing_names_missing(transformer):
+    keys = transformer.compute_search_keys(pd.Series(["Saint-Étienne", None, np.nan], dtype=object))
+
+    assert keys.iloc[0] == "SAINT ETIENNE"
+    assert keys.iloc[1:].isna().all()
+    assert Commune.normalize_search_key(None) is None
+
+
+def test_transform_data_adds_search_key(transformer):
+    df = pd.DataFrame({'code_postal': ['42000'], 'nom_commune_complet': [' Saint-Étienne ']})
+
+    result = transformer.transform_data(df)
+
+    assert result.iloc[0]['nom_commune_complet'] == 'SAINT-ÉTIENNE'
+    assert result.iloc[0]['search_key'] == 'SAINT ETIENNE'
+
+
+def test_transform_data_does_not_mutate_input(transformer, dirty_dataframe):
+    original = dirty_dataframe.copy(deep=True)
+
+    transformer.transform_data(dirty_dataframe)
+
+    pd.testing.assert_frame_equal(dirty_dataframe, original)
+
+
+@pytest.mark.filterwarnings("error::pandas.errors.SettingWithCopyWarning")
+def test_filter_required_columns_result_is_independent_from_input(transformer, sample_dataframe):
+    original = sample_dataframe.copy(deep=True)
+
+    result = transformer.filter_required_columns(sample_dataframe)
+    result.loc[result.index[0], 'code_postal'] = '99999'
+    result['nom_commune_complet'] = result['nom_commune_complet'].str.lower()
+
+    pd.testing.assert_frame_equal(sample_dataframe, original)
+
+
+@pytest.mark.filterwarnings("error::pandas.errors.SettingWithCopyWarning")
+def test_clean_data_result_is_independent_from_input(transformer):
+    df = pd.DataFrame({
+        'code_postal': ['75001', '69001'],
+        'nom_commune_complet': ['PARIS', 'LYON']
+    })
+
+    original = df.copy(deep=True)
+
+    # Sans Copy-on-Write (défaut de pandas 2), comme dans le processus de l'API
+    with pd.option_context("mode.copy_on_write", False):
+        result = transformer.clean_data(df)
+    result.loc[result.index[0], 'code_postal'] = '99999'
+
+    pd.testing.assert_frame_equal(df, original)
+
+
+def test_to_dict_list_without_nan_keeps_values(transformer):
+    df = pd.DataFrame({
+        'code_postal': ['75001'],
+        'nom_commune_complet': ['PARIS'],
+        'departement': ['75']
+    })
+
+    assert transformer.to_dict_list(df) == [
+        {'code_postal': '75001', 'nom_commune_complet': 'PARIS', 'departement': '75'}
+    ]
+
+
+def test_iter_records_streams_named_tuples(transformer):
+    df = pd.DataFrame({
+        'code_postal': ['75001', '69001'],
+        'nom_commune_complet': ['PARIS', 'LYON'],
+        'departement': ['75', pd.NA]
+    })
+
+    records = transformer.iter_records(df)
+
+    assert not isinstance(records, list)
+    records = list(records)
+    assert records == [CommuneRecord('75001', 'PARIS', '75'), CommuneRecord('69001', 'LYON', '')]
+    assert records[0].nom_commune_complet == 'PARIS'
+
+
+def test_iter_records_matches_to_dict_list(transformer, sample_dataframe):
+    transformed = transformer.transform_data(sample_dataframe)
+
+    records = [record._asdict() for record in transformer.iter_records(transformed)]
+
+    assert records == transformer.to_dict_list(transformed)
+
+
+@pytest.fixture
+def large_dirty_dataframe():
+    rng = np.random.default_rng(0)
+    rows = 3000
+    postal_codes = [f"{code:05d}" for code in rng.integers(1000, 98999, rows)]
+    names = [f"Commune {i % 700}" for i in range(rows)]
+    # Doublons répartis sur toute la longueur, donc à cheval sur les partitions
+    for i in range(0, rows, 37):
+        postal_codes[i], names[i] = postal_codes[rows - 1 - i], names[rows - 1 - i].lower()
+    for i in range(5, rows, 53):
+        postal_codes[i] = None
+    for i in range(7, rows, 61):
+        postal_codes[i] = '2A004'
+    return pd.DataFrame({
+        'code_postal': postal_codes,
+        'nom_commune_complet': names,
+        'population': rng.integers(0, 100000, rows),
+    })
+
+
+def test_parallel_transform_matches_serial(large_dirty_dataframe):
+    serial = DataTransformer(workers=1).transform_data(large_dirty_dataframe)
+    transformer = DataTransformer(workers=3, parallel_min_rows=0)
+    try:
+        parallel = transformer.transform_data(large_dirty_dataframe)
+    finally:
+        transformer.close()
+
+    assert len(serial) < len(large_dirty_dataframe)
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=True, check_index_type=True)
+    assert list(DataTransformer().iter_records(parallel)) == list(DataTransformer().iter_records(serial))
+
+
+def test_parallel_transform_keeps_index_when_nothing_removed(sample_dataframe):
+    serial = DataTransformer(workers=1).transform_data(sample_dataframe)
+    transformer = DataTransformer(workers=2, parallel_min_rows=0)
+    try:
+        parallel = transformer.transform_data(sample_dataframe)
+    finally:
+        transformer.close()
+
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=True, check_index_type=True)
+    assert isinstance(parallel.index, pd.RangeIndex)
+
+
+def test_small_input_stays_serial(sample_dataframe):
+    transformer = DataTransformer(workers=4, parallel_min_rows=1000)
+
+    with patch('core.etl.transform.ProcessPoolExecutor') as pool:
+        result = transformer.transform_data(sample_dataframe)
+
+    pool.assert_not_called()
+    assert len(result) == 4
+
+
+def test_parallel_transform_falls_back_on_mixed_types():
+    df = pd.DataFrame({
+        'code_postal': ['75001', 69001, '13001'],
+        'nom_commune_complet': ['Paris', 'Lyon', 'Marseille'],
+    })
+
+    with patch('core.etl.transform.ProcessPoolExecutor') as pool:
+        result = DataTransformer(workers=2, parallel_min_rows=0).transform_data(df)
+
+    pool.assert_not_called()
+    pd.testing.assert_frame_equal(result, DataTransformer().transform_data(df))
+
+
+def test_shared_frame_round_trip_frees_memory():
+    df = pd.DataFrame({'code_postal': ['75001', None]}, index=[10, 20])
+    name, size = _write_shared_frame(df)
+
+    pd.testing.assert_frame_equal(_read_shared_frame(name, size), df)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=name)
+
+
+def tracked_shared_frames(names):
+    """_write_shared_frame recording the name of every block it creates"""
+    def write(df):
+        name, size = _write_shared_frame(df)
+        names.append(name)
+        return name, size
+    return write
+
+
+def assert_freed(names):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+
+def test_parallel_transform_frees_blocks_written_before_an_arrow_error(large_dirty_dataframe):
+    names = []
+    write = tracked_shared_frames(names)
+    calls = iter([write, write, Mock(side_effect=pa.ArrowInvalid("colonne mixte"))])
+
+    with patch('core.etl.transform._write_shared_frame', side_effect=lambda df: next(calls)(df)):
+        result = DataTransformer(workers=3, parallel_min_rows=0).transform_data(large_dirty_dataframe)
+
+    pd.testing.assert_frame_equal(result, DataTransformer().transform_data(large_dirty_dataframe))
+    assert_freed(names)
+
+
+def test_parallel_transform_frees_every_block_when_a_partition_fails(large_dirty_dataframe):
+    names = []
+    transform_partition = transform_module._transform_partition
+
+    def partition(name, size):
+        # Première partition en échec, les suivantes produisent leur segment de sortie
+        if name == names[0]:
+            raise RuntimeError("processus interrompu")
+        return transform_partition(name, size)
+
+    transformer = DataTransformer(workers=3, parallel_min_rows=0)
+    # Threads à la place des processus : les remplacements ci-dessus restent visibles
+    with patch('core.etl.transform._write_shared_frame', side_effect=tracked_shared_frames(names)), \
+            patch('core.etl.transform._transform_partition', side_effect=partition), \
+            patch('core.etl.transform.ProcessPoolExecutor',
+                  side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(1)):
+        with pytest.raises(RuntimeError):
+            transformer.transform_data(large_dirty_dataframe)
+    transformer.close()
+
+    # 3 partitions d'entrée, puis les sorties des 2 partitions réussies
+    assert len(names) == 5
+    assert_freed(names)
+
+
+def test_parallel_transforms_share_one_pool_until_closed(large_dirty_dataframe):
+    transformer = DataTransformer(workers=2, parallel_min_rows=0)
+    pools = []
+
+    def start_pool(max_workers, mp_context):
+        pools.append(ThreadPoolExecutor(max_workers))
+        return pools[-1]
+
+    with patch('core.etl.transform.ProcessPoolExecutor', side_effect=start_pool):
+        first = transformer.transform_data(large_dirty_dataframe)
+        # Chunk suivant du même import : processus déjà démarrés
+        transformer.transform_data(large_dirty_dataframe)
+        assert len(pools) == 1
+
+        transformer.close()
+        with pytest.raises(RuntimeError):
+            pools[0].submit(print)
+
+        # Import suivant : nouveau pool
+        pd.testing.assert_frame_equal(transformer.transform_data(large_dirty_dataframe), first)
+        transformer.close()
+
+    assert len(pools) == 2
+
+
+def test_parallel_transform_without_pyarrow_stays_serial(large_dirty_dataframe):
+    with patch('core.etl.transform.pa', None), patch('core.etl.transform.ProcessPoolExecutor') as pool:
+        result = DataTransformer(workers=3, parallel_min_rows=0).transform_data(large_dirty_dataframe)
+
+    pool.assert_not_called()
+    pd.testing.assert_frame_equal(result, DataTransformer().transform_data(large_dirty_dataframe))